@@ -1,8 +1,43 @@
-from flask import Flask, jsonify, request
+import contextvars
+import hmac
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, g, jsonify, request
+import metrics
+import profiling
 from flask_cors import CORS
-from datetime import datetime, timedelta
-from recommendation_engine import RecommendationEngine
-from config import FLASK_PORT, FLASK_DEBUG
+from recommendation_engine import RecommendationEngine, TopicSimilarityIndex, UserTopicIndex
+from cache import create_cache, RefreshingSnapshot
+from moderation import ModerationPool, analyze_content as moderate_content, moderation_cache
+from config import (
+    FLASK_PORT,
+    FLASK_DEBUG,
+    TRENDING_CANDIDATE_LIMIT,
+    TRENDING_RESULT_LIMIT,
+    CACHE_URL,
+    CACHE_TTL_SECONDS,
+    CACHE_STALE_SECONDS,
+    CACHE_MAX_ENTRIES,
+    TRENDING_MAX_WINDOW_HOURS,
+    TOPIC_CATALOG_CHECK_SECONDS,
+    FETCH_WORKERS,
+    USER_INDEX_REFRESH_SECONDS,
+    MODERATION_BATCH_MAX_SIZE,
+    MODERATION_STREAM_THRESHOLD,
+    MODERATION_POOL_WORKERS,
+    MODERATION_POOL_MIN_BATCH,
+    USE_MATERIALIZED_FEED,
+    FEED_SIZE,
+    FEED_MAX_AGE_SECONDS,
+    PROFILING_ENABLED,
+    PROFILING_TOKEN,
+    PROFILING_DIR,
+    PROFILING_MAX_FILES,
+    PROFILING_INTERVAL,
+)
+from feed_refresh import feed_candidate_limit
 from database import (
     fetch_user_topics,
     fetch_user_activity,
@@ -11,7 +46,9 @@ from database import (
     fetch_posts_with_metrics,
     fetch_all_topics_with_metrics,
     fetch_user_following,
-    fetch_posts_by_topics,
+    fetch_posts_by_user_topics,
+    fetch_topics_version,
+    fetch_materialized_feed,
 )
 
 app = Flask(__name__)
@@ -22,18 +59,174 @@ CORS(
     methods=["GET", "POST", "OPTIONS"]
 )
 recommendation_engine = RecommendationEngine()
+# Shared results for global (non user-specific) endpoints
+trending_cache = create_cache(CACHE_URL, ttl=CACHE_TTL_SECONDS, stale_ttl=CACHE_STALE_SECONDS,
+                              max_entries=CACHE_MAX_ENTRIES)
+# User x topic matrix for /ai/recommend/users, rebuilt in the background
+user_index = RefreshingSnapshot(lambda: UserTopicIndex(fetch_all_users() or []), max_age=USER_INDEX_REFRESH_SECONDS)
+# Topic name similarity for /api/recommend/topics, synced whenever the catalog reloads
+topic_index = TopicSimilarityIndex()
+
+def _load_topic_catalog():
+    topics = fetch_all_topics() or []
+    # Only added, renamed or removed topics are reindexed
+    topic_index.update(topics)
+    return topics
+
+# In-memory copy of the "Topic" table, reloaded only when fetch_topics_version() changes
+topic_catalog = RefreshingSnapshot(_load_topic_catalog, max_age=TOPIC_CATALOG_CHECK_SECONDS, version=fetch_topics_version)
+
+# Threads running each request's independent database fetches concurrently
+fetch_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix='fetch')
+# Worker processes for /ai/moderation/analyze/batch (disabled when MODERATION_POOL_WORKERS=0)
+moderation_pool = ModerationPool(workers=MODERATION_POOL_WORKERS, min_batch=MODERATION_POOL_MIN_BATCH)
+
+
+# Snapshots /ready waits for; loading the user index also imports numpy and scipy
+WARM_SNAPSHOTS = (('topic catalog', topic_catalog), ('user index', user_index))
+# Seconds each snapshot took in the last warm_up()
+warm_up_seconds = {}
+_warm_up_lock = threading.Lock()
+
+def warm_up():
+    """Load the topic catalog and user index now instead of on first use.
+
+    The gunicorn master calls this before forking, so workers start with
+    the data already loaded and share it copy-on-write.
+    """
+    for name, snapshot in WARM_SNAPSHOTS:
+        started = time.perf_counter()
+        try:
+            snapshot.get()
+            warm_up_seconds[name] = round(time.perf_counter() - started, 3)
+            print(f"Loaded {name} in {warm_up_seconds[name]:.2f}s")
+        except Exception as e:
+            print(f"Error loading {name}: {e}")
 
+def start_warm_up():
+    """Run warm_up() in a background thread unless one is already running"""
+    if not _warm_up_lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            warm_up()
+        finally:
+            _warm_up_lock.release()
+
+    threading.Thread(target=run, name='warm-up', daemon=True).start()
+
+def _fetch_concurrently(**fetches):
+    """Run independent fetches at once and return their results by name.
+
+    Each fetch is (function, fallback, error message); a fetch that fails
+    or returns nothing gives its fallback, as when fetched one by one.
+    """
+    # Each fetch runs in a copy of this context so its metrics keep the request's endpoint
+    futures = {
+        name: fetch_executor.submit(contextvars.copy_context().run, profiling.traced(fetch, f'fetch:{name}'))
+        for name, (fetch, _, _) in fetches.items()
+    }
+    results = {}
+    for name, (_, fallback, error) in fetches.items():
+        try:
+            results[name] = futures[name].result() or fallback
+        except Exception as e:
+            if error:
+                print(f"{error}: {e}")
+            results[name] = fallback
+    return results
 
 @app.before_request
 def log_incoming_request():
     print(f"Incoming {request.method} {request.path} from {request.remote_addr}")
 
+def _endpoint_label():
+    # The route pattern, not the path, keeps the number of label values bounded
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_started = time.perf_counter()
+    g.metrics_endpoint = metrics.set_endpoint(_endpoint_label())
+
+@app.after_request
+def record_request_metrics(response):
+    if 'metrics_started' in g:
+        # Streamed responses are timed until their body starts streaming
+        metrics.observe_request(request.method, _endpoint_label(), response.status_code,
+                                time.perf_counter() - g.metrics_started)
+    return response
+
+@app.teardown_request
+def reset_request_metrics(exc):
+    if 'metrics_endpoint' in g:
+        metrics.reset_endpoint(g.pop('metrics_endpoint'))
+
+def _profiling_requested():
+    # Header only: query strings, and so the token, are written to the access log
+    token = request.headers.get('X-Profile')
+    return bool(token) and hmac.compare_digest(token.encode(), PROFILING_TOKEN.encode())
+
+# Registered only when enabled, so unprofiled deployments pay nothing
+if PROFILING_ENABLED:
+    if not PROFILING_TOKEN:
+        # Otherwise any client could make the service profile requests and write files
+        raise RuntimeError("PROFILING_ENABLED is set but PROFILING_TOKEN is not")
+
+    @app.before_request
+    def start_profiling():
+        if _profiling_requested():
+            g.profiler = profiling.RequestProfiler(
+                f"{request.method} {request.path}", interval=PROFILING_INTERVAL
+            ).start()
+
+    @app.after_request
+    def save_profile(response):
+        profiler = g.get('profiler')
+        if profiler is not None:
+            profiler.stop()
+            try:
+                name = profiler.save(PROFILING_DIR, keep=PROFILING_MAX_FILES)
+                response.headers['X-Profile'] = name
+                print(f"Saved profile {name}: {profiler.summary()['request']}")
+            except OSError as e:
+                print(f"Error saving profile: {e}")
+            response.headers['Server-Timing'] = profiler.server_timing()
+        return response
+
+    @app.teardown_request
+    def stop_profiling(exc):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.stop()
+
 # ---------------------------
 # Health Check
 # ---------------------------
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'ok', 'service': 'ThinkSync AI Recommendations'})
+    return jsonify({
+        'status': 'ok',
+        'service': 'ThinkSync AI Recommendations',
+        'cache': trending_cache.stats(),
+        'moderation_cache': moderation_cache.stats()
+    })
+
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """503 until the topic catalog and user index are loaded; /health only tells the process is up"""
+    pending = [name for name, snapshot in WARM_SNAPSHOTS if snapshot.age() is None]
+    if pending:
+        # e.g. the database was unreachable when the master warmed up
+        start_warm_up()
+        return jsonify({'status': 'warming', 'pending': pending}), 503
+    return jsonify({'status': 'ready', 'warm_up_seconds': warm_up_seconds})
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(body, headers={'Content-Type': content_type})
 
 # ---------------------------
 # Recommend Topics
@@ -48,22 +241,18 @@ def recommend_topics():
         if not user_id:
             return jsonify({'error': 'userId is required'}), 400
 
-        try:
-            user_topics = fetch_user_topics(user_id) or []
-        except Exception as e:
-            print(f"Error fetching topics for user {user_id}: {e}")
-            user_topics = []
-
-        try:
-            user_activity = fetch_user_activity(user_id, limit=200) or []
-        except Exception as e:
-            print(f"Error fetching activity for user {user_id}: {e}")
-            user_activity = []
+        fetched = _fetch_concurrently(
+            user_topics=(lambda: fetch_user_topics(user_id), [], f"Error fetching topics for user {user_id}"),
+            user_activity=(lambda: fetch_user_activity(user_id, limit=200), [],
+                           f"Error fetching activity for user {user_id}"),
+        )
+        user_topics = fetched['user_topics']
+        user_activity = fetched['user_activity']
 
         try:
-            all_topics = fetch_all_topics() or []
+            all_topics = topic_catalog.get() or []
         except Exception as e:
-            print(f"Error fetching all topics: {e}")
+            print(f"Error loading topic catalog: {e}")
             all_topics = []
 
         recommendations = recommendation_engine.recommend_topics(
@@ -71,7 +260,8 @@ def recommend_topics():
             user_topics=user_topics,
             user_activity=user_activity,
             all_topics=all_topics,
-            limit=limit
+            limit=limit,
+            topic_index=topic_index
         )
 
         return jsonify({'success': True, 'recommendations': recommendations})
@@ -88,27 +278,26 @@ def recommend_users():
         if not user_id:
             return jsonify({'error': 'userId is required'}), 400
 
-        try:
-            user_topics = fetch_user_topics(user_id) or []
-        except:
-            user_topics = []
-
-        try:
-            user_following = fetch_user_following(user_id) or []
-        except:
-            user_following = []
+        fetched = _fetch_concurrently(
+            user_topics=(lambda: fetch_user_topics(user_id), [], None),
+            user_following=(lambda: fetch_user_following(user_id), [], None),
+        )
+        user_topics = fetched['user_topics']
+        user_following = fetched['user_following']
 
         try:
-            all_users = fetch_all_users() or []
-        except:
-            all_users = []
+            index = user_index.get()
+        except Exception as e:
+            print(f"Error building user index: {e}")
+            index = UserTopicIndex([])
 
         recommendations = recommendation_engine.recommend_users(
             user_id=user_id,
             user_topics=user_topics,
-            all_users=all_users,
+            all_users=index.users,
             user_following=user_following,
-            limit=int(data.get('limit', 10))
+            limit=int(data.get('limit', 10)),
+            user_index=index
         )
         print(f"User recommendations for {user_id}: {recommendations}")
         return jsonify({'success': True, 'recommendations': recommendations})
@@ -120,21 +309,35 @@ def recommend_users():
 # ---------------------------
 # Trending Topics
 # ---------------------------
+def _time_window(default):
+    """timeWindow query parameter in hours, between 1 and TRENDING_MAX_WINDOW_HOURS.
+
+    It is part of the cache keys, so clamping it bounds how many distinct
+    results a client can make the service compute and keep.
+    """
+    hours = int(request.args.get('timeWindow', default))
+    return min(max(hours, 1), TRENDING_MAX_WINDOW_HOURS)
+
+def _compute_trending_topics():
+    topics_with_metrics = fetch_all_topics_with_metrics() or []
+    return recommendation_engine.calculate_trending_topics(
+        topics_with_metrics=topics_with_metrics,
+        limit=TRENDING_RESULT_LIMIT
+    )
+
 @app.route('/api/trending/topics', methods=['GET'])
 def get_trending_topics():
     try:
-        limit = int(request.args.get('limit', 5))
-        time_window = int(request.args.get('timeWindow', 168))
+        limit = min(int(request.args.get('limit', 5)), TRENDING_RESULT_LIMIT)
+        # timeWindow is accepted but ignored: topic metrics are all-time counts,
+        # so one cached ranking serves every window
 
+        # Failed fetches are not cached; they fall back to an empty list
         try:
-            topics_with_metrics = fetch_all_topics_with_metrics() or []
-        except:
-            topics_with_metrics = []
-
-        trending = recommendation_engine.calculate_trending_topics(
-            topics_with_metrics=topics_with_metrics,
-            time_window_hours=time_window
-        )
+            trending = trending_cache.get_or_compute('trending_topics', _compute_trending_topics)
+        except Exception as e:
+            print(f"Error computing trending topics: {e}")
+            trending = []
 
         return jsonify({'success': True, 'trending_topics': trending[:limit]})
 
@@ -145,59 +348,56 @@ def get_trending_topics():
 # ---------------------------
 # Trending Posts
 # ---------------------------
+FALLBACK_WINDOW_HOURS = 24
+
+def _compute_trending_posts(time_window):
+    """Top TRENDING_RESULT_LIMIT trending posts and ranked 24h fallback posts, for any request limit"""
+    # Only posts young enough for the trending window or the 24h
+    # fallback are fetched, capped at the newest candidates
+    posts_with_metrics = fetch_posts_with_metrics(
+        max_age_hours=max(time_window, FALLBACK_WINDOW_HOURS),
+        limit=TRENDING_CANDIDATE_LIMIT
+    ) or []
+
+    trending = recommendation_engine.calculate_trending_posts(
+        posts_with_metrics=posts_with_metrics,
+        time_window_hours=time_window,
+        min_engagement=1,
+        limit=TRENDING_RESULT_LIMIT
+    )
+
+    # Fallback candidates for when there are not enough trending posts
+    fallback_posts = recommendation_engine.rank_recent_posts(
+        posts_with_metrics,
+        window_hours=FALLBACK_WINDOW_HOURS,
+        exclude_ids={t['post_id'] for t in trending},
+        limit=TRENDING_RESULT_LIMIT
+    )
+
+    return {'trending': trending, 'fallback': fallback_posts}
+
 @app.route('/api/trending/posts', methods=['GET'])
 def get_trending_posts():
     try:
-        limit = int(request.args.get('limit', 3))
-        time_window = int(request.args.get('timeWindow', 72))
+        limit = min(int(request.args.get('limit', 3)), TRENDING_RESULT_LIMIT)
+        time_window = _time_window(72)
 
+        # Failed fetches are not cached; they fall back to an empty list
         try:
-            posts_with_metrics = fetch_posts_with_metrics() or []
-        except:
-            posts_with_metrics = []
-
-        trending = recommendation_engine.calculate_trending_posts(
-            posts_with_metrics=posts_with_metrics,
-            time_window_hours=time_window,
-            min_engagement=1
-        )
+            result = trending_cache.get_or_compute(
+                f'trending_posts:{time_window}',
+                lambda: _compute_trending_posts(time_window)
+            )
+        except Exception as e:
+            print(f"Error computing trending posts: {e}")
+            result = {'trending': [], 'fallback': []}
 
-        # Fallback if not enough trending posts
+        # Slice into a new list so the cached result is never modified
+        trending = result['trending'][:limit]
         if len(trending) < limit:
-            recent_threshold = datetime.now() - timedelta(hours=24)
-            fallback_posts = []
-            for post in posts_with_metrics:
-                created_at = post.get('createdAt')
-                if not created_at:
-                    continue
-                if isinstance(created_at, str):
-                    try:
-                        created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                    except:
-                        continue
-                if created_at.replace(tzinfo=None) < recent_threshold:
-                    continue
-                likes = int(post.get('likes_count', 0) or 0)
-                comments = int(post.get('comments_count', 0) or 0)
-                if likes > 0 or comments > 0:
-                    score = (likes * 1.0) + (comments * 1.5)
-                    fallback_posts.append({
-                        'post_id': post['id'],
-                        'score': score,
-                        'metrics': {
-                            'likes': likes,
-                            'comments': comments,
-                            'bookmarks': 0,
-                            'views': 0,
-                            'engagement': score
-                        }
-                    })
-            existing_ids = {t['post_id'] for t in trending}
-            fallback_posts = [p for p in fallback_posts if p['post_id'] not in existing_ids]
-            fallback_posts.sort(key=lambda x: x['score'], reverse=True)
-            trending.extend(fallback_posts[:limit - len(trending)])
-
-        return jsonify({'success': True, 'trending_posts': trending[:limit]})
+            trending += result['fallback'][:limit - len(trending)]
+
+        return jsonify({'success': True, 'trending_posts': trending})
 
     except Exception as e:
         print(f"Error in get_trending_posts: {e}")
@@ -216,35 +416,37 @@ def get_personalized_feed():
         if not user_id:
             return jsonify({'error': 'userId is required'}), 400
 
-        # Fetch user topics (interestTopics)
-        try:
-            user_topics = fetch_user_topics(user_id) or []
-        except Exception as e:
-            print(f"Error fetching topics for user {user_id}: {e}")
-            user_topics = []
-
-        # Fetch user activity for personalization
-        try:
-            user_activity = fetch_user_activity(user_id, limit=200) or []
-        except Exception as e:
-            print(f"Error fetching activity for user {user_id}: {e}")
-            user_activity = []
-
-        # Fetch posts relevant to user's topics
-        posts = []
-        if user_topics:
-            topic_ids = [topic['id'] for topic in user_topics]
+        # Feed precomputed by feed_refresh.py; missing or stale feeds are scored live
+        if USE_MATERIALIZED_FEED and limit <= FEED_SIZE:
             try:
-                posts = fetch_posts_by_topics(topic_ids, limit=limit * 3)  # Fetch more to score
+                feed = fetch_materialized_feed(user_id, max_age_seconds=FEED_MAX_AGE_SECONDS)
             except Exception as e:
-                print(f"Error fetching posts by topics: {e}")
-                posts = []
+                print(f"Error fetching materialized feed for user {user_id}: {e}")
+                feed = None
+            if feed is not None:
+                return jsonify({'success': True, 'feed': feed[:limit]})
+
+        # With materialized feeds on, candidates are ranked as for the FEED_SIZE
+        # request feed_refresh.py stores, so stored and live feeds agree
+        candidate_limit = feed_candidate_limit(max(limit, FEED_SIZE) if USE_MATERIALIZED_FEED else limit)
+
+        # User topics (interestTopics), activity for personalization and posts
+        # relevant to the user's topics, fetched at the same time
+        fetched = _fetch_concurrently(
+            user_topics=(lambda: fetch_user_topics(user_id), [], f"Error fetching topics for user {user_id}"),
+            user_activity=(lambda: fetch_user_activity(user_id, limit=200), [],
+                           f"Error fetching activity for user {user_id}"),
+            posts=(lambda: fetch_posts_by_user_topics(user_id, limit=candidate_limit), [],  # Fetch more to score
+                   "Error fetching posts by topics"),
+        )
+        user_topics = fetched['user_topics']
+        user_activity = fetched['user_activity']
+        posts = fetched['posts'] if user_topics else []
 
         # If no topic-based posts, fallback to all posts
         if not posts:
             try:
-                all_posts = fetch_posts_with_metrics() or []
-                posts = all_posts[:limit * 3]  # Limit for performance
+                posts = fetch_posts_with_metrics(limit=candidate_limit) or []
             except Exception as e:
                 print(f"Error fetching all posts: {e}")
                 posts = []
@@ -276,7 +478,7 @@ def analyze_content():
             return jsonify({'error': 'content is required'}), 400
 
         # Analyze content for inappropriate material
-        moderation_result = recommendation_engine.analyze_content_moderation(content)
+        moderation_result = moderate_content(content)
 
         return jsonify({
             'success': True,
@@ -287,9 +489,57 @@ def analyze_content():
     except Exception as e:
         print(f"Error in analyze_content: {e}")
         return jsonify({'error': 'An error occurred during content analysis'}), 500
+
+@app.route('/ai/moderation/analyze/batch', methods=['POST'])
+def analyze_content_batch():
+    try:
+        data = request.get_json()
+        items = data.get('items')
+
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'items must be a non-empty list'}), 400
+        if len(items) > MODERATION_BATCH_MAX_SIZE:
+            return jsonify({'error': f'at most {MODERATION_BATCH_MAX_SIZE} items per batch'}), 400
+
+        items = [item if isinstance(item, dict) else {} for item in items]
+        contents = [item.get('content') for item in items]
+        # Items without content get an error entry instead of a result
+        to_analyze = [content for content in contents if content and isinstance(content, str)]
+
+        def results():
+            analyzed = moderation_pool.analyze(to_analyze)
+            for item, content in zip(items, contents):
+                result = {'id': item.get('id'), 'contentType': item.get('contentType', 'post')}
+                if content and isinstance(content, str):
+                    result['moderation'] = next(analyzed)
+                else:
+                    result['error'] = 'content is required'
+                yield result
+
+        if len(items) <= MODERATION_STREAM_THRESHOLD:
+            return jsonify({'success': True, 'results': list(results())})
+
+        def stream():
+            # Same shape as the buffered response, written one result at a time
+            yield '{"results": ['
+            try:
+                for position, result in enumerate(results()):
+                    yield (',' if position else '') + json.dumps(result)
+                yield '], "success": true}'
+            except Exception as e:
+                print(f"Error in analyze_content_batch stream: {e}")
+                yield '], "success": false, "error": "An error occurred during content analysis"}'
+
+        return Response(stream(), mimetype='application/json')
+
+    except Exception as e:
+        print(f"Error in analyze_content_batch: {e}")
+        return jsonify({'error': 'An error occurred during content analysis'}), 500
 # ---------------------------
 # Start Service
 # ---------------------------
 if __name__ == '__main__':
+    # Serve right away; /ready reports when the snapshots are loaded
+    start_warm_up()
     print(f"Starting ThinkSync AI Recommendation Service on port {FLASK_PORT}")
     app.run(host='0.0.0.0', port=FLASK_PORT, debug=FLASK_DEBUG)
@@ -0,0 +1,14 @@
+"""Benchmarks for the ThinkSync AI service.
+
+Database benchmarks seed synthetic rows into the database named by
+BENCH_DATABASE_URL, which must be a scratch database with the Prisma schema
+applied (``npx prisma migrate deploy`` from thinkSyncBE). Existing rows in
+that database are deleted. Run from the thinkSyncAI directory, e.g.::
+
+    BENCH_DATABASE_URL=postgresql://localhost/thinksync_bench \\
+        python -m benchmarks.bench_fetch_all_users
+
+bench_engine and bench_endpoints cover every engine method and endpoint on
+data from benchmarks.datagen; their --json results can be compared between
+commits with benchmarks.compare.
+"""
@@ -0,0 +1,111 @@
+"""End-to-end latency of every endpoint against a seeded Postgres database.
+
+Seeds BENCH_DATABASE_URL with benchmarks.datagen at --posts scale (skip with
+--no-seed to reuse what is there), warms the topic catalog and user index
+like the gunicorn master does, then sends --requests requests per endpoint
+through Flask's test client, each for a different user. Trending endpoints
+are measured both from the cache and recomputed (cache cleared before every
+request).
+
+    BENCH_DATABASE_URL=postgresql://localhost/thinksync_bench \\
+        python -m benchmarks.bench_endpoints --posts 100000 --json endpoints.json
+"""
+import argparse
+import time
+
+from benchmarks.common import use_bench_database, count_queries, summarize, write_results
+from benchmarks.datagen import SyntheticData
+
+use_bench_database()
+
+import app
+import database
+from database import db_cursor
+
+SAMPLE_TEXT = 'Sharing a few thoughts on open source machine learning tools. Click here to read more!'
+
+# name -> (method, path, JSON body for a user id or None, clear the trending cache first)
+ENDPOINTS = {
+    'health': ('GET', '/health', None, False),
+    'trending_topics': ('GET', '/api/trending/topics?limit=20&timeWindow=168', None, False),
+    'trending_topics (uncached)': ('GET', '/api/trending/topics?limit=20&timeWindow=168', None, True),
+    'trending_posts': ('GET', '/api/trending/posts?limit=20&timeWindow=72', None, False),
+    'trending_posts (uncached)': ('GET', '/api/trending/posts?limit=20&timeWindow=72', None, True),
+    'recommend_topics': ('POST', '/api/recommend/topics', lambda user_id: {'userId': user_id, 'limit': 10}, False),
+    'recommend_users': ('POST', '/ai/recommend/users', lambda user_id: {'userId': user_id, 'limit': 10}, False),
+    'feed': ('POST', '/api/feed/personalized', lambda user_id: {'userId': user_id, 'limit': 20}, False),
+    'moderation': ('POST', '/ai/moderation/analyze', lambda user_id: {'content': f'{SAMPLE_TEXT} {user_id}'}, False),
+}
+
+def sample_user_ids(count, seed):
+    """Deterministic sample of users who follow at least one topic"""
+    with db_cursor() as cur:
+        cur.execute("""
+            SELECT DISTINCT "userId" AS id, md5("userId" || %s) AS k
+            FROM "UserTopic"
+            ORDER BY k
+            LIMIT %s
+        """, (str(seed), count))
+        return [row['id'] for row in cur.fetchall()]
+
+def run_endpoint(client, name, user_ids):
+    method, path, body, uncached = ENDPOINTS[name]
+    timings, errors = [], 0
+    with count_queries() as counter:
+        for user_id in user_ids:
+            if uncached:
+                app.trending_cache.clear()
+            started = time.perf_counter()
+            response = client.open(path, method=method, json=body(user_id) if body else None)
+            response.get_data()
+            timings.append(time.perf_counter() - started)
+            errors += response.status_code >= 400
+    return timings, errors, counter.count / len(user_ids)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=10000, help='posts to seed, from 1000 to 1000000')
+    parser.add_argument('--no-seed', action='store_true', help='benchmark the data already in the database')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=50, help='requests per endpoint')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help='comma-separated subset of: ' + ', '.join(ENDPOINTS))
+    parser.add_argument('--summary', action='store_true',
+                        help='read engagement from the PostEngagement summary (USE_ENGAGEMENT_SUMMARY)')
+    parser.add_argument('--json', help='write the results to this file as JSON')
+    args = parser.parse_args()
+
+    if not args.no_seed:
+        started = time.perf_counter()
+        with db_cursor() as cur:
+            SyntheticData(args.posts, seed=args.seed).seed_database(cur)
+        print(f"Seeded {args.posts:,} posts in {time.perf_counter() - started:.1f}s")
+    with db_cursor() as cur:
+        cur.execute('SELECT count(*) AS n FROM "Post"')
+        n_posts = cur.fetchone()['n']
+    if args.summary:
+        database.USE_ENGAGEMENT_SUMMARY = True
+        database.refresh_post_engagement(full=True)
+
+    started = time.perf_counter()
+    app.warm_up()
+    results = [{'benchmark': 'warm_up', 'posts': n_posts, 'errors': 0, 'queries_per_request': None,
+                **summarize([time.perf_counter() - started])}]
+
+    client = app.app.test_client()
+    user_ids = sample_user_ids(args.requests, args.seed)
+    print(f"{'endpoint':<27} {'requests':>8} {'errors':>6} {'queries':>7} {'median ms':>10} {'p95 ms':>9} {'max ms':>9}")
+    for name in args.endpoints.split(','):
+        # An untimed request first fills the trending cache and the pools
+        run_endpoint(client, name, user_ids[:1])
+        timings, errors, queries = run_endpoint(client, name, user_ids)
+        stats = summarize(timings)
+        results.append({'benchmark': name, 'posts': n_posts, 'errors': errors,
+                        'queries_per_request': round(queries, 2), **stats})
+        print(f"{name:<27} {stats['runs']:>8} {errors:>6} {queries:>7.1f} {stats['median_ms']:>10.2f} "
+              f"{stats['p95_ms']:>9.2f} {max(timings) * 1000:>9.2f}")
+
+    if args.json:
+        write_results(args.json, 'endpoints', vars(args), results)
+
+if __name__ == '__main__':
+    main()
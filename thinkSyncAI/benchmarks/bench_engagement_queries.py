@@ -0,0 +1,130 @@
+"""EXPLAIN ANALYZE of the engagement queries before and after pre-aggregation.
+
+Seeds posts with power-law engagement, then runs the old COUNT(DISTINCT)
+join fan-out and the current pre-aggregated queries and reports execution
+time and the largest intermediate row count in each plan.
+"""
+import argparse
+
+from benchmarks.common import (
+    use_bench_database,
+    capture_queries,
+    explain_analyze,
+    peak_rows,
+    seed_engagement,
+)
+
+use_bench_database()
+
+import database
+from database import db_cursor
+
+LEGACY_QUERIES = {
+    'fetch_posts_with_metrics': ("""
+        SELECT p.id, p.content, p.type, p."authorId", p."createdAt", p."updatedAt",
+               u.id as author_id, u.username as author_username,
+               u."displayName" as author_display_name,
+               COUNT(DISTINCT l.id) as likes_count,
+               COUNT(DISTINCT c.id) as comments_count,
+               COUNT(DISTINCT b.id) as bookmarks_count,
+               COUNT(DISTINCT ua.id) as views_count
+        FROM "Post" p
+        LEFT JOIN "User" u ON p."authorId" = u.id
+        LEFT JOIN "Like" l ON p.id = l."postId"
+        LEFT JOIN "Comment" c ON p.id = c."postId"
+        LEFT JOIN "Bookmark" b ON p.id = b."postId"
+        LEFT JOIN "UserActivity" ua ON p.id = ua."postId" AND ua.type = 'view_post'
+        GROUP BY p.id, u.id, u.username, u."displayName"
+        ORDER BY p."createdAt" DESC
+    """, None),
+    'fetch_posts_by_topics': ("""
+        SELECT DISTINCT p.id, p.content, p.type, p."authorId", p."createdAt", p."updatedAt",
+               u.id as author_id, u.username as author_username,
+               u."displayName" as author_display_name,
+               COUNT(DISTINCT l.id) as likes_count,
+               COUNT(DISTINCT c.id) as comments_count,
+               COUNT(DISTINCT b.id) as bookmarks_count,
+               COUNT(DISTINCT ua.id) as views_count,
+               (COUNT(DISTINCT l.id) * 1.0 + COUNT(DISTINCT c.id) * 1.5 +
+                COUNT(DISTINCT b.id) * 0.8 + COUNT(DISTINCT ua.id) * 0.1) as engagement_score
+        FROM "Post" p
+        INNER JOIN "PostTopic" pt ON p.id = pt."postId"
+        LEFT JOIN "User" u ON p."authorId" = u.id
+        LEFT JOIN "Like" l ON p.id = l."postId"
+        LEFT JOIN "Comment" c ON p.id = c."postId"
+        LEFT JOIN "Bookmark" b ON p.id = b."postId"
+        LEFT JOIN "UserActivity" ua ON p.id = ua."postId" AND ua.type = 'view_post'
+        WHERE pt."topicId" = ANY(%s)
+        GROUP BY p.id, u.id, u.username, u."displayName"
+        ORDER BY engagement_score DESC, p."createdAt" DESC
+        LIMIT %s
+    """, (['topic-1', 'topic-2', 'topic-3'], 60)),
+    'fetch_all_topics_with_metrics': ("""
+        SELECT t.id, t.name,
+               COUNT(DISTINCT ut."userId") as user_count,
+               COUNT(DISTINCT pt."postId") as post_count,
+               COUNT(DISTINCT l.id) as total_likes,
+               COUNT(DISTINCT c.id) as total_comments,
+               COUNT(DISTINCT ua.id) as total_views,
+               MAX(p."createdAt") as last_post_date
+        FROM "Topic" t
+        LEFT JOIN "UserTopic" ut ON t.id = ut."topicId"
+        LEFT JOIN "PostTopic" pt ON t.id = pt."topicId"
+        LEFT JOIN "Post" p ON pt."postId" = p.id
+        LEFT JOIN "Like" l ON p.id = l."postId"
+        LEFT JOIN "Comment" c ON p.id = c."postId"
+        LEFT JOIN "UserActivity" ua ON p.id = ua."postId" AND ua.type = 'view_post'
+        GROUP BY t.id, t.name
+        HAVING COUNT(DISTINCT pt."postId") > 0
+        ORDER BY COUNT(DISTINCT pt."postId") DESC, COUNT(DISTINCT l.id) DESC, MAX(p."createdAt") DESC
+    """, None),
+}
+
+CURRENT_CALLS = {
+    'fetch_posts_with_metrics': lambda: database.fetch_posts_with_metrics(),
+    'fetch_posts_by_topics': lambda: database.fetch_posts_by_topics(['topic-1', 'topic-2', 'topic-3'], limit=60),
+    'fetch_all_topics_with_metrics': lambda: database.fetch_all_topics_with_metrics(),
+}
+
+def current_query(name):
+    """Capture the main (first) query a database.py fetch function runs"""
+    with capture_queries() as captured:
+        CURRENT_CALLS[name]()
+    return captured[0]
+
+def report(cur, label, sql, params, timeout_ms, show_plan):
+    cur.execute("SET statement_timeout = %s", (timeout_ms,))
+    try:
+        plan = explain_analyze(cur, sql, params)
+    except database.psycopg2.errors.QueryCanceled:
+        cur.connection.rollback()
+        print(f"  {label:<8} timed out after {timeout_ms} ms")
+        return
+    print(f"  {label:<8} {plan['Execution Time']:>10.1f} ms   peak node rows {peak_rows(plan):>12,}")
+    if show_plan:
+        cur.execute("EXPLAIN ANALYZE " + sql, params)
+        for row in cur.fetchall():
+            print("      " + row['QUERY PLAN'])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--posts', type=int, default=5000)
+    parser.add_argument('--hot', type=int, default=60, help='likes on the most popular post')
+    parser.add_argument('--skew', type=float, default=0.9)
+    parser.add_argument('--timeout-ms', type=int, default=30000)
+    parser.add_argument('--show-plans', action='store_true')
+    args = parser.parse_args()
+
+    with db_cursor() as cur:
+        seed_engagement(cur, n_users=args.users, n_posts=args.posts, hot=args.hot, skew=args.skew)
+
+    for name, (legacy_sql, legacy_params) in LEGACY_QUERIES.items():
+        print(name)
+        sql, params = current_query(name)
+        with db_cursor() as cur:
+            report(cur, 'before', legacy_sql, legacy_params, args.timeout_ms, args.show_plans)
+            report(cur, 'after', sql, params, args.timeout_ms, args.show_plans)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Every RecommendationEngine method on synthetic data, without a database.
+
+For each --posts scale, benchmarks.datagen generates users, topics and posts
+shaped like the database.py rows and every method gets the whole data set,
+so the timings show how each one scales. Per-user methods run once for each
+of --sample users; the others run --repeat times.
+
+    python -m benchmarks.bench_engine --posts 1000,10000,100000 --json engine.json
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import summarize, write_results
+from benchmarks.datagen import SyntheticData
+from recommendation_engine import RecommendationEngine, TopicSimilarityIndex, UserTopicIndex
+
+LIMIT = 20
+BATCH_USERS = 100
+MODERATION_ITEMS = 2000
+
+def timed(fn, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+def timed_each(fn, items):
+    timings = []
+    for item in items:
+        started = time.perf_counter()
+        fn(item)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+def run_scale(engine, n_posts, args):
+    data = SyntheticData(n_posts, seed=args.seed)
+    started = time.perf_counter()
+    topics = data.topics()
+    users = data.users()
+    posts = list(data.posts())
+    topics_with_metrics = data.topics_with_metrics(posts, users)
+    print(f"\nGenerated {n_posts:,} posts, {data.n_users:,} users and {data.n_topics:,} topics "
+          f"in {time.perf_counter() - started:.1f}s")
+    print(f"{'method':<28} {'runs':>6} {'median ms':>11} {'p95 ms':>10} {'min ms':>10}")
+
+    rng = random.Random(args.seed)
+    followers = [i for i, user in enumerate(users) if user['topics']]
+    sample = rng.sample(followers, min(args.sample, len(followers)))
+    activity = {i: data.user_activity(i) for i in sample}
+    following = {i: data.following(i) for i in sample}
+    batch_ids = [users[i]['id'] for i in rng.sample(range(len(users)), min(BATCH_USERS, len(users)))]
+    batch = [{'user_id': users[i]['id'], 'user_topics': users[i]['topics'], 'user_activity': activity[i]}
+             for i in sample]
+    contents = [post['content'] for post in posts[:MODERATION_ITEMS]]
+
+    user_index = UserTopicIndex(users)
+    topic_index = TopicSimilarityIndex(topics)
+    now = data.now
+
+    # name -> timings; covers every public method plus the indexes they use
+    cases = {
+        'UserTopicIndex.build': lambda: timed(lambda: UserTopicIndex(users), args.repeat),
+        'TopicSimilarityIndex.build': lambda: timed(lambda: TopicSimilarityIndex(topics), args.repeat),
+        'recommend_topics': lambda: timed_each(lambda i: engine.recommend_topics(
+            users[i]['id'], users[i]['topics'], activity[i], topics, limit=10, topic_index=topic_index), sample),
+        'recommend_users': lambda: timed_each(lambda i: engine.recommend_users(
+            users[i]['id'], users[i]['topics'], user_index.users, following[i], limit=10,
+            user_index=user_index), sample),
+        'recommend_users_batch': lambda: timed(lambda: engine.recommend_users_batch(
+            batch_ids, user_index, limit=10), args.repeat),
+        'calculate_trending_topics': lambda: timed(lambda: engine.calculate_trending_topics(
+            topics_with_metrics, limit=100), args.repeat),
+        'calculate_trending_posts': lambda: timed(lambda: engine.calculate_trending_posts(
+            posts, time_window_hours=72, limit=100, now=now), args.repeat),
+        'rank_recent_posts': lambda: timed(lambda: engine.rank_recent_posts(
+            posts, window_hours=24, limit=100, now=now), args.repeat),
+        'generate_personalized_feed': lambda: timed_each(lambda i: engine.generate_personalized_feed(
+            users[i]['id'], users[i]['topics'], posts, activity[i], limit=LIMIT, now=now), sample),
+        'generate_personalized_feeds': lambda: timed(lambda: engine.generate_personalized_feeds(
+            batch, posts, limit=LIMIT, now=now), args.repeat),
+        'analyze_content_moderation': lambda: timed_each(engine.analyze_content_moderation, contents),
+    }
+
+    results = []
+    for name, case in cases.items():
+        stats = summarize(case())
+        results.append({'benchmark': name, 'posts': n_posts, 'users': data.n_users, 'topics': data.n_topics,
+                        **stats})
+        print(f"{name:<28} {stats['runs']:>6} {stats['median_ms']:>11.3f} {stats['p95_ms']:>10.3f} "
+              f"{stats['min_ms']:>10.3f}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', default='1000,10000,100000', help='comma-separated scales, up to 1000000')
+    parser.add_argument('--sample', type=int, default=50, help='users the per-user methods run for')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='write the results to this file as JSON')
+    args = parser.parse_args()
+
+    engine = RecommendationEngine()
+    public = {name for name in dir(engine) if not name.startswith('_') and callable(getattr(engine, name))}
+
+    results = []
+    for n_posts in (int(n) for n in args.posts.split(',')):
+        results.extend(run_scale(engine, n_posts, args))
+
+    missing = public - {result['benchmark'] for result in results}
+    if missing:
+        print(f"\nNot benchmarked: {', '.join(sorted(missing))}")
+    if args.json:
+        write_results(args.json, 'engine', vars(args), results)
+
+if __name__ == '__main__':
+    main()
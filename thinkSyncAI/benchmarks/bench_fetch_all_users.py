@@ -0,0 +1,45 @@
+"""Query count and latency of fetch_all_users at 1k, 10k and 100k users.
+
+Compares the current bulk implementation with the previous one that ran a
+UserTopic query per user.
+"""
+import argparse
+
+from benchmarks.common import use_bench_database, measure, seed_users
+
+use_bench_database()
+
+import database
+from database import db_cursor
+
+def fetch_all_users_per_user():
+    """Previous implementation: one topic query per user"""
+    with db_cursor() as cur:
+        cur.execute('SELECT u.id, u.username, u."displayName" FROM "User" u')
+        users = cur.fetchall()
+        for user in users:
+            cur.execute("""
+                SELECT t.id, t.name
+                FROM "Topic" t
+                INNER JOIN "UserTopic" ut ON t.id = ut."topicId"
+                WHERE ut."userId" = %s
+            """, (user['id'],))
+            user['topics'] = cur.fetchall()
+        return users
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'users':>8} {'variant':<10} {'queries':>8} {'median ms':>10}")
+    for n_users in (int(s) for s in args.sizes.split(',')):
+        with db_cursor() as cur:
+            seed_users(cur, n_users)
+        for name, fn in (('per_user', fetch_all_users_per_user), ('bulk', database.fetch_all_users)):
+            seconds, queries = measure(fn, repeat=args.repeat)
+            print(f"{n_users:>8} {name:<10} {queries:>8.0f} {seconds * 1000:>10.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""RecommendationEngine.analyze_content_moderation: combined matcher vs per-keyword regexes.
+
+Times short comments and ~10 KB posts (no database) and checks that both
+implementations return the same result for every sample.
+"""
+import argparse
+import random
+import re
+import time
+
+from recommendation_engine import RecommendationEngine, MODERATION_KEYWORDS
+
+def analyze_content_moderation_loop(content):
+    """Previous implementation: one regex search per keyword"""
+
+    if not content or not isinstance(content, str):
+        return {
+            'flagged': False,
+            'confidence': 0.0,
+            'categories': [],
+            'reasons': [],
+            'severity': 'none',
+            'action': 'allow'
+        }
+
+    content_lower = content.lower()
+    flags = []
+    reasons = []
+    severity_score = 0.0
+
+    # Define inappropriate content patterns
+    profanity_keywords = [
+        'damn', 'hell', 'ass', 'crap', 'shit', 'fuck', 'bitch', 'bastard',
+        'piss', 'dick', 'cock', 'pussy', 'whore', 'slut', 'faggot', 'nigger',
+        'cunt', 'motherfucker', 'asshole'
+    ]
+
+    hate_speech_keywords = [
+        'hate', 'kill all', 'death to', 'inferior', 'subhuman', 'vermin',
+        'scum', 'trash', 'terrorist', 'nazi', 'fascist', 'racist',
+        'sexist', 'bigot', 'supremacy'
+    ]
+
+    violent_keywords = [
+        'kill', 'murder', 'torture', 'rape', 'assault', 'attack',
+        'bomb', 'shoot', 'stab', 'hurt', 'harm', 'destroy',
+        'violence', 'weapon', 'gun', 'knife'
+    ]
+
+    spam_patterns = [
+        'click here', 'buy now', 'limited time', 'act now', 'free money',
+        'earn $$$', 'make money fast', 'get rich', 'work from home',
+        'viagra', 'casino', 'lottery', 'winner', 'prize', 'claim now'
+    ]
+
+    # Helper function to check for word boundaries to avoid false positives
+    def contains_word(text, word):
+        """Check if word exists with word boundaries to avoid partial matches"""
+        pattern = r'\b' + re.escape(word) + r'\b'
+        return bool(re.search(pattern, text, re.IGNORECASE))
+
+    # Check for profanity
+    profanity_count = sum(1 for word in profanity_keywords if contains_word(content_lower, word))
+    if profanity_count > 0:
+        flags.append('profanity')
+        severity_score += profanity_count * 0.3
+        reasons.append(f'Contains {profanity_count} profane word(s)')
+
+    # Check for hate speech (phrases can use simple substring matching)
+    hate_count = sum(1 for phrase in hate_speech_keywords if phrase in content_lower)
+    if hate_count > 0:
+        flags.append('hate_speech')
+        severity_score += hate_count * 0.5
+        reasons.append(f'Contains {hate_count} hate speech pattern(s)')
+
+    # Check for violent content
+    violent_count = sum(1 for word in violent_keywords if contains_word(content_lower, word))
+    if violent_count > 2:  # Only flag if multiple violent words
+        flags.append('violence')
+        severity_score += violent_count * 0.4
+        reasons.append(f'Contains {violent_count} violent term(s)')
+
+    # Check for spam (phrases can use simple substring matching)
+    spam_count = sum(1 for phrase in spam_patterns if phrase in content_lower)
+    if spam_count > 1:  # Require multiple spam indicators
+        flags.append('spam')
+        severity_score += spam_count * 0.3
+        reasons.append(f'Contains {spam_count} spam pattern(s)')
+
+    # Check for excessive capitalization (potential shouting/spam)
+    if len(content) > 20:
+        caps_ratio = sum(1 for c in content if c.isupper()) / len(content)
+        if caps_ratio > 0.5:
+            flags.append('excessive_caps')
+            severity_score += 0.2
+            reasons.append('Excessive capitalization detected')
+
+    # Check for repetitive characters (spam indicator)
+    repetitive_pattern = re.findall(r'(.)\1{4,}', content)
+    if repetitive_pattern:
+        flags.append('repetitive_content')
+        severity_score += 0.2
+        reasons.append('Repetitive character patterns detected')
+
+    # Normalize severity score to 0-1 range
+    confidence = min(severity_score, 1.0)
+
+    # Determine overall severity level
+    if confidence >= 0.7:
+        severity = 'high'
+    elif confidence >= 0.4:
+        severity = 'medium'
+    elif confidence >= 0.2:
+        severity = 'low'
+    else:
+        severity = 'none'
+
+    # Determine if content should be flagged
+    flagged = len(flags) > 0 and confidence >= 0.2
+
+    return {
+        'flagged': flagged,
+        'confidence': round(confidence, 2),
+        'categories': list(set(flags)),
+        'reasons': reasons,
+        'severity': severity,
+        'action': 'block' if confidence >= 0.7 else ('review' if confidence >= 0.4 else 'allow')
+    }
+
+FILLER = (
+    'the quick brown fox jumps over the lazy dog while people discuss ideas about classes '
+    'hello whatever shellfish assassin skills passage harmony gunner attacking Scunthorpe '
+    'Killall kill-all hateful prizes winners'
+).split()
+
+def make_texts(count, length, seed=11):
+    """Random texts mixing ordinary words, keywords and casing"""
+    rng = random.Random(seed)
+    keywords = [keyword for _, words in MODERATION_KEYWORDS.values() for keyword in words]
+    texts = []
+    for _ in range(count):
+        words, size = [], 0
+        while size < length:
+            word = rng.choice(keywords) if rng.random() < 0.05 else rng.choice(FILLER)
+            if rng.random() < 0.1:
+                word = word.upper()
+            word += rng.choice([' ', ' ', ' ', ', ', '! ', '_', '.'])
+            words.append(word)
+            size += len(word)
+        texts.append(''.join(words)[:length])
+    return texts
+
+EDGE_CASES = [
+    '', 'kill all of them', 'KILL ALL', 'skill all', 'ass asshole assassin', 'motherfucker fuck',
+    'earn $$$ now, click here', 'hateful hate', 'aaaaa', 'ÄÖÜ ÄÖÜ ÄÖÜ ÄÖÜ ÄÖÜ ÄÖÜ ÄÖÜ', 'kill_all kill',
+    'café murder torture rape', 'déjà-vu bomb gun knife', 'winnerprize', 'hell\nhell', 'ÿkill',
+]
+
+def run(engine, texts, repeat):
+    best_loop = best_fast = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        expected = [analyze_content_moderation_loop(text) for text in texts]
+        best_loop = min(best_loop, time.perf_counter() - start)
+        start = time.perf_counter()
+        actual = [engine.analyze_content_moderation(text) for text in texts]
+        best_fast = min(best_fast, time.perf_counter() - start)
+    for text, e, a in zip(texts, expected, actual):
+        e['categories'], a['categories'] = sorted(e['categories']), sorted(a['categories'])
+        assert e == a, f'results differ for {text[:80]!r}: {e} != {a}'
+    return best_loop / len(texts), best_fast / len(texts)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=500, help='texts per size')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    engine = RecommendationEngine()
+    run(engine, EDGE_CASES, 1)
+    print(f"{'text':>12} {'loop us':>9} {'matcher us':>11} {'speedup':>8}")
+    for label, length in [('comment', 80), ('post 1 KB', 1024), ('post 10 KB', 10240)]:
+        count = args.count if length <= 1024 else max(args.count // 10, 1)
+        loop_s, fast_s = run(engine, make_texts(count, length), args.repeat)
+        print(f"{label:>12} {loop_s * 1e6:>9.1f} {fast_s * 1e6:>11.1f} {loop_s / fast_s:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""RecommendationEngine.generate_personalized_feed: sparse batch scoring vs per-post loop.
+
+Scores synthetic candidate posts (no database) for a single user and for a
+batch of users, and checks the feeds match the previous implementation.
+"""
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.common import make_posts, make_users, best_of
+from recommendation_engine import RecommendationEngine
+
+def generate_personalized_feed_loop(user_id, user_topics, posts, user_activity=None, limit=50, now=None):
+    """Previous implementation: scores one post dict at a time"""
+    if not posts:
+        return []
+    now = now or datetime.now()
+    if not user_topics:
+        scored_posts = []
+        for post in posts:
+            created_at = post.get('createdAt')
+            if not created_at:
+                continue
+            age_hours = (now - created_at.replace(tzinfo=None)).total_seconds() / 3600
+            likes = int(post.get('likes_count', 0) or 0)
+            comments = int(post.get('comments_count', 0) or 0)
+            engagement = likes + comments * 1.5
+            scored_posts.append({'post_id': post['id'], 'score': engagement * np.exp(-age_hours / 168),
+                                 'reason': 'Recent popular post'})
+        return sorted(scored_posts, key=lambda x: x['score'], reverse=True)[:limit]
+
+    user_topic_ids = {topic['id'] for topic in user_topics}
+    user_topic_names = {topic.get('name', '').lower() for topic in user_topics}
+    activity_weights = {}
+    for activity in user_activity or []:
+        activity_type = activity.get('type')
+        if activity_type:
+            activity_weights[activity_type] = activity_weights.get(activity_type, 0) + 1
+
+    scored_posts = []
+    for post in posts:
+        post_topics = post.get('topics', [])
+        post_topic_ids = {t['id'] for t in post_topics if isinstance(t, dict) and 'id' in t}
+        post_topic_names = {t.get('name', '').lower() for t in post_topics if isinstance(t, dict)}
+        topic_match_count = len(user_topic_ids & post_topic_ids)
+        if topic_match_count == 0:
+            name_matches = len(user_topic_names & post_topic_names)
+            if name_matches == 0:
+                continue
+            topic_score = name_matches * 0.5
+        else:
+            topic_score = topic_match_count * 2.0
+        likes = int(post.get('likes_count', 0) or 0)
+        comments = int(post.get('comments_count', 0) or 0)
+        bookmarks = int(post.get('bookmarks_count', 0) or 0)
+        views = int(post.get('views_count', 0) or 0)
+        engagement = likes + (comments * 1.5) + (bookmarks * 1.2) + (views * 0.1)
+        created_at = post.get('createdAt')
+        if not created_at:
+            continue
+        age_hours = (now - created_at.replace(tzinfo=None)).total_seconds() / 3600
+        recency_factor = np.exp(-age_hours / 168)
+        activity_boost = 1.0
+        if activity_weights.get('like', 0) > 5:
+            activity_boost += 0.1
+        if activity_weights.get('comment', 0) > 3:
+            activity_boost += 0.15
+        final_score = topic_score * (1 + np.log1p(engagement) * 0.5) * recency_factor * activity_boost
+        reasons = []
+        if topic_match_count > 0:
+            reasons.append(f"{topic_match_count} matching interests")
+        if engagement > 10:
+            reasons.append("high engagement")
+        if age_hours < 24:
+            reasons.append("recent")
+        scored_posts.append({
+            'post_id': post['id'],
+            'score': final_score,
+            'metrics': {'topic_matches': topic_match_count, 'engagement': engagement,
+                        'age_hours': age_hours, 'likes': likes, 'comments': comments},
+            'reason': ", ".join(reasons) if reasons else "based on your interests"
+        })
+    return sorted(scored_posts, key=lambda x: x['score'], reverse=True)[:limit]
+
+def check_equivalent(expected, actual):
+    """Same scores in the same order; ids may only swap between equal scores"""
+    assert len(expected) == len(actual), 'feed length differs'
+    actual_by_id = {entry['post_id']: entry for entry in actual}
+    for e, a in zip(expected, actual):
+        assert abs(e['score'] - a['score']) <= 1e-9 * max(1.0, abs(e['score'])), 'score differs'
+        match = actual_by_id.get(e['post_id'])
+        if match is not None:
+            assert match['reason'] == e['reason'] and match.get('metrics') == e.get('metrics'), 'entry differs'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--users', type=int, default=500, help='users in the batch run')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    engine = RecommendationEngine()
+    users = make_users(args.users)
+    user = next(u for u in users if u['user_topics'])
+    print(f"{'posts':>8} {'loop ms':>9} {'sparse ms':>10} {'batch':>6} {'loop batch ms':>14} {'sparse batch ms':>16}")
+    for n in (int(s) for s in args.sizes.split(',')):
+        posts = make_posts(n)
+        now = datetime.now()
+
+        loop_s, expected = best_of(lambda: generate_personalized_feed_loop(
+            user['user_id'], user['user_topics'], posts, user['user_activity'], args.limit, now), args.repeat)
+        fast_s, actual = best_of(lambda: engine.generate_personalized_feed(
+            user['user_id'], user['user_topics'], posts, user['user_activity'], args.limit, now), args.repeat)
+        check_equivalent(expected, actual)
+
+        batch = users if n <= 10000 else users[:50]
+        loop_batch_s, expected_feeds = best_of(lambda: [generate_personalized_feed_loop(
+            u['user_id'], u['user_topics'], posts, u['user_activity'], args.limit, now) for u in batch], 1)
+        batch_s, feeds = best_of(lambda: engine.generate_personalized_feeds(batch, posts, args.limit, now), 1)
+        for e, a in zip(expected_feeds, feeds):
+            check_equivalent(e, a)
+
+        print(f"{n:>8} {loop_s * 1000:>9.1f} {fast_s * 1000:>10.1f} {len(batch):>6} "
+              f"{loop_batch_s * 1000:>14.1f} {batch_s * 1000:>16.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""RecommendationEngine.recommend_topics: similarity index vs pairwise name comparison.
+
+Uses synthetic topic catalogs (no database). Checks that recommendations
+match the previous implementation, including after incremental index
+updates.
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import best_of
+from recommendation_engine import RecommendationEngine, TopicSimilarityIndex
+
+WORDS = ['machine', 'learning', 'data', 'science', 'web', 'design', 'art', 'smart', 'home', 'ai',
+         'music', 'theory', 'game', 'dev', 'cloud', 'security', 'open', 'source', 'health', 'food']
+
+def recommend_topics_loop(engine, user_id, user_topics, user_activity, all_topics, limit=10):
+    """Previous implementation: compares every candidate with every followed topic"""
+    recommendations = {}
+    user_topic_ids = {topic['id'] for topic in user_topics or []}
+    topic_activity_weights = {}
+    for activity in user_activity or []:
+        topic_id = activity.get('topicId')
+        if topic_id:
+            topic_activity_weights[topic_id] = topic_activity_weights.get(topic_id, 0) + {
+                'view_post': 0.5, 'like': 1.0, 'bookmark': 1.5, 'comment': 1.2, 'follow': 2.0
+            }.get(activity.get('type'), 0.5)
+    for topic in all_topics or []:
+        if topic['id'] not in user_topic_ids:
+            score = topic_activity_weights.get(topic['id'], 0)
+            for user_topic in user_topics or []:
+                if engine._text_similarity(user_topic.get('name'), topic.get('name')) > 0.3:
+                    score += 0.4
+            if score > 0:
+                recommendations[topic['id']] = {'topic_id': topic['id'], 'name': topic.get('name'), 'score': score,
+                                                'reason': 'Based on your activity and interests'}
+    if not recommendations:
+        for topic in all_topics or []:
+            recommendations[topic['id']] = {'topic_id': topic['id'], 'name': topic.get('name'), 'score': 0.1,
+                                            'reason': 'Popular topic for new users'}
+    return sorted(recommendations.values(), key=lambda x: x['score'], reverse=True)[:limit]
+
+def make_topics(n, rng, start=0):
+    topics = []
+    for i in range(start, start + n):
+        words = rng.sample(WORDS, rng.randint(1, 3))
+        name = ' '.join(words) if rng.random() < 0.8 else ''.join(words)
+        topics.append({'id': f'topic-{i}', 'name': name.title() if rng.random() < 0.3 else name})
+    return topics
+
+def make_requests(topics, rng, count=20):
+    requests = []
+    for _ in range(count):
+        followed = rng.sample(topics, min(len(topics), rng.randint(0, 10)))
+        activity = [{'topicId': rng.choice(topics)['id'], 'type': rng.choice(['like', 'view_post', 'comment'])}
+                    for _ in range(rng.randint(0, 30))]
+        requests.append((followed, activity))
+    return requests
+
+def check(engine, index, topics, requests, limit):
+    for followed, activity in requests:
+        expected = recommend_topics_loop(engine, 'u', followed, activity, topics, limit)
+        actual = engine.recommend_topics('u', followed, activity, topics, limit, topic_index=index)
+        assert expected == actual, 'recommendations differ'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='100,1000,5000')
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    engine = RecommendationEngine()
+    rng = random.Random(5)
+    print(f"{'topics':>7} {'build ms':>9} {'update ms':>10} {'loop ms':>9} {'index ms':>9}")
+    for n in (int(s) for s in args.sizes.split(',')):
+        topics = make_topics(n, rng)
+        requests = make_requests(topics, rng)
+        build_s, index = best_of(lambda: TopicSimilarityIndex(topics), 1)
+        check(engine, index, topics, requests, args.limit)
+
+        # Add, rename and remove a few topics, then compare with the loop again
+        changed = topics[5:] + make_topics(5, rng, start=n)
+        changed[0] = {'id': changed[0]['id'], 'name': 'renamed ' + changed[0]['name']}
+        start = time.perf_counter()
+        index.update(changed)
+        update_s = time.perf_counter() - start
+        requests = make_requests(changed, rng)
+        check(engine, index, changed, requests, args.limit)
+        check(engine, TopicSimilarityIndex(changed), changed, requests, args.limit)
+
+        loop_s, _ = best_of(lambda: [recommend_topics_loop(engine, 'u', f, a, changed, args.limit)
+                                     for f, a in requests], 3)
+        fast_s, _ = best_of(lambda: [engine.recommend_topics('u', f, a, changed, args.limit, topic_index=index)
+                                     for f, a in requests], 3)
+        print(f"{n:>7} {build_s * 1000:>9.1f} {update_s * 1000:>10.2f} "
+              f"{loop_s / len(requests) * 1000:>9.2f} {fast_s / len(requests) * 1000:>9.2f}")
+
+if __name__ == '__main__':
+    main()
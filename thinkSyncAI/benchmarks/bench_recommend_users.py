@@ -0,0 +1,84 @@
+"""RecommendationEngine.recommend_users: sparse Jaccard vs per-user set loop.
+
+Compares synthetic users (no database) and checks both implementations
+return the same recommendations. The batch column times
+recommend_users_batch for every user.
+"""
+import argparse
+import random
+
+from benchmarks.common import make_users, best_of
+from recommendation_engine import RecommendationEngine, UserTopicIndex
+
+def recommend_users_loop(user_id, user_topics, all_users, user_following, limit=10):
+    """Previous implementation (with the common-topic bonus fixed)"""
+    following_set = set(user_following or [])
+    user_scores = []
+    if user_topics:
+        user_topic_ids = {topic['id'] for topic in user_topics}
+        for other_user in all_users:
+            if other_user['id'] == user_id or other_user['id'] in following_set:
+                continue
+            other_topics = {t['id'] for t in other_user.get('topics') or []}
+            if not other_topics:
+                continue
+            intersection = len(user_topic_ids & other_topics)
+            union = len(user_topic_ids | other_topics)
+            similarity = intersection / union
+            score = similarity * (1 + intersection * 0.1)
+            if score > 0:
+                user_scores.append({'user_id': other_user['id'], 'score': score, 'common_topics_count': intersection})
+    else:
+        for other_user in all_users:
+            if other_user['id'] == user_id or other_user['id'] in following_set:
+                continue
+            other_topics = other_user.get('topics') or []
+            if other_topics:
+                user_scores.append({'user_id': other_user['id'], 'score': min(len(other_topics) * 0.1, 1.0),
+                                    'common_topics_count': 0})
+    return sorted(user_scores, key=lambda x: x['score'], reverse=True)[:limit]
+
+def check_equivalent(expected, actual):
+    assert [e['user_id'] for e in expected] == [a['user_id'] for a in actual], 'ranking differs'
+    for e, a in zip(expected, actual):
+        assert abs(e['score'] - a['score']) < 1e-12 and e['common_topics_count'] == a['common_topics_count']
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--topics', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    engine = RecommendationEngine()
+    rng = random.Random(3)
+    print(f"{'users':>8} {'index ms':>9} {'loop ms':>9} {'sparse ms':>10} {'batch users/s':>14}")
+    for n in (int(s) for s in args.sizes.split(',')):
+        all_users = [
+            {'id': u['user_id'], 'username': u['user_id'], 'displayName': None, 'topics': u['user_topics']}
+            for u in make_users(n, n_topics=args.topics)
+        ]
+        build_s, index = best_of(lambda: UserTopicIndex(all_users), args.repeat)
+
+        sample = rng.sample(all_users, 20)
+        following = {u['id']: [v['id'] for v in rng.sample(all_users, 5)] for u in sample}
+        loop_s, expected = best_of(lambda: [recommend_users_loop(
+            u['id'], u['topics'], all_users, following[u['id']], args.limit) for u in sample], args.repeat)
+        fast_s, actual = best_of(lambda: [engine.recommend_users(
+            u['id'], u['topics'], all_users, following[u['id']], args.limit, user_index=index) for u in sample], args.repeat)
+        for e, a in zip(expected, actual):
+            check_equivalent(e, a)
+
+        batch_ids = [u['id'] for u in all_users[:2000]]
+        batch_s, batch = best_of(lambda: engine.recommend_users_batch(batch_ids, index, following, args.limit), 1)
+        for u in sample:
+            if u['id'] in batch:
+                check_equivalent(recommend_users_loop(u['id'], u['topics'], all_users, following[u['id']], args.limit),
+                                 batch[u['id']])
+
+        print(f"{n:>8} {build_s * 1000:>9.1f} {loop_s / len(sample) * 1000:>9.2f} "
+              f"{fast_s / len(sample) * 1000:>10.2f} {len(batch_ids) / batch_s:>14.0f}")
+
+if __name__ == '__main__':
+    main()
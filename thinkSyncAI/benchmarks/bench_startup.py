@@ -0,0 +1,138 @@
+"""Cold start time of the service and what its imports cost.
+
+Each run starts a fresh interpreter that imports app, serves one /health
+request, then warms up the topic catalog and user index (skip with
+--no-warm-up, which needs no database) until /ready answers 200. Separate
+runs under ``python -X importtime`` break the import down per module.
+
+Exits with status 1 when importing app takes longer than --budget-ms
+(median) or loads numpy, scipy, pandas or scikit-learn, which only the
+scoring paths and the warm-up should import.
+
+    BENCH_DATABASE_URL=postgresql://localhost/thinksync_bench python -m benchmarks.bench_startup --json startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import use_bench_database, summarize, write_results
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('numpy', 'scipy', 'pandas', 'sklearn')
+IMPORTED_MARKER = '--- app imported'
+
+# Runs in the child interpreter; prints its phase timings as JSON
+CHILD = f"""
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+print({IMPORTED_MARKER!r}, file=sys.stderr, flush=True)
+heavy = [name for name in {HEAVY_MODULES!r} if name in sys.modules]
+client = app.app.test_client()
+client.get('/health')
+served = time.perf_counter()
+ready = None
+if sys.argv[1] == 'warm':
+    app.warm_up()
+    ready = client.get('/ready').status_code
+warmed = time.perf_counter()
+print(json.dumps({{'import': imported - started, 'first_request': served - imported,
+                  'warm_up': warmed - served, 'heavy': heavy, 'ready': ready}}))
+"""
+
+def run_child(warm, importtime=False):
+    """(wall seconds from spawn to exit, child timings, stderr) of one cold start"""
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', CHILD, warm and 'warm' or 'cold']
+    started = time.perf_counter()
+    result = subprocess.run(command, cwd=SERVICE_DIR, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise SystemExit(f"Cold start failed:\n{result.stderr[-2000:]}")
+    return elapsed, json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+def import_breakdown(stderr):
+    """Cumulative seconds of app and of each module it imports directly, up to the marker"""
+    modules = {}
+    for line in stderr.split(IMPORTED_MARKER)[0].splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 1:
+            modules[name.strip()] = int(cumulative) / 1e6
+    return modules
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--no-warm-up', action='store_true', help='only import and serve /health; no database needed')
+    parser.add_argument('--budget-ms', type=float, default=400, help='maximum median time to import app')
+    parser.add_argument('--top', type=int, default=10, help='modules listed in the import breakdown')
+    parser.add_argument('--json', help='write the results to this file as JSON')
+    args = parser.parse_args()
+
+    if args.no_warm_up:
+        # config requires a URL; nothing connects without the warm-up
+        os.environ.setdefault('DATABASE_URL', 'postgresql://localhost/unused')
+    else:
+        use_bench_database()
+
+    interpreter = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        interpreter.append(time.perf_counter() - started)
+
+    phases = {'interpreter': interpreter, 'import app': [], 'first request': [], 'warm_up': [], 'total': []}
+    heavy = set()
+    for _ in range(args.runs):
+        elapsed, timings, _ = run_child(not args.no_warm_up)
+        phases['import app'].append(timings['import'])
+        phases['first request'].append(timings['first_request'])
+        phases['total'].append(elapsed)
+        if not args.no_warm_up:
+            phases['warm_up'].append(timings['warm_up'])
+            if timings['ready'] != 200:
+                raise SystemExit(f"/ready answered {timings['ready']} after warm_up()")
+        heavy.update(timings['heavy'])
+    if args.no_warm_up:
+        del phases['warm_up']
+
+    breakdowns = [import_breakdown(run_child(False, importtime=True)[2]) for _ in range(args.runs)]
+    modules = {name: statistics.median(b.get(name, 0.0) for b in breakdowns) for name in breakdowns[0]}
+
+    results = []
+    print(f"{'phase':<15} {'median ms':>10} {'min ms':>9}")
+    for phase, timings in phases.items():
+        stats = summarize(timings)
+        results.append({'benchmark': phase, 'posts': None, **stats})
+        print(f"{phase:<15} {stats['median_ms']:>10.1f} {stats['min_ms']:>9.1f}")
+
+    print(f"\n{'import (under -X importtime)':<30} {'cumulative ms':>14}")
+    imports = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]
+    for name, seconds in imports:
+        print(f"{name:<30} {seconds * 1000:>14.1f}")
+
+    import_ms = statistics.median(phases['import app']) * 1000
+    failures = []
+    if import_ms > args.budget_ms:
+        failures.append(f"importing app took {import_ms:.0f}ms, over the {args.budget_ms:g}ms budget")
+    if heavy:
+        failures.append(f"importing app loaded {', '.join(sorted(heavy))}")
+    for failure in failures:
+        print(f"\nFAIL: {failure}")
+
+    if args.json:
+        params = dict(vars(args), heavy_imports=sorted(heavy),
+                      imports={name: round(seconds * 1000, 2) for name, seconds in imports})
+        write_results(args.json, 'startup', params, results)
+    if failures:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""RecommendationEngine.calculate_trending_posts and rank_recent_posts: vectorized vs per-post loop.
+
+Runs on synthetic posts (no database) at 10k, 100k and 1M posts and checks
+that both implementations produce the same ranking. rank_recent_posts is
+the 24h fallback of /api/trending/posts.
+"""
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from benchmarks.common import make_posts, best_of
+from recommendation_engine import RecommendationEngine
+
+def calculate_trending_posts_loop(posts_with_metrics, time_window_hours=72, min_engagement=1, now=None):
+    """Previous implementation: scores one post dict at a time"""
+    trending_scores = []
+    now = now or datetime.now()
+    for post in posts_with_metrics or []:
+        try:
+            created_at = post.get('createdAt')
+            if not created_at:
+                continue
+            if isinstance(created_at, str):
+                created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+            age_hours = (now - created_at.replace(tzinfo=None)).total_seconds() / 3600
+            if age_hours > time_window_hours:
+                continue
+            likes = int(post.get('likes_count', 0) or 0)
+            comments = int(post.get('comments_count', 0) or 0)
+            bookmarks = int(post.get('bookmarks_count', 0) or 0)
+            views = int(post.get('views_count', 0) or 0)
+            engagement = likes + comments + bookmarks + views
+            if engagement < min_engagement:
+                continue
+            decay_factor = np.exp(-age_hours / 24)
+            velocity = engagement / age_hours if age_hours > 0 else engagement
+            trending_score = engagement * decay_factor * (1 + np.log1p(velocity) * 0.3)
+            if likes > 0:
+                discussion_factor = min(comments / likes, 3.0)
+                trending_score *= (1 + discussion_factor * 0.1)
+            trending_scores.append({
+                'post_id': post['id'],
+                'score': trending_score,
+                'metrics': {
+                    'likes': likes, 'comments': comments, 'bookmarks': bookmarks,
+                    'views': views, 'age_hours': age_hours, 'engagement': engagement
+                }
+            })
+        except Exception as e:
+            print(f"Error calculating trending post {post.get('id')}: {e}")
+    return sorted(trending_scores, key=lambda x: x['score'], reverse=True)
+
+def rank_recent_posts_loop(posts_with_metrics, window_hours=24, exclude_ids=(), now=None):
+    """Previous fallback of get_trending_posts: builds and sorts a dict per recent post"""
+    recent_threshold = (now or datetime.now()) - timedelta(hours=window_hours)
+    fallback_posts = []
+    for post in posts_with_metrics:
+        if post['id'] in exclude_ids:
+            continue
+        created_at = post.get('createdAt')
+        if not created_at:
+            continue
+        if isinstance(created_at, str):
+            try:
+                created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+            except ValueError:
+                continue
+        if created_at.replace(tzinfo=None) < recent_threshold:
+            continue
+        likes = int(post.get('likes_count', 0) or 0)
+        comments = int(post.get('comments_count', 0) or 0)
+        if likes > 0 or comments > 0:
+            score = (likes * 1.0) + (comments * 1.5)
+            fallback_posts.append({
+                'post_id': post['id'],
+                'score': score,
+                'metrics': {'likes': likes, 'comments': comments, 'bookmarks': 0, 'views': 0, 'engagement': score}
+            })
+    fallback_posts.sort(key=lambda x: x['score'], reverse=True)
+    return fallback_posts
+
+def check_equivalent(expected, actual, top):
+    assert [p['post_id'] for p in expected[:top]] == [p['post_id'] for p in actual[:top]], 'ranking differs'
+    for e, a in zip(expected[:top], actual[:top]):
+        assert abs(e['score'] - a['score']) <= 1e-9 * max(1.0, abs(e['score'])), 'score differs'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--window', type=int, default=72)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    engine = RecommendationEngine()
+    print(f"{'posts':>9} {'loop ms':>10} {'vector ms':>10} {'top-k ms':>10} {'speedup':>8} "
+          f"{'fallback loop ms':>17} {'fallback top-k ms':>18} {'speedup':>8}")
+    for n in (int(s) for s in args.sizes.split(',')):
+        posts = make_posts(n, max_age_hours=args.window * 4)
+        now = datetime.now()
+        loop_s, expected = best_of(lambda: calculate_trending_posts_loop(posts, args.window, now=now), args.repeat)
+        vec_s, full = best_of(lambda: engine.calculate_trending_posts(posts, args.window, now=now), args.repeat)
+        top_s, top = best_of(
+            lambda: engine.calculate_trending_posts(posts, args.window, limit=args.limit, now=now), args.repeat
+        )
+        check_equivalent(expected, full, len(expected))
+        check_equivalent(expected, top, args.limit)
+
+        exclude = {p['post_id'] for p in top}
+        fallback_loop_s, fallback_expected = best_of(
+            lambda: rank_recent_posts_loop(posts, exclude_ids=exclude, now=now), args.repeat
+        )
+        fallback_s, fallback = best_of(
+            lambda: engine.rank_recent_posts(posts, exclude_ids=exclude, limit=args.limit, now=now), args.repeat
+        )
+        assert fallback_expected[:args.limit] == fallback, 'fallback ranking differs'
+        print(f"{n:>9} {loop_s * 1000:>10.1f} {vec_s * 1000:>10.1f} {top_s * 1000:>10.1f} {loop_s / top_s:>7.1f}x "
+              f"{fallback_loop_s * 1000:>17.1f} {fallback_s * 1000:>18.1f} {fallback_loop_s / fallback_s:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+def use_bench_database():
+    """Point the service config at BENCH_DATABASE_URL; call before importing database"""
+    url = os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        sys.exit("BENCH_DATABASE_URL is not set (it must point at a scratch database).")
+    os.environ["DATABASE_URL"] = url
+    return url
+
+class QueryCounter:
+    """Counts execute() calls made through database.db_cursor()"""
+
+    def __init__(self):
+        self.count = 0
+
+@contextmanager
+def count_queries():
+    import database
+
+    counter = QueryCounter()
+    base_factory = database.RealDictCursor
+
+    class CountingCursor(base_factory):
+        def execute(self, query, vars=None):
+            counter.count += 1
+            return super().execute(query, vars)
+
+    database.RealDictCursor = CountingCursor
+    try:
+        yield counter
+    finally:
+        database.RealDictCursor = base_factory
+
+def measure(fn, repeat=5):
+    """Run fn repeatedly and return (median seconds, queries per call)"""
+    timings = []
+    with count_queries() as counter:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings), counter.count / repeat
+
+def reset_tables(cur):
+    cur.execute('TRUNCATE "User", "Topic" CASCADE')
+
+def seed_users(cur, n_users, n_topics=50, topics_per_user=5):
+    """Insert users that each follow a deterministic spread of topics"""
+    reset_tables(cur)
+    cur.execute("""
+        INSERT INTO "Topic" (id, name)
+        SELECT 'topic-' || g, 'Topic ' || g FROM generate_series(1, %s) g
+    """, (n_topics,))
+    cur.execute("""
+        INSERT INTO "User" (id, username, "displayName", "updatedAt")
+        SELECT 'user-' || g, 'user' || g, 'User ' || g, now()
+        FROM generate_series(1, %s) g
+    """, (n_users,))
+    cur.execute("""
+        INSERT INTO "UserTopic" (id, "userId", "topicId")
+        SELECT 'ut-' || u || '-' || k, 'user-' || u, 'topic-' || (1 + (u * 7 + k * 13) %% %s)
+        FROM generate_series(1, %s) u, generate_series(1, %s) k
+        ON CONFLICT DO NOTHING
+    """, (n_topics, n_users, topics_per_user))
+
+@contextmanager
+def capture_queries():
+    """Record (sql, params) for every query run through database.db_cursor() or get_db_connection()"""
+    import database
+
+    captured = []
+    base_factory = database.RealDictCursor
+    base_connect = database.get_db_connection
+
+    class CapturingCursor(base_factory):
+        def execute(self, query, vars=None):
+            captured.append((query, vars))
+            return super().execute(query, vars)
+
+    class CapturingPlainCursor(database.psycopg2.extensions.cursor):
+        def execute(self, query, vars=None):
+            captured.append((query, vars))
+            return super().execute(query, vars)
+
+    def connect():
+        # Dedicated connections (e.g. server-side scans) keep their plain tuple rows
+        conn = base_connect()
+        conn.cursor_factory = CapturingPlainCursor
+        return conn
+
+    database.RealDictCursor = CapturingCursor
+    database.get_db_connection = connect
+    try:
+        yield captured
+    finally:
+        database.RealDictCursor = base_factory
+        database.get_db_connection = base_connect
+
+def explain_analyze(cur, sql, params=None):
+    """Return the EXPLAIN ANALYZE JSON plan of a query"""
+    cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+    row = cur.fetchone()
+    return (row['QUERY PLAN'] if isinstance(row, dict) else row[0])[0]
+
+def plan_nodes(plan):
+    """Yield every node of an EXPLAIN JSON plan"""
+    stack = [plan['Plan'] if 'Plan' in plan else plan]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(node.get('Plans', []))
+
+def peak_rows(plan):
+    """Largest number of rows any single plan node produced"""
+    return max(node.get('Actual Rows', 0) * node.get('Actual Loops', 1) for node in plan_nodes(plan))
+
+def seed_engagement(cur, n_users=2000, n_posts=5000, n_topics=50, hot=60, skew=0.9):
+    """Seed posts whose likes, comments, bookmarks and views follow a power law.
+
+    The post ranked r gets about hot / r**skew likes, a quarter as many
+    comments, a tenth as many bookmarks and twice as many views.
+    """
+    seed_users(cur, n_users, n_topics=n_topics)
+    cur.execute("""
+        INSERT INTO "Post" (id, content, type, "authorId", "createdAt", "updatedAt")
+        SELECT 'post-' || g, 'Post ' || g, 'idea', 'user-' || (1 + g %% %s),
+               now() - (g * interval '7 minutes'), now()
+        FROM generate_series(1, %s) g
+    """, (n_users, n_posts))
+    cur.execute("""
+        INSERT INTO "PostTopic" (id, "postId", "topicId")
+        SELECT 'pt-' || g || '-' || k, 'post-' || g, 'topic-' || (1 + (g * 31 + k * 17) %% %s)
+        FROM generate_series(1, %s) g, generate_series(1, 2) k
+        ON CONFLICT DO NOTHING
+    """, (n_topics, n_posts))
+    # Ranks are scattered across posts so the hottest posts are not all the newest
+    engagement = """
+        INSERT INTO {table} ({columns})
+        SELECT {values}
+        FROM generate_series(1, %(posts)s) r,
+             LATERAL generate_series(1, LEAST(%(users)s, floor(%(hot)s * {scale} / power(r, %(skew)s))::int)) k
+    """
+    params = {'posts': n_posts, 'users': n_users, 'hot': hot, 'skew': skew}
+    post = "'post-' || (1 + (r * 7919) %% %(posts)s)"
+    cur.execute(engagement.format(
+        table='"Like"', columns='id, "userId", "postId"', scale=1,
+        values=f"'like-' || r || '-' || k, 'user-' || k, {post}"), params)
+    cur.execute(engagement.format(
+        table='"Comment"', columns='id, content, "authorId", "postId"', scale=0.25,
+        values=f"'comment-' || r || '-' || k, 'Comment', 'user-' || k, {post}"), params)
+    cur.execute(engagement.format(
+        table='"Bookmark"', columns='id, "userId", "postId"', scale=0.1,
+        values=f"'bookmark-' || r || '-' || k, 'user-' || k, {post}"), params)
+    cur.execute(engagement.format(
+        table='"UserActivity"', columns='id, "userId", type, "postId"', scale=2,
+        values=f"'view-' || r || '-' || k, 'user-' || (1 + k %% %(users)s), 'view_post', {post}"), params)
+    cur.execute('ANALYZE')
+
+def make_posts(n_posts, n_topics=50, max_age_hours=24 * 14, seed=42):
+    """Synthetic post dicts shaped like fetch_posts_with_metrics() rows.
+
+    Engagement is heavy-tailed (Pareto) so a few posts dominate, as in
+    production. No database is needed.
+    """
+    import random
+    from datetime import datetime, timedelta
+
+    rng = random.Random(seed)
+    now = datetime.now()
+    posts = []
+    for i in range(n_posts):
+        popularity = rng.paretovariate(1.2) - 1
+        topics = rng.sample(range(n_topics), k=min(n_topics, rng.randint(1, 3)))
+        posts.append({
+            'id': f'post-{i}',
+            'type': 'idea',
+            'authorId': f'user-{rng.randrange(max(n_posts // 10, 1))}',
+            'createdAt': now - timedelta(hours=rng.uniform(0, max_age_hours)),
+            'likes_count': int(popularity * 5),
+            'comments_count': int(popularity * rng.uniform(0, 2)),
+            'bookmarks_count': int(popularity * rng.uniform(0, 0.5)),
+            'views_count': int(popularity * 40) + rng.randint(0, 5),
+            'topics': [{'id': f'topic-{t}', 'name': f'Topic {t}'} for t in topics],
+        })
+    return posts
+
+def best_of(fn, repeat=3):
+    """Fastest wall-clock time of fn() over repeat runs, and its last result"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def make_users(n_users, n_topics=50, max_topics=8, seed=7):
+    """Synthetic users with topics and recent activity, as passed to the engine"""
+    import random
+
+    rng = random.Random(seed)
+    activity_types = ['view_post', 'like', 'comment', 'bookmark']
+    users = []
+    for i in range(n_users):
+        topics = rng.sample(range(n_topics), k=rng.randint(0, min(max_topics, n_topics)))
+        users.append({
+            'user_id': f'user-{i}',
+            'user_topics': [{'id': f'topic-{t}', 'name': f'Topic {t}'} for t in topics],
+            'user_activity': [{'type': rng.choice(activity_types)} for _ in range(rng.randint(0, 20))],
+        })
+    return users
+
+def summarize(timings):
+    """Millisecond statistics of a list of durations in seconds"""
+    ordered = sorted(timings)
+    return {
+        'runs': len(ordered),
+        'min_ms': round(ordered[0] * 1000, 3),
+        'median_ms': round(statistics.median(ordered) * 1000, 3),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'p95_ms': round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000, 3),
+    }
+
+def environment_info():
+    """Commit and machine the results were measured on, so result files can be compared"""
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+
+def write_results(path, suite, params, results):
+    """Write results as JSON; benchmarks.compare matches entries on (benchmark, posts)"""
+    with open(path, 'w') as f:
+        json.dump({'suite': suite, 'environment': environment_info(), 'params': params, 'results': results},
+                  f, indent=2, default=str)
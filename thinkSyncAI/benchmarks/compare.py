@@ -0,0 +1,57 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python -m benchmarks.compare base.json new.json --threshold 10
+
+Entries of bench_engine, bench_endpoints and bench_startup --json files are
+matched on (benchmark, posts). A benchmark regresses when --metric grows by more than
+--threshold percent; the command then exits with status 1. Timings are only
+comparable when both files were measured on the same machine.
+"""
+import argparse
+import json
+
+def load(path):
+    with open(path) as f:
+        data = json.load(f)
+    return data, {(result['benchmark'], result['posts']): result for result in data['results']}
+
+def order(key):
+    return (key[1] or 0, key[0])
+
+def posts(key):
+    return '-' if key[1] is None else f"{key[1]:,}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--metric', default='median_ms', choices=['min_ms', 'median_ms', 'mean_ms', 'p95_ms'])
+    parser.add_argument('--threshold', type=float, default=10, help='percent slowdown counted as a regression')
+    args = parser.parse_args()
+
+    base_data, base = load(args.base)
+    new_data, new = load(args.new)
+    if base_data['suite'] != new_data['suite']:
+        raise SystemExit(f"Cannot compare a {base_data['suite']} run with a {new_data['suite']} run.")
+    for key in ('platform', 'cpus', 'python'):
+        if base_data['environment'].get(key) != new_data['environment'].get(key):
+            print(f"Warning: {key} differs ({base_data['environment'].get(key)} vs {new_data['environment'].get(key)})")
+    print(f"base {base_data['environment'].get('commit') or '?'}  new {new_data['environment'].get('commit') or '?'}")
+
+    regressions = 0
+    print(f"{'benchmark':<30} {'posts':>9} {'base ms':>10} {'new ms':>10} {'change':>8}")
+    for key in sorted(base.keys() & new.keys(), key=order):
+        before, after = base[key][args.metric], new[key][args.metric]
+        change = (after - before) / before * 100 if before else 0.0
+        regressed = change > args.threshold
+        regressions += regressed
+        print(f"{key[0]:<30} {posts(key):>9} {before:>10.3f} {after:>10.3f} {change:>+7.1f}%{'  !' if regressed else ''}")
+    for key in sorted(base.keys() ^ new.keys(), key=order):
+        print(f"{key[0]:<30} {posts(key):>9} only in {'base' if key in base else 'new'}")
+
+    print(f"\n{regressions} regression(s) over {args.threshold:g}% in {args.metric}")
+    if regressions:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
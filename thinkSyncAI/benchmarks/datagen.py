@@ -0,0 +1,334 @@
+"""Seeded synthetic ThinkSync data: users, topics, posts, follows and skewed engagement.
+
+The same SyntheticData gives the pure-engine benchmarks the dicts database.py
+returns and seeds a Postgres database migrated with the Prisma schema for the
+end-to-end benchmarks::
+
+    BENCH_DATABASE_URL=postgresql://localhost/thinksync_bench python -m benchmarks.datagen --posts 1000000
+
+Popularity is heavy-tailed everywhere: low-numbered topics get most posts
+and followers, low-numbered users write, like, comment and get followed the
+most, and per-post engagement follows a Pareto distribution that grows with
+the post's age over its first two days. Every entity is generated from its
+own seeded random stream, so any slice of the data is the same whatever the
+scale it is generated at.
+"""
+import argparse
+import io
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+
+SUBJECTS = [
+    'Machine Learning', 'Databases', 'Product Design', 'Startups', 'Climate', 'Robotics', 'Open Source',
+    'Web Development', 'Security', 'Economics', 'Photography', 'Music Production', 'Neuroscience',
+    'Space', 'Education', 'Game Design', 'Writing', 'Philosophy', 'Healthcare', 'Cooking',
+    'Mobile Apps', 'Cloud Computing', 'Data Visualization', 'Quantum Computing', 'Urban Planning',
+]
+QUALIFIERS = [
+    '', 'Applied', 'Modern', 'Practical', 'Distributed', 'Sustainable', 'Creative', 'Advanced',
+    'Beginner', 'Ethical', 'Local', 'Global', 'Experimental', 'Open', 'Scalable', 'Human-Centered',
+]
+CONTENT_TEMPLATES = [
+    'Some thoughts on {topic} after a week of reading papers.',
+    'What is the most underrated idea in {topic}? Here is mine.',
+    'Started a side project about {topic}, looking for feedback.',
+    'A short thread on mistakes I made learning {topic}.',
+    'Is anyone else tracking the latest work in {topic}? Curious what you think.',
+    'Three resources that changed how I approach {topic}.',
+]
+# A small share of posts trips the moderation keyword lists
+FLAGGED_SUFFIXES = [' Click here to buy now!', ' This is damn hard.', ' Free money for the winner.']
+# Engagement kind -> (table, "UserActivity" type recorded alongside each row)
+ENGAGEMENT_TABLES = {'likes': ('Like', 'like'), 'comments': ('Comment', 'comment'), 'bookmarks': ('Bookmark', 'bookmark')}
+TABLES = ('Topic', 'User', 'UserTopic', 'Follows', 'Post', 'PostTopic', 'Like', 'Comment', 'Bookmark', 'UserActivity')
+
+def topic_name(index):
+    """Readable, unique topic names that share words like real catalogs do"""
+    subject = SUBJECTS[index % len(SUBJECTS)]
+    qualifier = QUALIFIERS[(index // len(SUBJECTS)) % len(QUALIFIERS)]
+    name = f"{qualifier} {subject}".strip()
+    round_ = index // (len(SUBJECTS) * len(QUALIFIERS))
+    return f"{name} {round_ + 1}" if round_ else name
+
+def zipf_weights(n, skew=1.0):
+    """Cumulative weights of ranks 1..n, the rank r weighing 1 / r**skew"""
+    return list(itertools.accumulate(1 / rank ** skew for rank in range(1, n + 1)))
+
+class SyntheticData:
+    """Deterministic synthetic data for a number of posts.
+
+    Users default to a tenth of the posts (at least 100) and topics to one
+    per 200 posts (between 50 and 2000). Post 1 is the newest; posts are
+    spread over the last ``days`` days.
+    """
+
+    def __init__(self, posts, users=None, topics=None, seed=42, days=30, now=None):
+        self.n_posts = posts
+        self.n_users = users or max(posts // 10, 100)
+        self.n_topics = topics or min(max(posts // 200, 50), 2000)
+        self.seed = seed
+        self.days = days
+        self.now = now or datetime.utcnow().replace(microsecond=0)
+        self._user_weights = zipf_weights(self.n_users)
+        self._topic_weights = zipf_weights(self.n_topics)
+        self._topics = [{'id': f'topic-{t}', 'name': topic_name(t - 1)} for t in range(1, self.n_topics + 1)]
+
+    def _rng(self, kind, index):
+        return random.Random(f"{self.seed}:{kind}:{index}")
+
+    def _pick(self, rng, weights, k, exclude=None):
+        """Up to k distinct indexes drawn by weight"""
+        picked = dict.fromkeys(rng.choices(range(len(weights)), cum_weights=weights, k=k))
+        picked.pop(exclude, None)
+        return list(picked)
+
+    # ---------------------------
+    # Topics and users
+    # ---------------------------
+    def topics(self):
+        """Rows shaped like fetch_all_topics()"""
+        return [dict(topic) for topic in self._topics]
+
+    def user(self, index):
+        """User index (0-based) shaped like a fetch_all_users() row"""
+        return {
+            'id': f'user-{index + 1}',
+            'username': f'user{index + 1}',
+            'displayName': f'User {index + 1}',
+            'topics': self.user_topics(index),
+        }
+
+    def users(self):
+        """Every user, shaped like fetch_all_users()"""
+        return [self.user(index) for index in range(self.n_users)]
+
+    def user_topics(self, index):
+        """Topics user index follows, shaped like fetch_user_topics(); popular topics are followed most"""
+        rng = self._rng('user_topics', index)
+        count = min(int(rng.expovariate(1 / 4)), 12)
+        return [dict(self._topics[t]) for t in self._pick(rng, self._topic_weights, count)]
+
+    def following(self, index):
+        """Ids of the users user index follows, shaped like fetch_user_following()"""
+        rng = self._rng('follows', index)
+        count = min(int(rng.paretovariate(1.3) * 5) - 5, 500)
+        return [f'user-{u + 1}' for u in self._pick(rng, self._user_weights, count, exclude=index)]
+
+    def user_activity(self, index, limit=200):
+        """Recent activity of user index, shaped like fetch_user_activity(); active users have more"""
+        rng = self._rng('activity', index)
+        count = min(int(rng.paretovariate(1.2) * 5), limit)
+        types = rng.choices(['view_post', 'like', 'comment', 'bookmark'], weights=[6, 2, 1, 1], k=count)
+        return [
+            {'id': f'activity-{index + 1}-{k}', 'type': activity_type,
+             'postId': f'post-{rng.randint(1, self.n_posts)}', 'topicId': None, 'targetId': None,
+             'metadata': None, 'createdAt': self.now - timedelta(hours=k)}
+            for k, activity_type in enumerate(types)
+        ]
+
+    # ---------------------------
+    # Posts and engagement
+    # ---------------------------
+    def _post(self, index):
+        """Post index (0-based, newest first) and its engagement as (user index, created at) lists"""
+        rng = self._rng('post', index)
+        span = self.days * 86400
+        created_at = self.now - timedelta(seconds=int(span * index / self.n_posts) + rng.randint(0, 59))
+        age = (self.now - created_at).total_seconds()
+        topic_ids = self._pick(rng, self._topic_weights, rng.randint(1, 3))
+        author = self._pick(rng, self._user_weights, 1)[0]
+
+        # Engagement builds up over a post's first two days
+        popularity = (rng.paretovariate(1.5) - 1) * min(1.0, 0.2 + age / 172800)
+
+        def when():
+            return created_at + timedelta(seconds=int(age * rng.random() ** 2))
+
+        engagement = {
+            'likes': self._pick(rng, self._user_weights, int(popularity * 2)),
+            'comments': rng.choices(range(self.n_users), cum_weights=self._user_weights,
+                                    k=int(popularity * rng.uniform(0, 1.5))),
+            'bookmarks': self._pick(rng, self._user_weights, int(popularity * rng.uniform(0, 0.5))),
+            'views': rng.choices(range(self.n_users), cum_weights=self._user_weights,
+                                 k=int(popularity * 3) + rng.randint(0, 3)),
+        }
+        engagement = {kind: [(user, when()) for user in users] for kind, users in engagement.items()}
+
+        topic = self._topics[topic_ids[0]]['name']
+        content = rng.choice(CONTENT_TEMPLATES).format(topic=topic)
+        if rng.random() < 0.03:
+            content += rng.choice(FLAGGED_SUFFIXES)
+        post = {
+            'id': f'post-{index + 1}',
+            'content': content,
+            'type': 'idea',
+            'authorId': f'user-{author + 1}',
+            'createdAt': created_at,
+            'updatedAt': created_at,
+            'author_id': f'user-{author + 1}',
+            'author_username': f'user{author + 1}',
+            'author_display_name': f'User {author + 1}',
+            'likes_count': len(engagement['likes']),
+            'comments_count': len(engagement['comments']),
+            'bookmarks_count': len(engagement['bookmarks']),
+            'views_count': len(engagement['views']),
+            'topics': [dict(self._topics[t]) for t in topic_ids],
+            'mentions': [],
+            'media': [],
+            'links': [],
+        }
+        return post, engagement
+
+    def posts(self, limit=None):
+        """Newest posts first, shaped like fetch_posts_with_metrics() rows"""
+        for index in range(min(limit or self.n_posts, self.n_posts)):
+            yield self._post(index)[0]
+
+    def topics_with_metrics(self, posts, users=None):
+        """Per-topic aggregates of posts, shaped like fetch_all_topics_with_metrics()"""
+        followers = {}
+        for user in users or ():
+            for topic in user['topics']:
+                followers[topic['id']] = followers.get(topic['id'], 0) + 1
+        totals = {}
+        for post in posts:
+            for topic in post['topics']:
+                row = totals.setdefault(topic['id'], {
+                    'id': topic['id'], 'name': topic['name'], 'user_count': followers.get(topic['id'], 0),
+                    'post_count': 0, 'total_likes': 0, 'total_comments': 0, 'total_views': 0,
+                    'last_post_date': post['createdAt'],
+                })
+                row['post_count'] += 1
+                row['total_likes'] += post['likes_count']
+                row['total_comments'] += post['comments_count']
+                row['total_views'] += post['views_count']
+                row['last_post_date'] = max(row['last_post_date'], post['createdAt'])
+        return sorted(totals.values(),
+                      key=lambda t: (t['post_count'], t['total_likes'], t['last_post_date']), reverse=True)
+
+    # ---------------------------
+    # Postgres
+    # ---------------------------
+    def seed_database(self, cur, chunk_rows=50000):
+        """Replace the contents of the benchmark database with this data; returns rows per table"""
+        check_schema(cur)
+        cur.execute('TRUNCATE "User", "Topic", "AggregateWatermark" CASCADE')
+        writer = _CopyWriter(cur, chunk_rows)
+        now = self.now.isoformat()
+
+        for topic in self._topics:
+            writer.add('Topic', (topic['id'], topic['name']))
+        for index in range(self.n_users):
+            user_id = f'user-{index + 1}'
+            writer.add('User', (user_id, f'user{index + 1}', f'User {index + 1}', now, now))
+            for topic in self.user_topics(index):
+                writer.add('UserTopic', (f"ut-{index + 1}-{topic['id']}", user_id, topic['id']))
+            for following in self.following(index):
+                writer.add('Follows', (f'follow-{index + 1}-{following}', user_id, following, now))
+        writer.flush()
+
+        for index in range(self.n_posts):
+            post, engagement = self._post(index)
+            post_id = post['id']
+            created_at = post['createdAt'].isoformat()
+            writer.add('Post', (post_id, post['content'], post['type'], post['authorId'], created_at, created_at))
+            for topic in post['topics']:
+                writer.add('PostTopic', (f"pt-{index + 1}-{topic['id']}", post_id, topic['id']))
+            for kind, (table, activity_type) in ENGAGEMENT_TABLES.items():
+                for k, (user, at) in enumerate(engagement[kind]):
+                    row_id = f'{activity_type}-{index + 1}-{k}'
+                    user_id, at = f'user-{user + 1}', at.isoformat()
+                    if table == 'Comment':
+                        writer.add(table, (row_id, 'Comment', user_id, post_id, at))
+                    else:
+                        writer.add(table, (row_id, user_id, post_id, at))
+                    writer.add('UserActivity', (f'activity-{row_id}', user_id, activity_type, post_id, at))
+            for k, (user, at) in enumerate(engagement['views']):
+                writer.add('UserActivity', (f'view-{index + 1}-{k}', f'user-{user + 1}', 'view_post', post_id,
+                                            at.isoformat()))
+            writer.flush_if_full()
+        writer.flush()
+        cur.execute('ANALYZE')
+        return writer.counts
+
+def check_schema(cur):
+    """Fail unless the Prisma migrations have created every table the seed writes"""
+    cur.execute("""
+        SELECT table_name FROM information_schema.tables
+        WHERE table_schema = 'public' AND table_name = ANY(%s)
+    """, (list(TABLES),))
+    found = {row['table_name'] if isinstance(row, dict) else row[0] for row in cur.fetchall()}
+    missing = [table for table in TABLES if table not in found]
+    if missing:
+        raise SystemExit(f"Tables {', '.join(missing)} are missing; run `npx prisma migrate deploy` "
+                         "in thinkSyncBE against BENCH_DATABASE_URL first.")
+
+# Columns written per table, in COPY order
+COLUMNS = {
+    'Topic': ('id', 'name'),
+    'User': ('id', 'username', 'displayName', 'createdAt', 'updatedAt'),
+    'UserTopic': ('id', 'userId', 'topicId'),
+    'Follows': ('id', 'followerId', 'followingId', 'createdAt'),
+    'Post': ('id', 'content', 'type', 'authorId', 'createdAt', 'updatedAt'),
+    'PostTopic': ('id', 'postId', 'topicId'),
+    'Like': ('id', 'userId', 'postId', 'createdAt'),
+    'Comment': ('id', 'content', 'authorId', 'postId', 'createdAt'),
+    'Bookmark': ('id', 'userId', 'postId', 'createdAt'),
+    'UserActivity': ('id', 'userId', 'type', 'postId', 'createdAt'),
+}
+
+class _CopyWriter:
+    """Buffers rows per table and COPYs them in foreign key order"""
+
+    def __init__(self, cur, chunk_rows):
+        self.cur = cur
+        self.chunk_rows = chunk_rows
+        self.buffers = {table: [] for table in COLUMNS}
+        self.pending = 0
+        self.counts = dict.fromkeys(COLUMNS, 0)
+
+    def add(self, table, row):
+        # Generated values never contain tabs, newlines or backslashes
+        self.buffers[table].append('\t'.join(row))
+        self.pending += 1
+
+    def flush_if_full(self):
+        if self.pending >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        for table, rows in self.buffers.items():
+            if not rows:
+                continue
+            columns = ', '.join(f'"{column}"' for column in COLUMNS[table])
+            self.cur.copy_expert(f'COPY "{table}" ({columns}) FROM STDIN', io.StringIO('\n'.join(rows) + '\n'))
+            self.counts[table] += len(rows)
+            rows.clear()
+        self.pending = 0
+
+def main():
+    from benchmarks.common import use_bench_database
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--users', type=int, help='default: posts / 10, at least 100')
+    parser.add_argument('--topics', type=int, help='default: posts / 200, between 50 and 2000')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--days', type=float, default=30, help='posts are spread over this many days')
+    args = parser.parse_args()
+
+    use_bench_database()
+    from database import db_cursor
+
+    data = SyntheticData(args.posts, users=args.users, topics=args.topics, seed=args.seed, days=args.days)
+    started = time.perf_counter()
+    with db_cursor() as cur:
+        counts = data.seed_database(cur)
+    for table, count in counts.items():
+        print(f"{table:>13} {count:>11,}")
+    print(f"Seeded {args.posts:,} posts in {time.perf_counter() - started:.1f}s")
+
+if __name__ == '__main__':
+    main()
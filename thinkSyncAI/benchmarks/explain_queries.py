@@ -0,0 +1,185 @@
+"""EXPLAIN ANALYZE every query in database.py and flag sequential scans.
+
+Seeds BENCH_DATABASE_URL with power-law engagement (skip with --no-seed to
+use the data already there), calls each database.py function, captures
+the SQL it runs and explains it. Read functions run with and without
+USE_ENGAGEMENT_SUMMARY.
+
+Sequential scans of tables with at least --min-rows rows that the call is
+not expected to read in full are re-planned with sequential scans, hash
+and merge joins disabled. Tables still read in full have no usable index
+and are flagged (!); the others are the planner preferring a scan although
+an index exists (~), which depends on table sizes. Exits with status 1 when
+anything is flagged.
+
+    BENCH_DATABASE_URL=postgresql://localhost/thinksync_bench python -m benchmarks.explain_queries
+"""
+import argparse
+import json
+from datetime import datetime
+
+from benchmarks.common import use_bench_database, capture_queries, explain_analyze, plan_nodes, seed_engagement
+
+use_bench_database()
+
+import database
+from database import db_cursor
+
+USER = 'user-1'
+TOPICS = ['topic-1', 'topic-2', 'topic-3']
+
+# name -> (call, tables it reads in full by design)
+CALLS = {
+    'fetch_user_topics': (lambda: database.fetch_user_topics(USER), ()),
+    'fetch_user_activity': (lambda: database.fetch_user_activity(USER, limit=200), ()),
+    'fetch_all_topics': (lambda: database.fetch_all_topics(), ('Topic',)),
+    'fetch_topics_version': (lambda: database.fetch_topics_version(), ('Topic',)),
+    'fetch_all_users': (lambda: database.fetch_all_users(), ('Topic', 'User', 'UserTopic')),
+    'fetch_posts_with_metrics(72h)': (
+        lambda: database.fetch_posts_with_metrics(max_age_hours=72, limit=5000), ()
+    ),
+    'fetch_posts_with_metrics(limit)': (lambda: database.fetch_posts_with_metrics(limit=60), ()),
+    'fetch_all_topics_with_metrics': (
+        lambda: database.fetch_all_topics_with_metrics(),
+        ('Topic', 'Post', 'PostTopic', 'UserTopic', 'Like', 'Comment', 'UserActivity', 'PostEngagement'),
+    ),
+    'fetch_user_following': (lambda: database.fetch_user_following(USER), ()),
+    'fetch_posts_by_topics': (lambda: database.fetch_posts_by_topics(TOPICS, limit=60), ()),
+    'fetch_posts_by_user_topics': (lambda: database.fetch_posts_by_user_topics(USER, limit=60), ()),
+}
+
+# Run once, after the read calls; they write to the scratch database
+WRITE_CALLS = {
+    'refresh_post_engagement': (lambda: database.refresh_post_engagement(), ()),
+    'fetch_aggregate_watermark': (lambda: database.fetch_aggregate_watermark('user_feed'), ()),
+    'save_aggregate_watermark': (lambda: database.save_aggregate_watermark('user_feed', datetime.utcnow()), ()),
+    'fetch_feed_refresh_user_ids': (
+        lambda: database.fetch_feed_refresh_user_ids(
+            active_since=datetime(2000, 1, 1), posts_since=datetime.utcnow(), stale_before=datetime(2000, 1, 1)
+        ),
+        ('UserActivity',),
+    ),
+    'fetch_feed_users': (lambda: database.fetch_feed_users([USER, 'user-2']), ()),
+    'save_materialized_feeds': (lambda: database.save_materialized_feeds([(USER, [])], datetime.utcnow()), ()),
+    'fetch_materialized_feed': (lambda: database.fetch_materialized_feed(USER, 3600), ()),
+    'delete_materialized_feeds': (lambda: database.delete_materialized_feeds(datetime(2000, 1, 1)), ()),
+    'iter_moderation_content': (
+        lambda: next(database.iter_moderation_content('post', chunk_size=100), None), ('Post',)
+    ),
+    'update_moderation_statuses': (
+        lambda: database.update_moderation_statuses('post', [('post-1', 'okay')]), ()
+    ),
+}
+
+def table_sizes(cur):
+    cur.execute("""
+        SELECT relname, GREATEST(reltuples, 0)::bigint AS n
+        FROM pg_class
+        WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace
+    """)
+    return {row['relname']: row['n'] for row in cur.fetchall()}
+
+def unindexed_tables(cur, sql, params):
+    """Tables still read in full when the planner avoids full scans wherever it can"""
+    # Without hash and merge joins, joined tables are probed through an index when one fits
+    for setting in ('enable_seqscan', 'enable_hashjoin', 'enable_mergejoin'):
+        cur.execute(f"SET LOCAL {setting} = off")
+    cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+    row = cur.fetchone()
+    plan = row['QUERY PLAN'][0]
+    # An index scan without an index condition walks the whole index instead
+    return {
+        node['Relation Name'] for node in plan_nodes(plan)
+        if node['Node Type'] == 'Seq Scan'
+        or (node['Node Type'] in ('Index Scan', 'Index Only Scan') and 'Index Cond' not in node)
+    }
+
+def explain_call(name, call, full_scans, sizes, min_rows):
+    """EXPLAIN ANALYZE each query a call runs; returns one result per query"""
+    with capture_queries() as captured:
+        call()
+
+    results = []
+    conn = database.get_db_connection()
+    try:
+        for number, (sql, params) in enumerate(captured, 1):
+            if isinstance(sql, bytes):
+                sql = sql.decode(conn.encoding if conn.encoding != 'UTF8' else 'utf-8')
+            with conn.cursor(cursor_factory=database.RealDictCursor) as cur:
+                # Rolled back, so explaining a write leaves no trace
+                plan = explain_analyze(cur, sql, params)
+                conn.rollback()
+                seq_scans = [
+                    {'table': node['Relation Name'], 'rows': node['Actual Rows'] * node['Actual Loops']}
+                    for node in plan_nodes(plan) if node['Node Type'] == 'Seq Scan'
+                ]
+                suspect = {scan['table'] for scan in seq_scans
+                           if sizes.get(scan['table'], 0) >= min_rows and scan['table'] not in full_scans}
+                unindexed = unindexed_tables(cur, sql, params) & suspect if suspect else set()
+                conn.rollback()
+            for scan in seq_scans:
+                scan['flagged'] = scan['table'] in unindexed
+                scan['index_available'] = scan['table'] in suspect - unindexed
+            results.append({
+                'call': name,
+                'query': number,
+                'sql': ' '.join(sql.split())[:200],
+                'execution_ms': round(plan['Execution Time'], 2),
+                'seq_scans': seq_scans,
+            })
+    finally:
+        conn.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--no-seed', action='store_true', help='explain against the data already in the database')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--topics', type=int, default=500,
+                        help='more topics make topic filters more selective, as in production')
+    parser.add_argument('--min-rows', type=int, default=1000,
+                        help='ignore sequential scans of tables smaller than this')
+    parser.add_argument('--json', help='write the results to this file as JSON')
+    args = parser.parse_args()
+
+    if not args.no_seed:
+        with db_cursor() as cur:
+            seed_engagement(cur, n_users=args.users, n_posts=args.posts, n_topics=args.topics)
+    with db_cursor() as cur:
+        sizes = table_sizes(cur)
+
+    results = []
+    for summary in (False, True):
+        database.USE_ENGAGEMENT_SUMMARY = summary
+        if summary:
+            # Read paths over the summary table need it populated
+            database.refresh_post_engagement(full=True)
+            with db_cursor() as cur:
+                cur.execute('ANALYZE "PostEngagement"')
+        for name, (call, full_scans) in CALLS.items():
+            label = f"{name} [summary]" if summary else name
+            results.extend(explain_call(label, call, full_scans, sizes, args.min_rows))
+    database.USE_ENGAGEMENT_SUMMARY = False
+    for name, (call, full_scans) in WRITE_CALLS.items():
+        results.extend(explain_call(name, call, full_scans, sizes, args.min_rows))
+
+    flagged = 0
+    print(f"{'call':<46} {'#':>2} {'ms':>9}  sequential scans (! = no usable index, ~ = index not chosen)")
+    for result in results:
+        scans = ', '.join(
+            f"{'!' if scan['flagged'] else '~' if scan['index_available'] else ''}{scan['table']} ({scan['rows']:,} rows)"
+            for scan in result['seq_scans']
+        )
+        flagged += sum(scan['flagged'] for scan in result['seq_scans'])
+        print(f"{result['call']:<46} {result['query']:>2} {result['execution_ms']:>9.2f}  {scans or '-'}")
+    print(f"\n{flagged} flagged sequential scan(s) in {len(results)} queries")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'min_rows': args.min_rows, 'table_sizes': sizes, 'results': results}, f, indent=2)
+    if flagged:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""HTTP load test for a running service: requests/s and latency percentiles per endpoint.
+
+    gunicorn -c gunicorn.conf.py app:app        # in another shell
+    python -m benchmarks.load_test --url http://localhost:5001 --duration 10 --concurrency 16
+
+Each endpoint is loaded in turn by --concurrency keep-alive connections for
+--duration seconds; moderation_batch sends BATCH_ITEMS contents per request. User ids come from --user-ids or are sampled from
+BENCH_DATABASE_URL. --json writes the results in machine-readable form.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+SAMPLE_TEXT = 'Sharing a few thoughts on open source machine learning tools. Click here to read more!'
+BATCH_ITEMS = 50
+
+# name -> (method, path, body factory taking a user id)
+ENDPOINTS = {
+    'health': ('GET', '/health', None),
+    'ready': ('GET', '/ready', None),
+    'metrics': ('GET', '/metrics', None),
+    'trending_topics': ('GET', '/api/trending/topics?limit=20&timeWindow=168', None),
+    'trending_posts': ('GET', '/api/trending/posts?limit=20&timeWindow=72', None),
+    'recommend_topics': ('POST', '/api/recommend/topics', lambda user_id: {'userId': user_id, 'limit': 10}),
+    'recommend_users': ('POST', '/ai/recommend/users', lambda user_id: {'userId': user_id, 'limit': 10}),
+    'feed': ('POST', '/api/feed/personalized', lambda user_id: {'userId': user_id, 'limit': 20}),
+    'moderation': ('POST', '/ai/moderation/analyze', lambda user_id: {'content': f'{SAMPLE_TEXT} {user_id}'}),
+    'moderation_batch': ('POST', '/ai/moderation/analyze/batch', lambda user_id: {'items': [
+        {'id': f'{user_id}-{i}', 'content': f'{SAMPLE_TEXT} {user_id} {i}'} for i in range(BATCH_ITEMS)
+    ]}),
+}
+
+def sample_user_ids(count):
+    url = os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        raise SystemExit("Pass --user-ids or set BENCH_DATABASE_URL to sample users.")
+    import psycopg2
+
+    with psycopg2.connect(url) as conn, conn.cursor() as cur:
+        cur.execute('SELECT id FROM "User" ORDER BY random() LIMIT %s', (count,))
+        return [row[0] for row in cur.fetchall()]
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+def load_endpoint(url, name, user_ids, duration, concurrency, timeout):
+    method, path, body = ENDPOINTS[name]
+    target = urlsplit(url)
+    deadline = time.perf_counter() + duration
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+
+    def connect():
+        return http.client.HTTPConnection(target.hostname, target.port or 80, timeout=timeout)
+
+    def send(conn, payload):
+        headers = {'Content-Type': 'application/json'} if payload else {}
+        conn.request(method, path, body=payload, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        return response.status
+
+    def worker(seed):
+        rng = random.Random(seed)
+        conn = connect()
+        own = []
+        failed = 0
+        while time.perf_counter() < deadline:
+            payload = json.dumps(body(rng.choice(user_ids))) if body else None
+            started = time.perf_counter()
+            try:
+                try:
+                    status = send(conn, payload)
+                except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                    # Kept-alive connection closed by a recycled worker: retry once, like HTTP clients do
+                    conn.close()
+                    conn = connect()
+                    status = send(conn, payload)
+                if status >= 400:
+                    failed += 1
+                else:
+                    own.append(time.perf_counter() - started)
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = connect()
+        conn.close()
+        with lock:
+            latencies.extend(own)
+            errors[0] += failed
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'endpoint': name,
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2) if latencies else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5001')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help='comma-separated subset of: ' + ', '.join(ENDPOINTS))
+    parser.add_argument('--duration', type=float, default=10, help='seconds per endpoint')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--user-ids', help='comma-separated user ids to send')
+    parser.add_argument('--json', help='write the results to this file as JSON')
+    args = parser.parse_args()
+
+    user_ids = args.user_ids.split(',') if args.user_ids else sample_user_ids(200)
+    results = []
+    print(f"{'endpoint':>17} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name in args.endpoints.split(','):
+        result = load_endpoint(args.url, name, user_ids, args.duration, args.concurrency, args.timeout)
+        results.append(result)
+        print(f"{name:>17} {result['requests']:>9} {result['errors']:>7} {result['rps']:>8} "
+              f"{result['p50_ms'] or '-':>8} {result['p95_ms'] or '-':>8} {result['p99_ms'] or '-':>8}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'url': args.url, 'concurrency': args.concurrency, 'duration': args.duration,
+                       'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
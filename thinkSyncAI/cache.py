@@ -0,0 +1,232 @@
+import json
+import threading
+import time
+from concurrent.futures import Future
+
+class LocalCacheBackend:
+    """In-process cache storage; each worker process has its own copy.
+
+    Holds at most max_entries keys: when full, set() drops expired entries
+    and then the oldest ones.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (value, stored_at) or None"""
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, stored_at, expires_at = entry
+        if time.time() >= expires_at:
+            with self._lock:
+                self._data.pop(key, None)
+            return None
+        return value, stored_at
+
+    def set(self, key, value, stored_at, expire_in):
+        now = time.time()
+        with self._lock:
+            # Re-inserting moves the key to the end, so the first keys are the oldest
+            self._data.pop(key, None)
+            if len(self._data) >= self.max_entries:
+                for old_key in [k for k, entry in self._data.items() if now >= entry[2]]:
+                    del self._data[old_key]
+            while len(self._data) >= self.max_entries:
+                del self._data[next(iter(self._data))]
+            self._data[key] = (value, stored_at, now + expire_in)
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+class RedisCacheBackend:
+    """Cache storage shared by several worker processes through Redis.
+
+    Values must be JSON serializable. Requires the optional ``redis`` package.
+    """
+
+    def __init__(self, url, prefix='thinksync:cache:'):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_URL is set but the 'redis' package is not installed") from e
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self._prefix + key)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        return entry['value'], entry['stored_at']
+
+    def set(self, key, value, stored_at, expire_in):
+        payload = json.dumps({'value': value, 'stored_at': stored_at}, default=str)
+        self._client.set(self._prefix + key, payload, ex=max(int(expire_in), 1))
+
+    def clear(self):
+        for key in self._client.scan_iter(self._prefix + '*'):
+            self._client.delete(key)
+
+class TTLCache:
+    """Read-through cache with single-flight misses and stale-while-revalidate.
+
+    Entries younger than ``ttl`` seconds are served as hits. Entries up to
+    ``stale_ttl`` seconds past that are still served, while one background
+    thread recomputes them. Concurrent misses for the same key share a
+    single computation.
+    """
+
+    def __init__(self, backend=None, ttl=60, stale_ttl=300):
+        self.backend = backend if backend is not None else LocalCacheBackend()
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'errors': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, calling compute() to fill it if needed"""
+        if self.ttl <= 0:
+            return compute()
+        entry = self.backend.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.time() - stored_at
+            if age < self.ttl:
+                self._count('hits')
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self._count('stale_hits')
+                self._refresh_in_background(key, compute)
+                return value
+        self._count('misses')
+        return self._compute_once(key, compute)
+
+    def _compute_once(self, key, compute):
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            value = compute()
+            self.backend.set(key, value, time.time(), self.ttl + self.stale_ttl)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            self._count('errors')
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def _refresh_in_background(self, key, compute):
+        with self._lock:
+            if key in self._in_flight:
+                return
+        self._count('refreshes')
+
+        def refresh():
+            try:
+                self._compute_once(key, compute)
+            except Exception as e:
+                print(f"Error refreshing cache entry {key}: {e}")
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['stale_hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def clear(self):
+        self.backend.clear()
+
+class RefreshingSnapshot:
+    """A value loaded once and reloaded in the background every max_age seconds.
+
+    Readers always get the last loaded value; only the first get() waits for
+    a load. Failed reloads keep serving the previous value. When version is
+    given, it is called first on each refresh (it should be much cheaper
+    than load) and the value is only reloaded if the version changed.
+    """
+
+    def __init__(self, load, max_age=300, version=None):
+        self.load = load
+        self.max_age = max_age
+        self.version = version
+        self._value = None
+        self._version = None
+        self._loaded_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            loaded_at = self._loaded_at
+            if loaded_at is not None and time.time() - loaded_at >= self.max_age and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh, daemon=True).start()
+        if loaded_at is None:
+            with self._lock:
+                if self._loaded_at is None:
+                    self._version = self.version() if self.version else None
+                    self._value = self.load()
+                    self._loaded_at = time.time()
+        return self._value
+
+    def preload(self):
+        """Start the first load in the background instead of on the first get()"""
+        def load():
+            try:
+                self.get()
+            except Exception as e:
+                print(f"Error preloading snapshot: {e}")
+
+        threading.Thread(target=load, daemon=True).start()
+
+    def _refresh(self):
+        try:
+            # Read the version before loading, so changes made during the load trigger another one
+            version = self.version() if self.version else None
+            if self.version is None or version != self._version:
+                value = self.load()
+                with self._lock:
+                    self._value = value
+                    self._version = version
+            with self._lock:
+                self._loaded_at = time.time()
+        except Exception as e:
+            print(f"Error refreshing snapshot: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def age(self):
+        """Seconds since the last successful load or version check, or None before the first"""
+        loaded_at = self._loaded_at
+        return None if loaded_at is None else round(time.time() - loaded_at, 1)
+
+def create_cache(url=None, ttl=60, stale_ttl=300, max_entries=1024):
+    """Build a TTLCache backed by Redis when url is set, else in-process storage of max_entries keys"""
+    backend = RedisCacheBackend(url) if url else LocalCacheBackend(max_entries)
+    return TTLCache(backend=backend, ttl=ttl, stale_ttl=stale_ttl)
@@ -8,9 +8,76 @@ FLASK_PORT = int(os.getenv("FLASK_PORT", 5001))
 FLASK_DEBUG = os.getenv("FLASK_DEBUG", "False").lower() == "true"
 FLASK_ENV = os.getenv("FLASK_ENV", "production").lower()
 
+# Connection pool settings
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+DB_POOL_PING_INTERVAL = float(os.getenv("DB_POOL_PING_INTERVAL", 30))
+
+# Threads per process for fetching a request's independent queries concurrently;
+# keep it below DB_POOL_MAX_SIZE so request fetches cannot exhaust the pool
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", 8))
+
+# Maximum number of recent posts scored for /api/trending/posts
+TRENDING_CANDIDATE_LIMIT = int(os.getenv("TRENDING_CANDIDATE_LIMIT", 5000))
+# Most trending topics or posts ranked and cached per time window; larger limits are capped to it
+TRENDING_RESULT_LIMIT = int(os.getenv("TRENDING_RESULT_LIMIT", 100))
+
+# Cache for trending endpoints; CACHE_URL (redis://...) shares it across workers
+CACHE_URL = os.getenv("CACHE_URL") or None
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", 60))
+CACHE_STALE_SECONDS = float(os.getenv("CACHE_STALE_SECONDS", 300))
+# Most entries held by the in-process cache (Redis entries expire on their own)
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 256))
+# Largest timeWindow accepted by the trending endpoints; larger values are capped to it
+TRENDING_MAX_WINDOW_HOURS = int(os.getenv("TRENDING_MAX_WINDOW_HOURS", 720))
+
+# Seconds between checks of the "Topic" table for changes to the in-memory topic catalog
+TOPIC_CATALOG_CHECK_SECONDS = float(os.getenv("TOPIC_CATALOG_CHECK_SECONDS", 30))
+
+# Seconds between rebuilds of the user x topic similarity index
+USER_INDEX_REFRESH_SECONDS = float(os.getenv("USER_INDEX_REFRESH_SECONDS", 300))
+
+# /ai/moderation/analyze/batch limits; responses above the stream threshold are streamed
+MODERATION_BATCH_MAX_SIZE = int(os.getenv("MODERATION_BATCH_MAX_SIZE", 1000))
+MODERATION_STREAM_THRESHOLD = int(os.getenv("MODERATION_STREAM_THRESHOLD", 200))
+# Worker processes for large moderation batches (0 = analyze in the request thread)
+MODERATION_POOL_WORKERS = int(os.getenv("MODERATION_POOL_WORKERS", 0))
+MODERATION_POOL_MIN_BATCH = int(os.getenv("MODERATION_POOL_MIN_BATCH", 200))
+# Moderation results kept per process, keyed by content hash (0 disables the cache)
+MODERATION_CACHE_SIZE = int(os.getenv("MODERATION_CACHE_SIZE", 10000))
+
+# Engagement summary ("PostEngagement" table) settings
+USE_ENGAGEMENT_SUMMARY = os.getenv("USE_ENGAGEMENT_SUMMARY", "False").lower() == "true"
+ENGAGEMENT_REFRESH_INTERVAL = float(os.getenv("ENGAGEMENT_REFRESH_INTERVAL", 60))
+ENGAGEMENT_REFRESH_OVERLAP = float(os.getenv("ENGAGEMENT_REFRESH_OVERLAP", 60))
+
+# Materialized personalized feeds ("UserFeed" table, filled by feed_refresh.py)
+USE_MATERIALIZED_FEED = os.getenv("USE_MATERIALIZED_FEED", "False").lower() == "true"
+# Items stored per user; requests for more are scored live
+FEED_SIZE = int(os.getenv("FEED_SIZE", 50))
+# Stored feeds older than this are ignored by the endpoint
+FEED_MAX_AGE_SECONDS = float(os.getenv("FEED_MAX_AGE_SECONDS", 3600))
+# Users with activity in this many days get a materialized feed
+FEED_ACTIVE_DAYS = float(os.getenv("FEED_ACTIVE_DAYS", 30))
+FEED_REFRESH_INTERVAL = float(os.getenv("FEED_REFRESH_INTERVAL", 60))
+FEED_REFRESH_OVERLAP = float(os.getenv("FEED_REFRESH_OVERLAP", 60))
+
+# Opt-in request profiling: requests with an X-Profile header equal to PROFILING_TOKEN
+# (required when enabled) are sampled and saved to PROFILING_DIR, which keeps the
+# newest PROFILING_MAX_FILES profiles
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN") or None
+PROFILING_DIR = os.getenv("PROFILING_DIR", "profiles")
+PROFILING_MAX_FILES = int(os.getenv("PROFILING_MAX_FILES", 100))
+PROFILING_INTERVAL = float(os.getenv("PROFILING_INTERVAL", 0.001))
+
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL is not set in environment variables.")
 
+if DB_POOL_MIN_SIZE < 0 or DB_POOL_MAX_SIZE < max(DB_POOL_MIN_SIZE, 1):
+    raise ValueError("DB_POOL_MAX_SIZE must be >= max(DB_POOL_MIN_SIZE, 1).")
+
 def mask_url(url):
     if not url:
         return None
@@ -1,294 +1,770 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from config import DATABASE_URL
+from psycopg2 import pool as pg_pool
+from psycopg2.extras import Json, RealDictCursor, execute_values
+from config import (
+    DATABASE_URL,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_POOL_PING_INTERVAL,
+    USE_ENGAGEMENT_SUMMARY,
+    ENGAGEMENT_REFRESH_OVERLAP,
+    mask_url,
+)
+from metrics import POOL_CONNECTIONS, timed_fetch
 import json
+from datetime import timedelta
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections.
+
+    Up to ``max_size`` connections are kept open and reused. Checkout blocks
+    for at most ``timeout`` seconds when every connection is in use, and
+    connections that fail a health check are replaced transparently.
+    """
+
+    def __init__(self, dsn, min_size=1, max_size=10, timeout=10.0, ping_interval=30.0):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self._idle = []  # (conn, last_used) pairs, most recently used last
+        self._in_use = 0
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._closed = False
+        self._open_gauge = POOL_CONNECTIONS.labels('open')
+        self._in_use_gauge = POOL_CONNECTIONS.labels('in_use')
+        for _ in range(min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self):
+        try:
+            conn = psycopg2.connect(self.dsn)
+        except Exception as e:
+            print(f"Database connection error ({mask_url(self.dsn)}): {e}")
+            raise
+        self._open_gauge.inc()
+        return conn
+
+    def _close(self, conn):
+        conn.close()
+        self._open_gauge.dec()
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        # Only ping connections that have been idle for a while
+        if time.monotonic() - last_used < self.ping_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        """Check out a healthy connection"""
+        if self._closed:
+            raise pg_pool.PoolError("connection pool is closed")
+        if not self._slots.acquire(timeout=self.timeout):
+            raise pg_pool.PoolError(f"No database connection available after {self.timeout}s")
+        try:
+            while True:
+                with self._lock:
+                    conn, last_used = self._idle.pop() if self._idle else (None, None)
+                if conn is None:
+                    conn = self._connect()
+                    break
+                if self._is_healthy(conn, last_used):
+                    break
+                self._close(conn)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_use += 1
+        self._in_use_gauge.inc()
+        return conn
+
+    def putconn(self, conn, close=False):
+        """Return a connection; broken or explicitly closed ones are discarded"""
+        try:
+            if not close and not conn.closed:
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    try:
+                        conn.rollback()
+                    except psycopg2.Error:
+                        close = True
+            if close or conn.closed or self._closed:
+                self._close(conn)
+            else:
+                with self._lock:
+                    self._idle.append((conn, time.monotonic()))
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._in_use_gauge.dec()
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {'idle': len(self._idle), 'in_use': self._in_use, 'max': self.max_size}
+
+    def closeall(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
 
 def get_db_connection():
-    """Create and return a database connection"""
+    """Create and return a new, unpooled database connection"""
     try:
-        print("Connecting to database with URL:", DATABASE_URL)
-        conn = psycopg2.connect(DATABASE_URL)
-        return conn
+        return psycopg2.connect(DATABASE_URL)
     except Exception as e:
-        print("Connecting to database with URL:", DATABASE_URL)
-        print(f"Database connection error: {e}")
+        print(f"Database connection error ({mask_url(DATABASE_URL)}): {e}")
         raise
 
-def fetch_user_topics(user_id):
-    """Fetch topics that a user follows"""
-    conn = get_db_connection()
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use"""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            # A pool inherited across fork() shares sockets with the parent;
+            # drop it without closing and start fresh in this process.
+            _pool = ConnectionPool(
+                DATABASE_URL,
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=DB_POOL_MAX_SIZE,
+                timeout=DB_POOL_TIMEOUT,
+                ping_interval=DB_POOL_PING_INTERVAL,
+            )
+            _pool_pid = pid
+    return _pool
+
+@contextmanager
+def db_connection():
+    """Borrow a connection from the pool.
+
+    Commits on success and rolls back on error. Connections that break
+    while in use are closed and replaced on the next checkout.
+    """
+    db_pool = get_pool()
+    conn = db_pool.getconn()
+    broken = False
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT t.id, t.name
-                FROM "Topic" t
-                INNER JOIN "UserTopic" ut ON t.id = ut."topicId"
-                WHERE ut."userId" = %s
-            """, (user_id,))
-            return cur.fetchall()
+        yield conn
+        conn.commit()
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
     finally:
-        conn.close()
+        db_pool.putconn(conn, close=broken)
 
+@contextmanager
+def db_cursor():
+    """Borrow a pooled connection and yield a RealDictCursor on it"""
+    with db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            yield cur
+
+def close_pool():
+    """Close every pooled connection (e.g. on shutdown)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+
+def _group_rows(rows, key):
+    """Group rows by one of their columns, dropping that column"""
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row.pop(key), []).append(row)
+    return grouped
+
+def _attach_post_details(cur, posts):
+    """Attach topics, mentions, media and links to posts with one query per collection"""
+    if not posts:
+        return posts
+    post_ids = [post['id'] for post in posts]
+
+    cur.execute("""
+        SELECT pt."postId", t.id, t.name
+        FROM "Topic" t
+        INNER JOIN "PostTopic" pt ON t.id = pt."topicId"
+        WHERE pt."postId" = ANY(%s)
+    """, (post_ids,))
+    topics = _group_rows(cur.fetchall(), 'postId')
+
+    cur.execute("""
+        SELECT m."postId", m."userId", u.id, u.username, u."displayName"
+        FROM "Mention" m
+        INNER JOIN "User" u ON m."userId" = u.id
+        WHERE m."postId" = ANY(%s)
+    """, (post_ids,))
+    mentions = _group_rows(cur.fetchall(), 'postId')
+
+    cur.execute("""
+        SELECT "postId", id, url, type
+        FROM "Media"
+        WHERE "postId" = ANY(%s)
+    """, (post_ids,))
+    media = _group_rows(cur.fetchall(), 'postId')
+
+    cur.execute("""
+        SELECT "postId", id, url
+        FROM "Link"
+        WHERE "postId" = ANY(%s)
+    """, (post_ids,))
+    links = _group_rows(cur.fetchall(), 'postId')
+
+    for post in posts:
+        post['topics'] = topics.get(post['id'], [])
+        post['mentions'] = mentions.get(post['id'], [])
+        post['media'] = media.get(post['id'], [])
+        post['links'] = links.get(post['id'], [])
+    return posts
+
+def _engagement_sql(post_filter=None, live=False):
+    """Joins and count expressions giving likes, comments, bookmarks and views for post alias p.
+
+    Reads the "PostEngagement" summary when USE_ENGAGEMENT_SUMMARY is set.
+    Otherwise each raw table is aggregated in its own grouped subquery,
+    optionally restricted to the post ids selected by post_filter.
+    """
+    if USE_ENGAGEMENT_SUMMARY and not live:
+        return {
+            'joins': 'LEFT JOIN "PostEngagement" pe ON pe."postId" = p.id',
+            'likes': 'COALESCE(pe.likes, 0)',
+            'comments': 'COALESCE(pe.comments, 0)',
+            'bookmarks': 'COALESCE(pe.bookmarks, 0)',
+            'views': 'COALESCE(pe.views, 0)',
+        }
+    restrict = f'"postId" IN ({post_filter})' if post_filter else 'TRUE'
+    return {
+        'joins': f"""
+            LEFT JOIN (
+                SELECT "postId", COUNT(*) AS n FROM "Like"
+                WHERE {restrict} GROUP BY "postId"
+            ) l ON l."postId" = p.id
+            LEFT JOIN (
+                SELECT "postId", COUNT(*) AS n FROM "Comment"
+                WHERE {restrict} GROUP BY "postId"
+            ) c ON c."postId" = p.id
+            LEFT JOIN (
+                SELECT "postId", COUNT(*) AS n FROM "Bookmark"
+                WHERE {restrict} GROUP BY "postId"
+            ) b ON b."postId" = p.id
+            LEFT JOIN (
+                SELECT "postId", COUNT(*) AS n FROM "UserActivity"
+                WHERE type = 'view_post' AND {restrict} GROUP BY "postId"
+            ) v ON v."postId" = p.id
+        """,
+        'likes': 'COALESCE(l.n, 0)',
+        'comments': 'COALESCE(c.n, 0)',
+        'bookmarks': 'COALESCE(b.n, 0)',
+        'views': 'COALESCE(v.n, 0)',
+    }
+
+@timed_fetch
+def fetch_user_topics(user_id):
+    """Fetch topics that a user follows"""
+    with db_cursor() as cur:
+        cur.execute("""
+            SELECT t.id, t.name
+            FROM "Topic" t
+            INNER JOIN "UserTopic" ut ON t.id = ut."topicId"
+            WHERE ut."userId" = %s
+        """, (user_id,))
+        return cur.fetchall()
+
+@timed_fetch
 def fetch_user_activity(user_id, limit=100):
     """Fetch user activity data"""
-    conn = get_db_connection()
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT id, type, "postId", "topicId", "targetId", metadata, "createdAt"
-                FROM "UserActivity"
-                WHERE "userId" = %s
-                ORDER BY "createdAt" DESC
-                LIMIT %s
-            """, (user_id, limit))
-            activities = cur.fetchall()
-            # Convert metadata JSON if it's a string
-            for activity in activities:
-                if activity.get('metadata') and isinstance(activity['metadata'], str):
-                    try:
-                        import json
-                        activity['metadata'] = json.loads(activity['metadata'])
-                    except:
-                        activity['metadata'] = {}
-            return activities
-    finally:
-        conn.close()
+    with db_cursor() as cur:
+        cur.execute("""
+            SELECT id, type, "postId", "topicId", "targetId", metadata, "createdAt"
+            FROM "UserActivity"
+            WHERE "userId" = %s
+            ORDER BY "createdAt" DESC
+            LIMIT %s
+        """, (user_id, limit))
+        activities = cur.fetchall()
+        # Convert metadata JSON if it's a string
+        for activity in activities:
+            if activity.get('metadata') and isinstance(activity['metadata'], str):
+                try:
+                    import json
+                    activity['metadata'] = json.loads(activity['metadata'])
+                except:
+                    activity['metadata'] = {}
+        return activities
 
+@timed_fetch
 def fetch_all_topics():
     """Fetch all topics"""
-    conn = get_db_connection()
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute('SELECT id, name FROM "Topic"')
-            return cur.fetchall()
-    finally:
-        conn.close()
+    with db_cursor() as cur:
+        cur.execute('SELECT id, name FROM "Topic"')
+        return cur.fetchall()
+
+@timed_fetch
+def fetch_topics_version():
+    """Cheap fingerprint of the "Topic" table that changes on any insert, delete or rename"""
+    with db_cursor() as cur:
+        cur.execute("""
+            SELECT count(*) AS topics, md5(string_agg(id || ':' || name, ',' ORDER BY id)) AS checksum
+            FROM "Topic"
+        """)
+        row = cur.fetchone()
+        return row['topics'], row['checksum']
 
+@timed_fetch
 def fetch_all_users():
     """Fetch all users with their topics"""
-    conn = get_db_connection()
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT u.id, u.username, u."displayName"
-                FROM "User" u
-            """)
-            users = cur.fetchall()
-            
-            # Fetch topics for each user
-            for user in users:
-                cur.execute("""
-                    SELECT t.id, t.name
-                    FROM "Topic" t
-                    INNER JOIN "UserTopic" ut ON t.id = ut."topicId"
-                    WHERE ut."userId" = %s
-                """, (user['id'],))
-                user['topics'] = cur.fetchall()
-            
-            return users
-    finally:
-        conn.close()
+    with db_cursor() as cur:
+        cur.execute('SELECT id, name FROM "Topic"')
+        topic_names = {row['id']: row['name'] for row in cur.fetchall()}
+        
+        # One row per user with the ids of every topic they follow
+        cur.execute("""
+            SELECT u.id, u.username, u."displayName",
+                   array_remove(array_agg(ut."topicId"), NULL) AS topic_ids
+            FROM "User" u
+            LEFT JOIN "UserTopic" ut ON ut."userId" = u.id
+            GROUP BY u.id
+        """)
+        users = cur.fetchall()
+        
+        for user in users:
+            user['topics'] = [
+                {'id': topic_id, 'name': topic_names.get(topic_id)}
+                for topic_id in user.pop('topic_ids')
+            ]
+        
+        return users
 
-def fetch_posts_with_metrics():
-    """Fetch all posts with engagement metrics and complete metadata"""
-    conn = get_db_connection()
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT 
-                    p.id,
-                    p.content,
-                    p.type,
-                    p."authorId",
-                    p."createdAt",
-                    p."updatedAt",
-                    u.id as author_id,
-                    u.username as author_username,
-                    u."displayName" as author_display_name,
-                    COUNT(DISTINCT l.id) as likes_count,
-                    COUNT(DISTINCT c.id) as comments_count,
-                    COUNT(DISTINCT b.id) as bookmarks_count,
-                    COUNT(DISTINCT ua.id) as views_count
-                FROM "Post" p
-                LEFT JOIN "User" u ON p."authorId" = u.id
-                LEFT JOIN "Like" l ON p.id = l."postId"
-                LEFT JOIN "Comment" c ON p.id = c."postId"
-                LEFT JOIN "Bookmark" b ON p.id = b."postId"
-                LEFT JOIN "UserActivity" ua ON p.id = ua."postId" AND ua.type = 'view_post'
-                GROUP BY p.id, u.id, u.username, u."displayName"
-                ORDER BY p."createdAt" DESC
-            """)
-            posts = cur.fetchall()
-            
-            # Fetch topics, mentions, media, and links for each post
-            for post in posts:
-                # Fetch topics
-                cur.execute("""
-                    SELECT t.id, t.name
-                    FROM "Topic" t
-                    INNER JOIN "PostTopic" pt ON t.id = pt."topicId"
-                    WHERE pt."postId" = %s
-                """, (post['id'],))
-                post['topics'] = cur.fetchall()
-                
-                # Fetch mentions
-                cur.execute("""
-                    SELECT m."userId", u.id, u.username, u."displayName"
-                    FROM "Mention" m
-                    INNER JOIN "User" u ON m."userId" = u.id
-                    WHERE m."postId" = %s
-                """, (post['id'],))
-                post['mentions'] = cur.fetchall()
-                
-                # Fetch media
-                cur.execute("""
-                    SELECT id, url, type
-                    FROM "Media"
-                    WHERE "postId" = %s
-                """, (post['id'],))
-                post['media'] = cur.fetchall()
-                
-                # Fetch links
-                cur.execute("""
-                    SELECT id, url, title, description
-                    FROM "Link"
-                    WHERE "postId" = %s
-                """, (post['id'],))
-                post['links'] = cur.fetchall()
-            
-            return posts
-    finally:
-        conn.close()
+@timed_fetch
+def fetch_posts_with_metrics(max_age_hours=None, limit=None):
+    """Fetch posts with engagement metrics and complete metadata, newest first.
 
+    max_age_hours limits the result to recent posts (served by the
+    "createdAt" index) and limit caps how many posts are returned.
+    """
+    where = ''
+    if max_age_hours is not None:
+        where = """WHERE "createdAt" >= (now() AT TIME ZONE 'UTC') - %(max_age_hours)s * interval '1 hour'"""
+    # Engagement is only aggregated for the posts inside the window
+    engagement = _engagement_sql(post_filter='SELECT id FROM recent' if where or limit else None)
+    with db_cursor() as cur:
+        cur.execute(f"""
+            WITH recent AS (
+                SELECT id
+                FROM "Post"
+                {where}
+                ORDER BY "createdAt" DESC
+                LIMIT %(limit)s
+            )
+            SELECT 
+                p.id,
+                p.content,
+                p.type,
+                p."authorId",
+                p."createdAt",
+                p."updatedAt",
+                u.id as author_id,
+                u.username as author_username,
+                u."displayName" as author_display_name,
+                {engagement['likes']} as likes_count,
+                {engagement['comments']} as comments_count,
+                {engagement['bookmarks']} as bookmarks_count,
+                {engagement['views']} as views_count
+            FROM recent
+            INNER JOIN "Post" p ON p.id = recent.id
+            LEFT JOIN "User" u ON p."authorId" = u.id
+            {engagement['joins']}
+            ORDER BY p."createdAt" DESC
+        """, {'max_age_hours': max_age_hours, 'limit': limit})
+        posts = cur.fetchall()
+        
+        _attach_post_details(cur, posts)
+        
+        return posts
+
+@timed_fetch
 def fetch_all_topics_with_metrics():
     """Fetch all topics with engagement metrics - only topics with posts"""
-    conn = get_db_connection()
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT 
-                    t.id,
-                    t.name,
-                    COUNT(DISTINCT ut."userId") as user_count,
-                    COUNT(DISTINCT pt."postId") as post_count,
-                    COUNT(DISTINCT l.id) as total_likes,
-                    COUNT(DISTINCT c.id) as total_comments,
-                    COUNT(DISTINCT ua.id) as total_views,
-                    MAX(p."createdAt") as last_post_date
-                FROM "Topic" t
-                LEFT JOIN "UserTopic" ut ON t.id = ut."topicId"
-                LEFT JOIN "PostTopic" pt ON t.id = pt."topicId"
-                LEFT JOIN "Post" p ON pt."postId" = p.id
-                LEFT JOIN "Like" l ON p.id = l."postId"
-                LEFT JOIN "Comment" c ON p.id = c."postId"
-                LEFT JOIN "UserActivity" ua ON p.id = ua."postId" AND ua.type = 'view_post'
-                GROUP BY t.id, t.name
-                HAVING COUNT(DISTINCT pt."postId") > 0
-                ORDER BY 
-                    COUNT(DISTINCT pt."postId") DESC,
-                    COUNT(DISTINCT l.id) DESC,
-                    MAX(p."createdAt") DESC
-            """)
-            return cur.fetchall()
-    finally:
-        conn.close()
+    engagement = _engagement_sql()
+    with db_cursor() as cur:
+        # Per-post counts are summed per topic; every like, comment and view
+        # belongs to exactly one post, so this matches COUNT(DISTINCT ...)
+        cur.execute(f"""
+            WITH topic_posts AS (
+                SELECT
+                    pt."topicId",
+                    COUNT(*) AS post_count,
+                    SUM({engagement['likes']})::bigint AS total_likes,
+                    SUM({engagement['comments']})::bigint AS total_comments,
+                    SUM({engagement['views']})::bigint AS total_views,
+                    MAX(p."createdAt") AS last_post_date
+                FROM "PostTopic" pt
+                INNER JOIN "Post" p ON pt."postId" = p.id
+                {engagement['joins']}
+                GROUP BY pt."topicId"
+            ),
+            topic_users AS (
+                SELECT "topicId", COUNT(*) AS n FROM "UserTopic" GROUP BY "topicId"
+            )
+            SELECT 
+                t.id,
+                t.name,
+                COALESCE(tu.n, 0) as user_count,
+                tp.post_count,
+                tp.total_likes,
+                tp.total_comments,
+                tp.total_views,
+                tp.last_post_date
+            FROM "Topic" t
+            INNER JOIN topic_posts tp ON tp."topicId" = t.id
+            LEFT JOIN topic_users tu ON tu."topicId" = t.id
+            ORDER BY 
+                tp.post_count DESC,
+                tp.total_likes DESC,
+                tp.last_post_date DESC
+        """)
+        return cur.fetchall()
 
+@timed_fetch
 def fetch_user_following(user_id):
     """Fetch users that a user follows"""
-    conn = get_db_connection()
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT "followingId"
-                FROM "Follows"
-                WHERE "followerId" = %s
-            """, (user_id,))
-            return [row['followingId'] for row in cur.fetchall()]
-    finally:
-        conn.close()
+    with db_cursor() as cur:
+        cur.execute("""
+            SELECT "followingId"
+            FROM "Follows"
+            WHERE "followerId" = %s
+        """, (user_id,))
+        return [row['followingId'] for row in cur.fetchall()]
 
+@timed_fetch
 def fetch_posts_by_topics(topic_ids, limit=50):
     """Fetch posts that belong to specific topics, ordered by engagement"""
     if not topic_ids:
         return []
-    
+    return _fetch_candidate_posts("""
+        SELECT DISTINCT "postId" AS id
+        FROM "PostTopic"
+        WHERE "topicId" = ANY(%(topic_ids)s)
+    """, {'topic_ids': list(topic_ids)}, limit)
+
+@timed_fetch
+def fetch_posts_by_user_topics(user_id, limit=50):
+    """Same as fetch_posts_by_topics for the topics a user follows, without fetching them first"""
+    return _fetch_candidate_posts("""
+        SELECT DISTINCT pt."postId" AS id
+        FROM "PostTopic" pt
+        INNER JOIN "UserTopic" ut ON ut."topicId" = pt."topicId"
+        WHERE ut."userId" = %(user_id)s
+    """, {'user_id': user_id}, limit)
+
+def _fetch_candidate_posts(candidates, params, limit):
+    """Posts selected by the candidates query (an id column), ordered by engagement"""
+    # Engagement is only aggregated for the candidate posts
+    engagement = _engagement_sql(post_filter='SELECT id FROM candidates')
+    with db_cursor() as cur:
+        cur.execute(f"""
+            WITH candidates AS ({candidates})
+            SELECT
+                p.id,
+                p.content,
+                p.type,
+                p."authorId",
+                p."createdAt",
+                p."updatedAt",
+                u.id as author_id,
+                u.username as author_username,
+                u."displayName" as author_display_name,
+                {engagement['likes']} as likes_count,
+                {engagement['comments']} as comments_count,
+                {engagement['bookmarks']} as bookmarks_count,
+                {engagement['views']} as views_count,
+                (
+                    {engagement['likes']} * 1.0 + 
+                    {engagement['comments']} * 1.5 + 
+                    {engagement['bookmarks']} * 0.8 +
+                    {engagement['views']} * 0.1
+                ) as engagement_score
+            FROM candidates
+            INNER JOIN "Post" p ON p.id = candidates.id
+            LEFT JOIN "User" u ON p."authorId" = u.id
+            {engagement['joins']}
+            ORDER BY engagement_score DESC, p."createdAt" DESC
+            LIMIT %(limit)s
+        """, {**params, 'limit': limit})
+        posts = cur.fetchall()
+        
+        _attach_post_details(cur, posts)
+        
+        return posts
+
+def refresh_post_engagement(full=False):
+    """Bring the "PostEngagement" summary up to date.
+
+    An incremental refresh recomputes counts only for posts that gained a
+    post, like, comment, bookmark or view since the stored watermark (minus
+    ENGAGEMENT_REFRESH_OVERLAP seconds for late commits). A full refresh
+    recomputes every post and also picks up deleted likes and comments.
+    Returns (number of posts refreshed, new watermark).
+    """
+    with db_cursor() as cur:
+        # Prisma stores timestamps as UTC without a time zone
+        cur.execute("SELECT (now() AT TIME ZONE 'UTC') AS started_at")
+        started_at = cur.fetchone()['started_at']
+        # Row lock serialises concurrent refreshers
+        cur.execute("""
+            SELECT watermark
+            FROM "AggregateWatermark"
+            WHERE name = 'post_engagement'
+            FOR UPDATE
+        """)
+        state = cur.fetchone()
+
+        full = full or state is None
+        if full:
+            touched = 'SELECT id AS "postId" FROM "Post"'
+            params = {}
+        else:
+            touched = """
+                SELECT id AS "postId" FROM "Post" WHERE "createdAt" > %(since)s
+                UNION SELECT "postId" FROM "Like" WHERE "createdAt" > %(since)s
+                UNION SELECT "postId" FROM "Comment" WHERE "createdAt" > %(since)s
+                UNION SELECT "postId" FROM "Bookmark" WHERE "createdAt" > %(since)s
+                UNION SELECT "postId" FROM "UserActivity"
+                WHERE type = 'view_post' AND "postId" IS NOT NULL AND "createdAt" > %(since)s
+            """
+            params = {'since': state['watermark'] - timedelta(seconds=ENGAGEMENT_REFRESH_OVERLAP)}
+
+        engagement = _engagement_sql(
+            post_filter=None if full else 'SELECT "postId" FROM touched', live=True
+        )
+        cur.execute(f"""
+            WITH touched AS ({touched})
+            INSERT INTO "PostEngagement" ("postId", likes, comments, bookmarks, views, "refreshedAt")
+            SELECT
+                p.id,
+                {engagement['likes']},
+                {engagement['comments']},
+                {engagement['bookmarks']},
+                {engagement['views']},
+                %(started_at)s
+            FROM "Post" p
+            {engagement['joins']}
+            WHERE p.id IN (SELECT "postId" FROM touched)
+            ON CONFLICT ("postId") DO UPDATE SET
+                likes = EXCLUDED.likes,
+                comments = EXCLUDED.comments,
+                bookmarks = EXCLUDED.bookmarks,
+                views = EXCLUDED.views,
+                "refreshedAt" = EXCLUDED."refreshedAt"
+        """, {**params, 'started_at': started_at})
+        refreshed = cur.rowcount
+
+        cur.execute("""
+            INSERT INTO "AggregateWatermark" (name, watermark)
+            VALUES ('post_engagement', %s)
+            ON CONFLICT (name) DO UPDATE SET watermark = EXCLUDED.watermark
+        """, (started_at,))
+        return refreshed, started_at
+
+@timed_fetch
+def fetch_aggregate_watermark(name):
+    """Current UTC time and the stored watermark for name (None if never refreshed)"""
+    with db_cursor() as cur:
+        # Millisecond precision, as Prisma's timestamp(3) columns store it
+        cur.execute("""
+            SELECT date_trunc('milliseconds', now() AT TIME ZONE 'UTC') AS started_at,
+                   (SELECT watermark FROM "AggregateWatermark" WHERE name = %s) AS watermark
+        """, (name,))
+        row = cur.fetchone()
+        return row['started_at'], row['watermark']
+
+def save_aggregate_watermark(name, watermark):
+    with db_cursor() as cur:
+        cur.execute("""
+            INSERT INTO "AggregateWatermark" (name, watermark)
+            VALUES (%s, %s)
+            ON CONFLICT (name) DO UPDATE SET watermark = EXCLUDED.watermark
+        """, (name, watermark))
+
+@timed_fetch(rows=lambda feed: 0 if feed is None else 1)
+def fetch_materialized_feed(user_id, max_age_seconds):
+    """Precomputed feed items for a user, or None when missing or older than max_age_seconds"""
+    with db_cursor() as cur:
+        cur.execute("""
+            SELECT items
+            FROM "UserFeed"
+            WHERE "userId" = %s
+              AND "computedAt" > (now() AT TIME ZONE 'UTC') - %s * interval '1 second'
+        """, (user_id, max_age_seconds))
+        row = cur.fetchone()
+        return row['items'] if row else None
+
+@timed_fetch
+def fetch_feed_refresh_user_ids(active_since, posts_since=None, stale_before=None):
+    """Ids of active users (activity after active_since) whose materialized feed needs computing.
+
+    With posts_since None every active user is returned. Otherwise only
+    users without a feed, with a feed computed before stale_before, or
+    following a topic that got a post after posts_since.
+    """
+    if posts_since is None:
+        condition = 'TRUE'
+    else:
+        condition = """
+            f."userId" IS NULL
+            OR f."computedAt" < %(stale_before)s
+            OR a."userId" IN (
+                SELECT ut."userId"
+                FROM "Post" p
+                INNER JOIN "PostTopic" pt ON pt."postId" = p.id
+                INNER JOIN "UserTopic" ut ON ut."topicId" = pt."topicId"
+                WHERE p."createdAt" > %(posts_since)s
+            )
+        """
+    with db_cursor() as cur:
+        cur.execute(f"""
+            SELECT a."userId"
+            FROM (
+                SELECT DISTINCT "userId" FROM "UserActivity" WHERE "createdAt" > %(active_since)s
+            ) a
+            LEFT JOIN "UserFeed" f ON f."userId" = a."userId"
+            WHERE {condition}
+            ORDER BY a."userId"
+        """, {'active_since': active_since, 'posts_since': posts_since, 'stale_before': stale_before})
+        return [row['userId'] for row in cur.fetchall()]
+
+@timed_fetch
+def fetch_feed_users(user_ids, activity_limit=200):
+    """Topics and recent activity types of many users, in generate_personalized_feeds' input format"""
+    if not user_ids:
+        return []
+    with db_cursor() as cur:
+        cur.execute("""
+            SELECT ut."userId", t.id, t.name
+            FROM "UserTopic" ut
+            INNER JOIN "Topic" t ON t.id = ut."topicId"
+            WHERE ut."userId" = ANY(%s)
+        """, (list(user_ids),))
+        topics = _group_rows(cur.fetchall(), 'userId')
+
+        # Type counts over each user's latest activity_limit rows, as fetch_user_activity sees them
+        cur.execute("""
+            SELECT u.id AS "userId", a.type, COUNT(*) AS n
+            FROM unnest(%s::text[]) AS u(id)
+            CROSS JOIN LATERAL (
+                SELECT type FROM "UserActivity"
+                WHERE "userId" = u.id
+                ORDER BY "createdAt" DESC
+                LIMIT %s
+            ) a
+            GROUP BY u.id, a.type
+        """, (list(user_ids), activity_limit))
+        activity = _group_rows(cur.fetchall(), 'userId')
+
+    return [
+        {
+            'user_id': user_id,
+            'user_topics': topics.get(user_id, []),
+            'user_activity': [{'type': row['type']} for row in activity.get(user_id, []) for _ in range(row['n'])],
+        }
+        for user_id in user_ids
+    ]
+
+def save_materialized_feeds(feeds, computed_at):
+    """Upsert (user id, feed items) pairs into "UserFeed" """
+    if not feeds:
+        return 0
+    with db_cursor() as cur:
+        execute_values(cur, """
+            INSERT INTO "UserFeed" ("userId", items, "computedAt")
+            VALUES %s
+            ON CONFLICT ("userId") DO UPDATE SET
+                items = EXCLUDED.items,
+                "computedAt" = EXCLUDED."computedAt"
+        """, [(user_id, Json(items), computed_at) for user_id, items in feeds], page_size=len(feeds))
+        return cur.rowcount
+
+def delete_materialized_feeds(computed_before):
+    """Drop feeds not rewritten since computed_before (users no longer active)"""
+    with db_cursor() as cur:
+        cur.execute('DELETE FROM "UserFeed" WHERE "computedAt" < %s', (computed_before,))
+        return cur.rowcount
+
+# Tables whose rows carry moderated user content
+MODERATED_TABLES = {'post': '"Post"', 'comment': '"Comment"'}
+# Statuses that moderation may still change (others were decided already)
+MODERATABLE_STATUSES = ('okay', 'under_review')
+
+def iter_moderation_content(table, after_id=None, chunk_size=1000):
+    """Yield lists of (id, content) rows of a moderated table in id order.
+
+    Rows are read through a server-side (named) cursor on a dedicated
+    connection, so only chunk_size rows are held in memory at a time.
+    Starts after after_id when resuming.
+    """
     conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            # Use tuple for IN clause (works with psycopg2)
-            placeholders = ','.join(['%s'] * len(topic_ids))
+        with conn.cursor(name=f'moderation_scan_{table}') as cur:
+            cur.itersize = chunk_size
             cur.execute(f"""
-                SELECT DISTINCT
-                    p.id,
-                    p.content,
-                    p.type,
-                    p."authorId",
-                    p."createdAt",
-                    p."updatedAt",
-                    u.id as author_id,
-                    u.username as author_username,
-                    u."displayName" as author_display_name,
-                    COUNT(DISTINCT l.id) as likes_count,
-                    COUNT(DISTINCT c.id) as comments_count,
-                    COUNT(DISTINCT b.id) as bookmarks_count,
-                    COUNT(DISTINCT ua.id) as views_count,
-                    (
-                        COUNT(DISTINCT l.id) * 1.0 + 
-                        COUNT(DISTINCT c.id) * 1.5 + 
-                        COUNT(DISTINCT b.id) * 0.8 +
-                        COUNT(DISTINCT ua.id) * 0.1
-                    ) as engagement_score
-                FROM "Post" p
-                INNER JOIN "PostTopic" pt ON p.id = pt."postId"
-                LEFT JOIN "User" u ON p."authorId" = u.id
-                LEFT JOIN "Like" l ON p.id = l."postId"
-                LEFT JOIN "Comment" c ON p.id = c."postId"
-                LEFT JOIN "Bookmark" b ON p.id = b."postId"
-                LEFT JOIN "UserActivity" ua ON p.id = ua."postId" AND ua.type = 'view_post'
-                WHERE pt."topicId" IN ({placeholders})
-                GROUP BY p.id, u.id, u.username, u."displayName"
-                ORDER BY engagement_score DESC, p."createdAt" DESC
-                LIMIT %s
-            """, tuple(topic_ids) + (limit,))
-            posts = cur.fetchall()
-            
-            # Fetch topics, mentions, media, and links for each post
-            for post in posts:
-                # Fetch topics
-                cur.execute("""
-                    SELECT t.id, t.name
-                    FROM "Topic" t
-                    INNER JOIN "PostTopic" pt ON t.id = pt."topicId"
-                    WHERE pt."postId" = %s
-                """, (post['id'],))
-                post['topics'] = cur.fetchall()
-                
-                # Fetch mentions
-                cur.execute("""
-                    SELECT m."userId", u.id, u.username, u."displayName"
-                    FROM "Mention" m
-                    INNER JOIN "User" u ON m."userId" = u.id
-                    WHERE m."postId" = %s
-                """, (post['id'],))
-                post['mentions'] = cur.fetchall()
-                
-                # Fetch media
-                cur.execute("""
-                    SELECT id, url, type
-                    FROM "Media"
-                    WHERE "postId" = %s
-                """, (post['id'],))
-                post['media'] = cur.fetchall()
-                
-                # Fetch links
-                cur.execute("""
-                    SELECT id, url, title, description
-                    FROM "Link"
-                    WHERE "postId" = %s
-                """, (post['id'],))
-                post['links'] = cur.fetchall()
-            
-            return posts
+                SELECT id, content
+                FROM {MODERATED_TABLES[table]}
+                WHERE status = ANY(%s) AND (%s::text IS NULL OR id > %s)
+                ORDER BY id
+            """, (list(MODERATABLE_STATUSES), after_id, after_id))
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
     finally:
         conn.close()
 
+def update_moderation_statuses(table, updates):
+    """Set status for many (id, status) pairs; returns the number of rows changed.
+
+    Rows already moved out of MODERATABLE_STATUSES are left untouched.
+    """
+    if not updates:
+        return 0
+    statuses = ', '.join(f"'{status}'" for status in MODERATABLE_STATUSES)
+    with db_cursor() as cur:
+        # One statement for the whole batch so rowcount covers every row
+        execute_values(cur, f"""
+            UPDATE {MODERATED_TABLES[table]} AS t
+            SET status = v.status
+            FROM (VALUES %s) AS v(id, status)
+            WHERE t.id = v.id AND t.status IN ({statuses}) AND t.status <> v.status
+        """, updates, page_size=len(updates))
+        return cur.rowcount
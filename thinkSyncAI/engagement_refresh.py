@@ -0,0 +1,40 @@
+"""Refresh job for the "PostEngagement" summary table.
+
+Usage:
+    python engagement_refresh.py            # refresh forever every ENGAGEMENT_REFRESH_INTERVAL seconds
+    python engagement_refresh.py --once     # single incremental refresh
+    python engagement_refresh.py --full     # recompute every post (also run periodically to pick up deletes)
+"""
+import argparse
+import time
+
+from config import ENGAGEMENT_REFRESH_INTERVAL
+from database import refresh_post_engagement
+
+def run_once(full=False):
+    started = time.perf_counter()
+    refreshed, watermark = refresh_post_engagement(full=full)
+    elapsed = time.perf_counter() - started
+    print(f"Refreshed engagement for {refreshed} posts in {elapsed:.2f}s (watermark {watermark})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the PostEngagement summary table")
+    parser.add_argument('--once', action='store_true', help='run a single refresh and exit')
+    parser.add_argument('--full', action='store_true', help='recompute every post instead of only recent activity')
+    parser.add_argument('--interval', type=float, default=ENGAGEMENT_REFRESH_INTERVAL,
+                        help='seconds between refreshes when looping')
+    args = parser.parse_args()
+
+    if args.once or args.full:
+        run_once(full=args.full)
+        return
+
+    while True:
+        try:
+            run_once()
+        except Exception as e:
+            print(f"Error refreshing post engagement: {e}")
+        time.sleep(args.interval)
+
+if __name__ == '__main__':
+    main()
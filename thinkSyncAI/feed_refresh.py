@@ -0,0 +1,134 @@
+"""Materializer for the "UserFeed" table: precomputed personalized feeds of active users.
+
+Usage:
+    python feed_refresh.py            # refresh forever every FEED_REFRESH_INTERVAL seconds
+    python feed_refresh.py --once     # single incremental refresh
+    python feed_refresh.py --full     # recompute every active user and drop feeds of inactive ones
+
+An incremental refresh only re-scores active users who follow a topic that
+got a post since the last run, users without a stored feed, and feeds older
+than half of FEED_MAX_AGE_SECONDS (so served feeds pick up engagement changes).
+"""
+import argparse
+import time
+from datetime import timedelta
+
+from config import (
+    FEED_SIZE,
+    FEED_MAX_AGE_SECONDS,
+    FEED_ACTIVE_DAYS,
+    FEED_REFRESH_INTERVAL,
+    FEED_REFRESH_OVERLAP,
+)
+from database import (
+    fetch_aggregate_watermark,
+    save_aggregate_watermark,
+    fetch_feed_refresh_user_ids,
+    fetch_feed_users,
+    fetch_posts_by_topics,
+    fetch_posts_with_metrics,
+    save_materialized_feeds,
+    delete_materialized_feeds,
+)
+from recommendation_engine import RecommendationEngine
+
+WATERMARK = 'user_feed'
+
+def feed_candidate_limit(limit):
+    """Candidate posts fetched and scored for a feed of limit posts"""
+    return limit * 3
+
+class FeedMaterializer:
+    """Scores and stores feeds for batches of users, sharing candidate posts across a run.
+
+    Each user is scored against the candidates the live endpoint ranks for
+    a FEED_SIZE request, which it also uses for smaller limits while
+    USE_MATERIALIZED_FEED is on; users with identical candidates are scored
+    together with generate_personalized_feeds.
+    """
+
+    def __init__(self, engine, size=FEED_SIZE):
+        self.engine = engine
+        self.size = size
+        self.candidate_limit = feed_candidate_limit(size)
+        self._topic_posts = {}
+        self._fallback_posts = None
+
+    def candidates(self, user_topics):
+        """The posts fetch_posts_by_user_topics would return, merged from per-topic top lists"""
+        # The top candidate_limit posts over several topics are all within
+        # the top candidate_limit of some single topic
+        posts = {}
+        for topic in user_topics:
+            if topic['id'] not in self._topic_posts:
+                self._topic_posts[topic['id']] = fetch_posts_by_topics([topic['id']], limit=self.candidate_limit)
+            for post in self._topic_posts[topic['id']]:
+                posts[post['id']] = post
+        ranked = sorted(posts.values(), key=lambda post: (post['engagement_score'], post['createdAt']), reverse=True)
+        return ranked[:self.candidate_limit]
+
+    def fallback_posts(self):
+        if self._fallback_posts is None:
+            self._fallback_posts = fetch_posts_with_metrics(limit=self.candidate_limit) or []
+        return self._fallback_posts
+
+    def refresh(self, user_ids, computed_at):
+        """Score and store the feeds of user_ids; returns the number stored"""
+        groups = {}
+        for user in fetch_feed_users(user_ids):
+            posts = self.candidates(user['user_topics']) if user['user_topics'] else []
+            if not posts:
+                posts = self.fallback_posts()
+            key = tuple(post['id'] for post in posts)
+            groups.setdefault(key, (posts, []))[1].append(user)
+
+        feeds = []
+        for posts, users in groups.values():
+            scored = self.engine.generate_personalized_feeds(users, posts, limit=self.size)
+            feeds.extend((user['user_id'], feed) for user, feed in zip(users, scored))
+        return save_materialized_feeds(feeds, computed_at)
+
+def run_once(full=False, batch_size=500):
+    started = time.perf_counter()
+    started_at, watermark = fetch_aggregate_watermark(WATERMARK)
+    full = full or watermark is None
+    user_ids = fetch_feed_refresh_user_ids(
+        active_since=started_at - timedelta(days=FEED_ACTIVE_DAYS),
+        posts_since=None if full else watermark - timedelta(seconds=FEED_REFRESH_OVERLAP),
+        stale_before=started_at - timedelta(seconds=FEED_MAX_AGE_SECONDS / 2),
+    )
+
+    materializer = FeedMaterializer(RecommendationEngine())
+    refreshed = 0
+    for start in range(0, len(user_ids), batch_size):
+        refreshed += materializer.refresh(user_ids[start:start + batch_size], started_at)
+    # Every active user was rewritten at started_at; older rows belong to inactive users
+    removed = delete_materialized_feeds(started_at) if full else 0
+    save_aggregate_watermark(WATERMARK, started_at)
+
+    elapsed = time.perf_counter() - started
+    print(f"Refreshed {refreshed} feeds, removed {removed} in {elapsed:.2f}s "
+          f"({'full' if full else 'incremental'}, watermark {started_at})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the UserFeed materialized feeds")
+    parser.add_argument('--once', action='store_true', help='run a single refresh and exit')
+    parser.add_argument('--full', action='store_true', help='recompute every active user instead of only affected ones')
+    parser.add_argument('--interval', type=float, default=FEED_REFRESH_INTERVAL,
+                        help='seconds between refreshes when looping')
+    parser.add_argument('--batch-size', type=int, default=500, help='users scored and written per batch')
+    args = parser.parse_args()
+
+    if args.once or args.full:
+        run_once(full=args.full, batch_size=args.batch_size)
+        return
+
+    while True:
+        try:
+            run_once(batch_size=args.batch_size)
+        except Exception as e:
+            print(f"Error refreshing feeds: {e}")
+        time.sleep(args.interval)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Production server settings: gunicorn -c gunicorn.conf.py app:app
+
+The app is imported once in the master (preload_app) and the topic catalog
+and user index are loaded there before the workers are forked, so every
+worker starts warm and shares that memory copy-on-write.
+"""
+import glob
+import multiprocessing
+import os
+import tempfile
+
+from config import FLASK_PORT
+
+# Railway and similar platforms provide PORT
+bind = f"0.0.0.0:{os.getenv('PORT') or FLASK_PORT}"
+
+workers = int(os.getenv("GUNICORN_WORKERS") or multiprocessing.cpu_count())
+# Threads per worker; requests mostly wait on Postgres
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS") or 4)
+preload_app = True
+
+# Recycle each worker after this many requests (jittered so they do not all
+# restart together); in-flight requests finish within graceful_timeout
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS") or 1000)
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER") or 100)
+timeout = int(os.getenv("GUNICORN_TIMEOUT") or 60)
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT") or 30)
+
+accesslog = "-"
+
+# Workers write their metrics to files in this directory so /metrics can
+# aggregate all of them; it must be set before the app (and prometheus_client)
+# is imported. Only its *.db sample files are removed, so samples of a previous
+# run do not linger while anything else in a configured directory is kept
+metrics_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "thinksync-metrics")
+)
+os.makedirs(metrics_dir, exist_ok=True)
+for path in glob.glob(os.path.join(metrics_dir, "*.db")):
+    os.remove(path)
+
+def on_starting(server):
+    # Runs in the master after the app module was preloaded, before any fork
+    import app
+    import database
+
+    app.warm_up()
+    # Workers open their own pools; never share the master's sockets
+    database.close_pool()
+
+def worker_exit(server, worker):
+    import database
+
+    database.close_pool()
+
+def child_exit(server, worker):
+    # Runs in the master; drops the exited worker's live gauges from /metrics
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
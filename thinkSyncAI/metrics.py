@@ -0,0 +1,105 @@
+"""Prometheus metrics for the AI service, served in text format by /metrics.
+
+Under gunicorn every worker writes its samples to PROMETHEUS_MULTIPROC_DIR
+(prepared by gunicorn.conf.py) and /metrics aggregates all live workers.
+"""
+import contextvars
+import functools
+import os
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# Route of the request being handled, so fetch timings can be broken down per
+# endpoint; fetches outside a request (snapshot and cache refreshes) get 'background'
+_endpoint = contextvars.ContextVar('endpoint', default='background')
+
+REQUEST_DURATION = Histogram(
+    'thinksync_http_request_duration_seconds',
+    'Time spent handling a request, by route',
+    ['method', 'endpoint', 'status'],
+)
+FETCH_DURATION = Histogram(
+    'thinksync_db_fetch_duration_seconds',
+    'Time spent in a database.py fetch function, by the endpoint that called it',
+    ['function', 'endpoint'],
+    buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10),
+)
+FETCH_ROWS = Histogram(
+    'thinksync_db_fetch_rows',
+    'Rows returned by a database.py fetch function',
+    ['function'],
+    buckets=(0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 50000),
+)
+ENGINE_DURATION = Histogram(
+    'thinksync_engine_duration_seconds',
+    'Time spent in a RecommendationEngine scoring method',
+    ['method'],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5),
+)
+POOL_CONNECTIONS = Gauge(
+    'thinksync_db_pool_connections',
+    'Connections held by the database pool (open) and checked out of it (in_use)',
+    ['state'],
+    multiprocess_mode='livesum',
+)
+
+def set_endpoint(endpoint):
+    """Attribute fetches in this context to endpoint; returns a token for reset_endpoint()"""
+    return _endpoint.set(endpoint)
+
+def reset_endpoint(token):
+    _endpoint.reset(token)
+
+def _row_count(result):
+    if result is None:
+        return 0
+    return len(result) if isinstance(result, list) else 1
+
+def timed_fetch(fn=None, *, rows=_row_count):
+    """Record the duration and row count of every call to a fetch function.
+
+    rows maps the function's result to the number of rows it read; lists
+    count their items, None counts as no row and anything else as one.
+    """
+    if fn is None:
+        return functools.partial(timed_fetch, rows=rows)
+    name = fn.__name__
+    rows_histogram = FETCH_ROWS.labels(name)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            FETCH_DURATION.labels(name, _endpoint.get()).observe(time.perf_counter() - started)
+        rows_histogram.observe(rows(result))
+        return result
+    return wrapper
+
+def timed_engine(fn):
+    """Record the duration of every call to a RecommendationEngine method"""
+    histogram = ENGINE_DURATION.labels(fn.__name__)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - started)
+    return wrapper
+
+def observe_request(method, endpoint, status, seconds):
+    REQUEST_DURATION.labels(method, endpoint, status).observe(seconds)
+
+def render():
+    """Return (body, content type) of every metric in Prometheus text format"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,176 @@
+import os
+import hashlib
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from config import MODERATION_CACHE_SIZE
+from recommendation_engine import RecommendationEngine
+
+_engine = None
+
+def _get_engine():
+    """Engine of the current process; pool workers build their own"""
+    global _engine
+    if _engine is None:
+        _engine = RecommendationEngine()
+    return _engine
+
+class ModerationCache:
+    """LRU cache of moderation results keyed by content hash and rule-set version.
+
+    Keys are fixed-size digests, so memory is bounded by max_size entries
+    whatever the content length. The rules version is a hash of
+    MODERATION_KEYWORDS taken when the engine compiles its matcher, which
+    happens once per process. Edited keyword lists therefore take effect
+    after a restart, which also empties this per-process cache. Entries
+    cached before a recompile are never served after it. max_size=0
+    disables the cache.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def key(self, content):
+        digest = hashlib.blake2b(content.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        return _get_engine().moderation_rules_version, digest
+
+    def get(self, key):
+        if self.max_size <= 0:
+            return None
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+        return _copy_result(result)
+
+    def put(self, key, result):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = _copy_result(result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters, size=len(self._entries), max_size=self.max_size)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['rules_version'] = _get_engine().moderation_rules_version
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+def _copy_result(result):
+    # Callers may modify the lists they get back; cached entries must not change
+    return {**result, 'categories': list(result['categories']), 'reasons': list(result['reasons'])}
+
+# Per process; pool workers keep their own
+moderation_cache = ModerationCache(max_size=MODERATION_CACHE_SIZE)
+
+def analyze_content(content):
+    """Moderation result for one content string, served from the cache when possible"""
+    if not content or not isinstance(content, str):
+        return _get_engine().analyze_content_moderation(content)
+    key = moderation_cache.key(content)
+    result = moderation_cache.get(key)
+    if result is None:
+        result = _get_engine().analyze_content_moderation(content)
+        moderation_cache.put(key, result)
+    return result
+
+def analyze_contents(contents):
+    """Moderation results for a list of content strings, in order"""
+    return [analyze_content(content) for content in contents]
+
+def moderation_status(result):
+    """Status for moderated content, or None when it can stay as it is.
+
+    Same mapping as processModeration in the backend's
+    services/backgroundModeration.service.js: flagged content of medium or
+    high severity, or with confidence of at least 0.4, becomes "flagged"
+    (medium/high) or "under_review", and "achieved" when confidence is at
+    least 0.7. Unlike the backend, content that is not flagged is left as
+    it is rather than reset to "okay".
+    """
+    if not result or not result.get('flagged'):
+        return None
+    severity = (result.get('severity') or '').lower()
+    confidence = result.get('confidence', 0)
+    medium_or_high = severity in ('medium', 'high')
+    if not medium_or_high and confidence < 0.4:
+        return None
+    if confidence >= 0.7:
+        return 'achieved'
+    return 'flagged' if medium_or_high else 'under_review'
+
+class ModerationPool:
+    """Spreads moderation of large batches over worker processes.
+
+    With workers=0, or for batches smaller than min_batch, contents are
+    analyzed in the calling process. The executor is created on first use
+    and again after a fork, so each server process owns its workers.
+    """
+
+    def __init__(self, workers=0, min_batch=200, chunk_size=64):
+        self.workers = workers
+        self.min_batch = min_batch
+        self.chunk_size = chunk_size
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        pid = os.getpid()
+        if self._executor is not None and self._pid == pid:
+            return self._executor
+        # Concurrent first batches must not each start (and leak) a pool
+        with self._lock:
+            if self._executor is None or self._pid != pid:
+                # spawn: forking a threaded server process is not safe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                self._pid = pid
+        return self._executor
+
+    def analyze(self, contents):
+        """Yield one moderation result per content, in order"""
+        if self.workers <= 0 or len(contents) < self.min_batch:
+            yield from analyze_contents(contents)
+            return
+        # Only distinct contents missing from this process's cache go to the workers
+        keys = [moderation_cache.key(content) for content in contents]
+        results = {}
+        misses = []
+        for key, content in zip(keys, contents):
+            if key not in results:
+                results[key] = moderation_cache.get(key)
+                if results[key] is None:
+                    misses.append(content)
+        chunks = [misses[i:i + self.chunk_size] for i in range(0, len(misses), self.chunk_size)]
+        computed = (result for results in self._get_executor().map(analyze_contents, chunks) for result in results)
+        for key in keys:
+            # Misses come back in first-seen order
+            if results[key] is None:
+                results[key] = next(computed)
+                moderation_cache.put(key, results[key])
+            yield _copy_result(results[key])
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,181 @@
+"""Opt-in sampling profiler for single requests.
+
+When PROFILING_ENABLED is set, a request sent with an ``X-Profile`` header
+equal to PROFILING_TOKEN (required; never a query parameter, which would
+end up in access logs) has the stacks of its thread, and of the threads running its concurrent
+fetches, sampled every PROFILING_INTERVAL seconds. The samples are written
+to PROFILING_DIR as folded stacks (flamegraph.pl, speedscope) next to a
+JSON summary, keeping the newest PROFILING_MAX_FILES profiles, and the time split is returned in a Server-Timing header.
+"""
+import contextvars
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Profiler of the request being handled; copied into its fetch threads
+_active = contextvars.ContextVar('profiler', default=None)
+
+# Innermost matching frame decides where a sample's time went. Waiting in
+# _fetch_concurrently is waiting for the request's database fetches.
+CATEGORIES = (
+    ('database.py', None, 'db_wait'),
+    ('app.py', '_fetch_concurrently', 'db_wait'),
+    ('recommendation_engine.py', None, 'scoring'),
+)
+
+def _frame_name(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _categorize(frame):
+    while frame is not None:
+        code = frame.f_code
+        filename = os.path.basename(code.co_filename)
+        for category_file, function, category in CATEGORIES:
+            if filename == category_file and function in (None, code.co_name):
+                return category
+        frame = frame.f_back
+    return 'other'
+
+class RequestProfiler:
+    """Samples the stacks of a request's threads until stopped.
+
+    Each sample is weighted by the time since the previous one, so the
+    totals stay accurate when the sampler gets the GIL late.
+    """
+
+    def __init__(self, label, interval=0.001):
+        self.label = label
+        self.interval = interval
+        self._threads = {threading.get_ident(): 'request'}
+        self._lock = threading.Lock()
+        self._stacks = Counter()  # folded stack -> seconds
+        self._seconds = Counter()  # (thread, category) -> seconds
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._token = None
+        self.started = self.elapsed = None
+
+    def start(self):
+        self._token = _active.set(self)
+        self.started = time.perf_counter()
+        self._sampler.start()
+        return self
+
+    def stop(self):
+        """Stop sampling; safe to call more than once"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._sampler.join()
+        self.elapsed = time.perf_counter() - self.started
+        _active.reset(self._token)
+
+    @contextmanager
+    def thread(self, name):
+        """Also sample the current thread while the block runs"""
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] = name
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._threads.pop(ident, None)
+
+    def _run(self):
+        last = self.started
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            self._sample(now - last)
+            last = now
+
+    def _sample(self, weight):
+        frames = sys._current_frames()
+        with self._lock:
+            threads = list(self._threads.items())
+        for ident, name in threads:
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+            category = _categorize(frame)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            stack.append(category)
+            stack.append(name)
+            self._stacks[';'.join(reversed(stack))] += weight
+            self._seconds[name, category] += weight
+
+    def summary(self):
+        """Seconds per category of the request thread, and per fetch thread"""
+        request = {category: 0.0 for _, _, category in CATEGORIES}
+        request['other'] = 0.0
+        fetches = Counter()
+        for (name, category), seconds in self._seconds.items():
+            if name == 'request':
+                request[category] += seconds
+            else:
+                fetches[name] += seconds
+        return {
+            'label': self.label,
+            'wall_seconds': round(self.elapsed, 6),
+            'interval': self.interval,
+            'request': {category: round(seconds, 6) for category, seconds in request.items()},
+            'fetch_threads': {name: round(seconds, 6) for name, seconds in fetches.items()},
+        }
+
+    def folded(self):
+        """Folded stacks weighted in microseconds, one 'frame;frame;... weight' per line"""
+        return ''.join(
+            f"{stack} {round(seconds * 1e6)}\n"
+            for stack, seconds in sorted(self._stacks.items()) if round(seconds * 1e6)
+        )
+
+    def save(self, directory, keep=None):
+        """Write <name>.folded and <name>.json to directory and return name.
+
+        With keep, only the newest keep profiles in directory are kept.
+        """
+        os.makedirs(directory, exist_ok=True)
+        name = f"{int(time.time() * 1000)}-{re.sub(r'[^A-Za-z0-9]+', '_', self.label).strip('_')}"
+        with open(os.path.join(directory, name + '.folded'), 'w') as f:
+            f.write(self.folded())
+        with open(os.path.join(directory, name + '.json'), 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+        if keep:
+            prune_profiles(directory, keep)
+        return name
+
+    def server_timing(self):
+        """Server-Timing header value with the request thread's split in milliseconds"""
+        parts = [f"{category};dur={seconds * 1000:.1f}" for category, seconds in self.summary()['request'].items()]
+        parts.append(f"total;dur={self.elapsed * 1000:.1f}")
+        return ', '.join(parts)
+
+def prune_profiles(directory, keep):
+    """Delete all but the newest keep profiles; names start with their millisecond timestamp"""
+    names = sorted({os.path.splitext(f)[0] for f in os.listdir(directory) if f.endswith(('.folded', '.json'))})
+    for name in names[:-keep]:
+        for extension in ('.folded', '.json'):
+            try:
+                os.remove(os.path.join(directory, name + extension))
+            except FileNotFoundError:
+                # Pruned by another request thread meanwhile
+                pass
+
+def traced(fn, name):
+    """Wrap fn so the profiler of the current request, if any, samples the thread running it"""
+    profiler = _active.get()
+    if profiler is None:
+        return fn
+
+    def run():
+        with profiler.thread(name):
+            return fn()
+    return run
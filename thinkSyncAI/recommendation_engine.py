@@ -1,17 +1,228 @@
-import numpy as np
 from datetime import datetime, timedelta
+import bisect
+import hashlib
+import heapq
+import importlib
+import itertools
+import json
 import math
 import re
+import string
+import threading
+
+from metrics import timed_engine
+
+# Moderation keywords per category as (whole_word, keywords). Whole-word
+# keywords only match between word boundaries, the others anywhere.
+MODERATION_KEYWORDS = {
+    'profanity': (True, [
+        'damn', 'hell', 'ass', 'crap', 'shit', 'fuck', 'bitch', 'bastard',
+        'piss', 'dick', 'cock', 'pussy', 'whore', 'slut', 'faggot', 'nigger',
+        'cunt', 'motherfucker', 'asshole'
+    ]),
+    'hate_speech': (False, [
+        'hate', 'kill all', 'death to', 'inferior', 'subhuman', 'vermin',
+        'scum', 'trash', 'terrorist', 'nazi', 'fascist', 'racist',
+        'sexist', 'bigot', 'supremacy'
+    ]),
+    'violence': (True, [
+        'kill', 'murder', 'torture', 'rape', 'assault', 'attack',
+        'bomb', 'shoot', 'stab', 'hurt', 'harm', 'destroy',
+        'violence', 'weapon', 'gun', 'knife'
+    ]),
+    'spam': (False, [
+        'click here', 'buy now', 'limited time', 'act now', 'free money',
+        'earn $$$', 'make money fast', 'get rich', 'work from home',
+        'viagra', 'casino', 'lottery', 'winner', 'prize', 'claim now'
+    ]),
+}
+
+class _LazyModule:
+    """Stand-in for a heavy module that is imported on first attribute access.
+
+    The import then replaces the stand-in in this module's globals, so later
+    uses cost nothing. Processes that only moderate content never load them.
+    """
+
+    def __init__(self, name, alias):
+        self._name = name
+        self._alias = alias
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._name)
+        globals()[self._alias] = module
+        return getattr(module, attr)
+
+np = _LazyModule('numpy', 'np')
+sparse = _LazyModule('scipy.sparse', 'sparse')
+
+WORD_CHARACTER = re.compile(r'\w')
+REPEATED_CHARACTER = re.compile(r'(.)\1{4,}')
+
+def _trie_regex(keywords):
+    """Alternation of keywords sharing common prefixes; matches the longest"""
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+class UserTopicIndex:
+    """Binary user x topic CSR matrix over a snapshot of all users.
+
+    Build it once from fetch_all_users() and reuse it across requests until
+    the next refresh.
+    """
+
+    def __init__(self, all_users):
+        self.users = list(all_users or [])
+        self.row_of = {user['id']: row for row, user in enumerate(self.users)}
+        self.topic_column = {}
+        rows, cols = [], []
+        for row, user in enumerate(self.users):
+            for topic in user.get('topics') or []:
+                rows.append(row)
+                cols.append(self.topic_column.setdefault(topic['id'], len(self.topic_column)))
+
+        matrix = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)),
+            shape=(len(self.users), len(self.topic_column))
+        )
+        matrix.sum_duplicates()
+        matrix.data[:] = 1.0
+        self.matrix = matrix
+        self.sizes = np.diff(matrix.indptr)  # topics per user
+
+    def rows_for(self, user_ids):
+        """Matrix rows of the given user ids that are in the index"""
+        return np.array([self.row_of[u] for u in user_ids if u in self.row_of], dtype=np.intp)
+
+    def topic_columns(self, topic_ids):
+        """Matrix columns of the given topic ids that are in the index"""
+        return np.array([self.topic_column[t] for t in topic_ids if t in self.topic_column], dtype=np.intp)
+
+class TopicSimilarityIndex:
+    """Precomputed name similarity between topics for recommend_topics.
+
+    For every topic it keeps the ids of topics whose names are similar
+    (_text_similarity above SIMILARITY_THRESHOLD): names contained in one
+    another, found through a name lookup and one joined string of all
+    names, or sharing enough words, found through an inverted word index.
+    update() only reindexes topics that were added, renamed or removed.
+    """
+
+    SIMILARITY_THRESHOLD = 0.3
+
+    def __init__(self, topics=()):
+        self.names = {}  # topic id -> lowercased name
+        self._words = {}  # topic id -> set of words in the name
+        self._ids_by_name = {}
+        self._ids_by_word = {}
+        self._similar = {}
+        self._joined = None  # '\0'-separated names, rebuilt lazily
+        self._lock = threading.Lock()
+        self.update(topics)
+
+    def update(self, topics):
+        """Sync the index with the current topic list"""
+        current = {topic['id']: (topic.get('name') or '').lower() for topic in topics or []}
+        with self._lock:
+            changed = [topic_id for topic_id, name in self.names.items() if current.get(topic_id) != name]
+            for topic_id in changed:
+                self._remove(topic_id)
+            added = [(topic_id, name) for topic_id, name in current.items() if topic_id not in self.names]
+            # Register every new name first so the joined names are rebuilt only once
+            for topic_id, name in added:
+                self._register(topic_id, name)
+            for topic_id, name in added:
+                for other_id in self._find_similar(name) - {topic_id}:
+                    self._similar[topic_id].add(other_id)
+                    self._similar[other_id].add(topic_id)
+
+    def similar_ids(self, topic_id, name=None):
+        """Ids of topics similar to topic_id, or to name when the topic is not indexed"""
+        with self._lock:
+            if topic_id in self._similar:
+                return tuple(self._similar[topic_id])
+            return tuple(self._find_similar((name or '').lower()))
+
+    def _register(self, topic_id, name):
+        self.names[topic_id] = name
+        self._words[topic_id] = frozenset(name.split())
+        self._similar[topic_id] = set()
+        if name:
+            self._ids_by_name.setdefault(name, set()).add(topic_id)
+            for word in self._words[topic_id]:
+                self._ids_by_word.setdefault(word, set()).add(topic_id)
+        self._joined = None
+
+    def _remove(self, topic_id):
+        name = self.names.pop(topic_id)
+        del self._words[topic_id]
+        for other_id in self._similar.pop(topic_id):
+            self._similar.get(other_id, set()).discard(topic_id)
+        self._ids_by_name.get(name, set()).discard(topic_id)
+        for word in set(name.split()):
+            self._ids_by_word.get(word, set()).discard(topic_id)
+        self._joined = None
+
+    def _find_similar(self, name):
+        """Indexed topic ids whose names are similar to name (same rules as _text_similarity)"""
+        if not name:
+            return set()
+        similar = set()
+        # Indexed names contained in name
+        for start in range(len(name)):
+            for end in range(start + 1, len(name) + 1):
+                similar.update(self._ids_by_name.get(name[start:end], ()))
+        # Indexed names containing name
+        if self._joined is None:
+            ids = [topic_id for topic_id, other in self.names.items() if other]
+            starts = list(itertools.accumulate((len(self.names[topic_id]) + 1 for topic_id in ids[:-1]), initial=0))
+            self._joined = ('\0'.join(self.names[topic_id] for topic_id in ids), ids, starts)
+        joined, ids, starts = self._joined
+        position = joined.find(name)
+        while position != -1:
+            owner = bisect.bisect_right(starts, position) - 1
+            similar.add(ids[owner])
+            # Continue from the next name; each topic only needs one match
+            position = joined.find(name, starts[owner + 1]) if owner + 1 < len(starts) else -1
+        # Names sharing enough words
+        words = set(name.split())
+        candidates = set().union(*(self._ids_by_word.get(word, ()) for word in words)) if words else set()
+        for other_id in candidates - similar:
+            other_words = self._words[other_id]
+            if len(words & other_words) / len(words | other_words) > self.SIMILARITY_THRESHOLD:
+                similar.add(other_id)
+        return similar
+
 class RecommendationEngine:
     def __init__(self):
-        pass
+        self._compile_moderation_matcher()
 
     # ---------------------------
     # Topic Recommendations
     # ---------------------------
-    def recommend_topics(self, user_id, user_topics, user_activity, all_topics, limit=10):
+    @timed_engine
+    def recommend_topics(self, user_id, user_topics, user_activity, all_topics, limit=10, topic_index=None):
+        """Topics the user does not follow, scored by activity and name similarity.
+
+        topic_index is a TopicSimilarityIndex kept in sync with all_topics;
+        it is built here when not given.
+        """
         recommendations = {}
         user_topic_ids = {topic['id'] for topic in user_topics or []}
+        topic_index = topic_index or TopicSimilarityIndex(all_topics)
 
         # Activity-based scoring
         topic_activity_weights = {}
@@ -26,14 +237,19 @@ class RecommendationEngine:
                     'follow': 2.0
                 }.get(activity.get('type'), 0.5)
 
+        # Text similarity boost: 0.4 per followed topic with a similar name
+        similarity_boost = {}
+        for user_topic in user_topics or []:
+            for topic_id in topic_index.similar_ids(user_topic['id'], user_topic.get('name')):
+                similarity_boost[topic_id] = similarity_boost.get(topic_id, 0) + 1
+
         # Score topics not yet followed
         for topic in all_topics or []:
             if topic['id'] not in user_topic_ids:
                 score = topic_activity_weights.get(topic['id'], 0)
-                # Text similarity boost
-                for user_topic in user_topics or []:
-                    if self._text_similarity(user_topic.get('name'), topic.get('name')) > 0.3:
-                        score += 0.4
+                # Added once per similar followed topic, as with the pairwise comparison
+                for _ in range(similarity_boost.get(topic['id'], 0)):
+                    score += 0.4
                 if score > 0:
                     recommendations[topic['id']] = {
                         'topic_id': topic['id'],
@@ -52,73 +268,125 @@ class RecommendationEngine:
                     'reason': 'Popular topic for new users'
                 }
 
-        return sorted(recommendations.values(), key=lambda x: x['score'], reverse=True)[:limit]
+        return heapq.nlargest(limit, recommendations.values(), key=lambda x: x['score'])
 
     # ---------------------------
     # User Recommendations
     # ---------------------------
-    def recommend_users(self, user_id, user_topics, all_users, user_following, limit=10):
-        following_set = set(user_following or [])
-        user_scores = []
-        
-        # If user has topics, use collaborative filtering
-        if user_topics and len(user_topics) > 0:
-            user_topic_ids = {topic['id'] for topic in user_topics}
-
-            for other_user in all_users or []:
-                if other_user['id'] == user_id or other_user['id'] in following_set:
-                    continue
-                other_topics = {t['id'] for t in other_user.get('topics') or []}
-                if not other_topics:
-                    continue
+    USER_BATCH_CHUNK = 256  # users compared per sparse product in batch mode
 
-                # Jaccard similarity
-                intersection = len(user_topic_ids & other_topics)
-                union = len(user_topic_ids | other_topics)
-                if union == 0:
-                    continue
-                similarity = intersection / union
-                score = similarity * (1 + len(intersection) * 0.1)
-                if score > 0:
-                    user_scores.append({
-                        'user_id': other_user['id'],
-                        'username': other_user.get('username'),
-                        'displayName': other_user.get('displayName'),
-                        'score': score,
-                        'common_topics_count': intersection,
-                        'reason': f'{intersection} common interests'
-                    })
-        else:
-            # Fallback: Recommend active users with most topics (popular users)
-            for other_user in all_users or []:
-                if other_user['id'] == user_id or other_user['id'] in following_set:
-                    continue
-                other_topics = other_user.get('topics') or []
-                if not other_topics:
-                    continue
-                
-                # Score based on number of topics (popular/active users)
-                topic_count = len(other_topics)
-                score = min(topic_count * 0.1, 1.0)  # Normalize to max 1.0
-                
-                user_scores.append({
-                    'user_id': other_user['id'],
-                    'username': other_user.get('username'),
-                    'displayName': other_user.get('displayName'),
-                    'score': score,
-                    'common_topics_count': 0,
-                    'reason': 'Popular user with diverse interests'
-                })
-
-        return sorted(user_scores, key=lambda x: x['score'], reverse=True)[:limit]
+    @timed_engine
+    def recommend_users(self, user_id, user_topics, all_users, user_following, limit=10, user_index=None):
+        """Users with similar topics (Jaccard), or popular users as a fallback.
+
+        user_index is a prebuilt UserTopicIndex over all_users; it is built
+        here when not given.
+        """
+        user_index = user_index or UserTopicIndex(all_users)
+        excluded = user_index.rows_for([user_id, *(user_following or [])])
+
+        user_topic_ids = {topic['id'] for topic in user_topics or []}
+        if not user_topic_ids:
+            return self._popular_users(user_index, excluded, limit)
+
+        # Common topics with every indexed user in one sparse product
+        query = np.zeros(user_index.matrix.shape[1])
+        query[user_index.topic_columns(user_topic_ids)] = 1.0
+        intersections = user_index.matrix @ query
+        candidates = np.flatnonzero(intersections)
+        return self._similar_users(
+            user_index, candidates, intersections[candidates], len(user_topic_ids), excluded, limit
+        )
+
+    @timed_engine
+    def recommend_users_batch(self, user_ids, user_index, user_following=None, limit=10):
+        """Recommendations for many indexed users at once.
+
+        Topics are taken from user_index; user_following maps user id to the
+        ids that user already follows. Returns {user_id: recommendations}.
+        """
+        user_following = user_following or {}
+        results = {}
+        indexed = []
+        for user_id in user_ids:
+            row = user_index.row_of.get(user_id)
+            if row is None or user_index.sizes[row] == 0:
+                excluded = user_index.rows_for([user_id, *user_following.get(user_id, [])])
+                results[user_id] = self._popular_users(user_index, excluded, limit)
+            else:
+                indexed.append((user_id, row))
+
+        transposed = user_index.matrix.T.tocsc()
+        for start in range(0, len(indexed), self.USER_BATCH_CHUNK):
+            chunk = indexed[start:start + self.USER_BATCH_CHUNK]
+            # Row i holds the common topic counts of chunk[i] with every user
+            common = (user_index.matrix[[row for _, row in chunk]] @ transposed).tocsr()
+            for i, (user_id, row) in enumerate(chunk):
+                cells = slice(common.indptr[i], common.indptr[i + 1])
+                excluded = user_index.rows_for([user_id, *user_following.get(user_id, [])])
+                results[user_id] = self._similar_users(
+                    user_index, common.indices[cells], common.data[cells], user_index.sizes[row], excluded, limit
+                )
+        return results
+
+    def _similar_users(self, user_index, candidates, common, topic_count, excluded, limit):
+        """Rank candidate rows by Jaccard similarity from their common topic counts"""
+        # Sparse products leave rows in column order; ties must keep user order
+        order = np.argsort(candidates, kind='stable')
+        candidates, common = candidates[order], common[order]
+        keep = (common > 0) & ~np.isin(candidates, excluded)
+        candidates, common = candidates[keep], common[keep]
+
+        # Jaccard similarity: |A & B| / (|A| + |B| - |A & B|)
+        similarity = common / (topic_count + user_index.sizes[candidates] - common)
+        scores = similarity * (1 + common * 0.1)
+
+        top = self._top_k(scores, limit)
+        recommendations = []
+        for row, score, count in zip(candidates[top].tolist(), scores[top].tolist(), common[top].tolist()):
+            other_user = user_index.users[row]
+            recommendations.append({
+                'user_id': other_user['id'],
+                'username': other_user.get('username'),
+                'displayName': other_user.get('displayName'),
+                'score': score,
+                'common_topics_count': int(count),
+                'reason': f'{int(count)} common interests'
+            })
+        return recommendations
+
+    def _popular_users(self, user_index, excluded, limit):
+        """Fallback: recommend active users with most topics (popular users)"""
+        candidates = np.flatnonzero(user_index.sizes > 0)
+        candidates = candidates[~np.isin(candidates, excluded)]
+        scores = np.minimum(user_index.sizes[candidates] * 0.1, 1.0)  # Normalize to max 1.0
+
+        top = self._top_k(scores, limit)
+        return [
+            {
+                'user_id': user_index.users[row]['id'],
+                'username': user_index.users[row].get('username'),
+                'displayName': user_index.users[row].get('displayName'),
+                'score': score,
+                'common_topics_count': 0,
+                'reason': 'Popular user with diverse interests'
+            }
+            for row, score in zip(candidates[top].tolist(), scores[top].tolist())
+        ]
 
     # ---------------------------
     # Trending Topics
     # ---------------------------
-    def calculate_trending_topics(self, topics_with_metrics, time_window_hours=168):
-        trending_scores = []
-        now = datetime.now()
-
+    @timed_engine
+    def calculate_trending_topics(self, topics_with_metrics, time_window_hours=168, limit=None):
+        scored = self._score_trending_topics(topics_with_metrics)
+        if limit is None:
+            return sorted(scored, key=lambda x: x['score'], reverse=True)
+        # Bounded heap over the generator: same order as sorting then slicing
+        return heapq.nlargest(limit, scored, key=lambda x: x['score'])
+
+    def _score_trending_topics(self, topics_with_metrics):
+        """Yield one scored dict per readable topic"""
         for topic in topics_with_metrics or []:
             try:
                 user_count = int(topic.get('user_count', 0) or 0)
@@ -139,7 +407,7 @@ class RecommendationEngine:
                     user_growth_factor = min(user_count / 100, 1.0)
                     trending_score *= (1 + user_growth_factor * 0.2)
 
-                trending_scores.append({
+                trending_topic = {
                     'topic_id': topic['id'],
                     'name': topic.get('name'),
                     'score': trending_score,
@@ -151,195 +419,340 @@ class RecommendationEngine:
                         'views': total_views,
                         'engagement': engagement
                     }
-                })
+                }
             except Exception as e:
                 print(f"Error calculating trending topic {topic.get('id')}: {e}")
-
-        return sorted(trending_scores, key=lambda x: x['score'], reverse=True)
+                continue
+            yield trending_topic
 
     # ---------------------------
     # Trending Posts
     # ---------------------------
-    def calculate_trending_posts(self, posts_with_metrics, time_window_hours=72, min_engagement=1):
-        trending_scores = []
-        now = datetime.now()
+    @timed_engine
+    def calculate_trending_posts(self, posts_with_metrics, time_window_hours=72, min_engagement=1, limit=None, now=None):
+        # Scored as whole arrays; post dicts are only read to build the columns
+        posts = list(posts_with_metrics or [])
+        if not posts:
+            return []
+
+        age_hours = self._age_hours_column(posts, now or datetime.now())
+        # Missing dates give NaN ages, which fail the window check
+        in_window = np.flatnonzero(age_hours <= time_window_hours)
+
+        counts, valid = self._count_columns([posts[i] for i in in_window])
+        in_window, counts = in_window[valid], counts[valid]
+        engagement = counts.sum(axis=1)
+
+        keep = engagement >= min_engagement
+        candidates = in_window[keep]
+        counts = counts[keep]
+        engagement = engagement[keep]
+        age_hours = age_hours[candidates]
+        likes = counts[:, 0]
+        comments = counts[:, 1]
+
+        decay_factor = np.exp(-age_hours / 24)
+        velocity = np.where(age_hours > 0, engagement / np.where(age_hours > 0, age_hours, 1), engagement)
+        trending_score = engagement * decay_factor * (1 + np.log1p(velocity) * 0.3)
+
+        discussion_factor = np.minimum(comments / np.maximum(likes, 1), 3.0)
+        trending_score = np.where(likes > 0, trending_score * (1 + discussion_factor * 0.1), trending_score)
+
+        # Only the selected rows become dicts; tolist() avoids numpy scalars
+        top = self._top_k(trending_score, limit)
+        scores = trending_score[top].tolist()
+        ages = age_hours[top].tolist()
+        rows = counts[top].tolist()
+        totals = engagement[top].tolist()
+        return [
+            {
+                'post_id': posts[post_index]['id'],
+                'score': score,
+                'metrics': {
+                    'likes': row[0],
+                    'comments': row[1],
+                    'bookmarks': row[2],
+                    'views': row[3],
+                    'age_hours': age,
+                    'engagement': total
+                }
+            }
+            for post_index, score, age, row, total in zip(candidates[top].tolist(), scores, ages, rows, totals)
+        ]
+
+    @timed_engine
+    def rank_recent_posts(self, posts_with_metrics, window_hours=24, exclude_ids=(), limit=None, now=None):
+        """Posts from the last window_hours with likes or comments, ranked by likes + 1.5 x comments"""
+        posts = list(posts_with_metrics or [])
+        if not posts:
+            return []
+
+        age_hours = self._age_hours_column(posts, now or datetime.now())
+        # Counts are only read for posts inside the window
+        in_window = np.flatnonzero(age_hours <= window_hours)
+        window_posts = [posts[i] for i in in_window]
+        counts, valid = self._count_columns(window_posts)
+        excluded = np.fromiter((post['id'] in exclude_ids for post in window_posts), dtype=bool, count=len(window_posts))
+        keep = valid & ~excluded & ((counts[:, 0] > 0) | (counts[:, 1] > 0))
+        candidates, likes, comments = in_window[keep], counts[keep, 0], counts[keep, 1]
+        scores = likes * 1.0 + comments * 1.5
+
+        top = self._top_k(scores, limit)
+        return [
+            {
+                'post_id': posts[post_index]['id'],
+                'score': score,
+                'metrics': {
+                    'likes': post_likes,
+                    'comments': post_comments,
+                    'bookmarks': 0,
+                    'views': 0,
+                    'engagement': score
+                }
+            }
+            for post_index, score, post_likes, post_comments in zip(
+                candidates[top].tolist(), scores[top].tolist(), likes[top].tolist(), comments[top].tolist()
+            )
+        ]
 
-        for post in posts_with_metrics or []:
+    def _age_hours_column(self, posts, now):
+        """Age in hours of each post as a float array; NaN where createdAt is missing or unparseable"""
+        values = [post.get('createdAt') for post in posts]
+        # Fast path: naive datetimes straight from psycopg2
+        if all(value is None or (type(value) is datetime and value.tzinfo is None) for value in values):
+            return np.fromiter(
+                ((now - value).total_seconds() / 3600 if value is not None else np.nan for value in values),
+                dtype=np.float64,
+                count=len(values)
+            )
+
+        ages = np.full(len(values), np.nan)
+        for i, (post, created_at) in enumerate(zip(posts, values)):
             try:
-                created_at = post.get('createdAt')
                 if not created_at:
                     continue
                 if isinstance(created_at, str):
                     created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                age_hours = (now - created_at.replace(tzinfo=None)).total_seconds() / 3600
-                if age_hours > time_window_hours:
-                    continue
-
-                likes = int(post.get('likes_count', 0) or 0)
-                comments = int(post.get('comments_count', 0) or 0)
-                bookmarks = int(post.get('bookmarks_count', 0) or 0)
-                views = int(post.get('views_count', 0) or 0)
-
-                engagement = likes + comments + bookmarks + views
-                if engagement < min_engagement:
-                    continue
-
-                decay_factor = np.exp(-age_hours / 24)
-                velocity = engagement / age_hours if age_hours > 0 else engagement
-                trending_score = engagement * decay_factor * (1 + np.log1p(velocity) * 0.3)
-
-                if likes > 0:
-                    discussion_factor = min(comments / likes, 3.0)
-                    trending_score *= (1 + discussion_factor * 0.1)
-
-                trending_scores.append({
-                    'post_id': post['id'],
-                    'score': trending_score,
-                    'metrics': {
-                        'likes': likes,
-                        'comments': comments,
-                        'bookmarks': bookmarks,
-                        'views': views,
-                        'age_hours': age_hours,
-                        'engagement': engagement
-                    }
-                })
+                ages[i] = (now - created_at.replace(tzinfo=None)).total_seconds() / 3600
             except Exception as e:
-                print(f"Error calculating trending post {post.get('id')}: {e}")
-
-        return sorted(trending_scores, key=lambda x: x['score'], reverse=True)
+                print(f"Error reading createdAt of post {post.get('id')}: {e}")
+        return ages
+
+    def _count_columns(self, posts):
+        """Likes, comments, bookmarks and views as an Nx4 int array, plus a mask of readable rows"""
+        rows = [
+            (
+                post.get('likes_count', 0) or 0,
+                post.get('comments_count', 0) or 0,
+                post.get('bookmarks_count', 0) or 0,
+                post.get('views_count', 0) or 0,
+            )
+            for post in posts
+        ]
+        try:
+            return np.array(rows, dtype=np.int64).reshape(-1, 4), np.ones(len(rows), dtype=bool)
+        except (TypeError, ValueError):
+            pass
+
+        # Slow path: find the rows that cannot be converted
+        counts = np.zeros((len(rows), 4), dtype=np.int64)
+        valid = np.ones(len(rows), dtype=bool)
+        for i, (post, row) in enumerate(zip(posts, rows)):
+            try:
+                counts[i] = [int(value) for value in row]
+            except Exception as e:
+                print(f"Error reading metrics of post {post.get('id')}: {e}")
+                valid[i] = False
+        return counts, valid
+
+    def _top_k(self, scores, k=None):
+        """Indices of the k highest scores, best first; ties keep input order"""
+        if k is None or k >= len(scores):
+            return np.argsort(-scores, kind='stable')
+        if k <= 0:
+            return np.array([], dtype=np.intp)
+        threshold = scores[np.argpartition(-scores, k - 1)[k - 1]]
+        # Everything above the k-th score, then the earliest ties with it
+        above = np.flatnonzero(scores > threshold)
+        ties = np.flatnonzero(scores == threshold)[:k - len(above)]
+        top = np.concatenate([above, ties])
+        return top[np.lexsort((top, -scores[top]))]
 
     # ---------------------------
     # Personalized Feed
     # ---------------------------
-    def generate_personalized_feed(self, user_id, user_topics, posts, user_activity=None, limit=50):
-       
+    FEED_USER_CHUNK = 256  # users scored per sparse product in batch mode
+
+    def generate_personalized_feed(self, user_id, user_topics, posts, user_activity=None, limit=50, now=None):
         if not posts:
             return []
-        
-        if not user_topics or len(user_topics) == 0:
-            # Fallback: Return recent posts sorted by engagement
-            scored_posts = []
-            now = datetime.now()
-            for post in posts:
-                created_at = post.get('createdAt')
-                if not created_at:
+        return self.generate_personalized_feeds(
+            [{'user_id': user_id, 'user_topics': user_topics, 'user_activity': user_activity}],
+            posts,
+            limit=limit,
+            now=now
+        )[0]
+
+    @timed_engine
+    def generate_personalized_feeds(self, users, posts, limit=50, now=None):
+        """Score one candidate post set for many users at once.
+
+        users is a list of {'user_id', 'user_topics', 'user_activity'} dicts;
+        returns one feed per user, in the same order. Topic matches for all
+        users come from sparse post x topic by topic x user products.
+        """
+        if not posts or not users:
+            return [[] for _ in users]
+        features = self._feed_features(posts, now or datetime.now())
+
+        feeds = [None] * len(users)
+        with_topics = []
+        for position, user in enumerate(users):
+            if user.get('user_topics'):
+                with_topics.append(position)
+            else:
+                feeds[position] = self._fallback_feed(features, limit)
+
+        for start in range(0, len(with_topics), self.FEED_USER_CHUNK):
+            chunk = with_topics[start:start + self.FEED_USER_CHUNK]
+            chunk_users = [users[position] for position in chunk]
+            id_matches = (features['topic_ids'] @ self._user_topic_matrix(
+                chunk_users, features['id_vocab'], lambda t: t['id'] if 'id' in t else None
+            )).toarray()
+            name_matches = (features['topic_names'] @ self._user_topic_matrix(
+                chunk_users, features['name_vocab'], lambda t: (t.get('name') or '').lower()
+            )).toarray()
+            for column, position in enumerate(chunk):
+                feeds[position] = self._topic_feed(
+                    features,
+                    id_matches[:, column],
+                    name_matches[:, column],
+                    self._activity_boost(users[position].get('user_activity')),
+                    limit
+                )
+        return feeds
+
+    def _feed_features(self, posts, now):
+        """Columnar features shared by every user scored against these posts"""
+        age_hours = self._age_hours_column(posts, now)
+        counts, valid = self._count_columns(posts)
+        valid &= ~np.isnan(age_hours)
+        likes, comments, bookmarks, views = (counts[:, i] for i in range(4))
+
+        # Binary post x topic matrices, by topic id and by lowercased name
+        id_vocab, name_vocab = {}, {}
+        id_rows, id_cols, name_rows, name_cols = [], [], [], []
+        for row, post in enumerate(posts):
+            for topic in post.get('topics') or []:
+                if not isinstance(topic, dict):
                     continue
-                if isinstance(created_at, str):
-                    try:
-                        created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                    except:
-                        continue
-                
-                age_hours = (now - created_at.replace(tzinfo=None)).total_seconds() / 3600
-                likes = int(post.get('likes_count', 0) or 0)
-                comments = int(post.get('comments_count', 0) or 0)
-                engagement = likes + comments * 1.5
-                
-                # Simple score: engagement with recency decay
-                score = engagement * np.exp(-age_hours / 168)  # Decay over 1 week
-                
-                scored_posts.append({
-                    'post_id': post['id'],
-                    'score': score,
-                    'reason': 'Recent popular post'
-                })
-            
-            return sorted(scored_posts, key=lambda x: x['score'], reverse=True)[:limit]
-        
-        # Build user topic set for fast lookup
-        user_topic_ids = {topic['id'] for topic in user_topics}
-        user_topic_names = {topic.get('name', '').lower() for topic in user_topics}
-        
-        # Analyze user activity patterns if available
+                if 'id' in topic:
+                    id_rows.append(row)
+                    id_cols.append(id_vocab.setdefault(topic['id'], len(id_vocab)))
+                name_rows.append(row)
+                name_cols.append(name_vocab.setdefault((topic.get('name') or '').lower(), len(name_vocab)))
+
+        return {
+            'posts': posts,
+            'valid': valid,
+            'age_hours': age_hours,
+            'recency': np.exp(-age_hours / 168),  # Decay over 1 week
+            'likes': likes,
+            'comments': comments,
+            'engagement': likes + (comments * 1.5) + (bookmarks * 1.2) + (views * 0.1),
+            'id_vocab': id_vocab,
+            'name_vocab': name_vocab,
+            'topic_ids': self._binary_matrix(id_rows, id_cols, (len(posts), len(id_vocab))),
+            'topic_names': self._binary_matrix(name_rows, name_cols, (len(posts), len(name_vocab))),
+        }
+
+    def _binary_matrix(self, rows, cols, shape):
+        """CSR matrix with 1 at each (row, col); repeated pairs still count once"""
+        matrix = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=shape)
+        matrix.sum_duplicates()
+        matrix.data[:] = 1.0
+        return matrix
+
+    def _user_topic_matrix(self, users, vocab, key):
+        """Binary topic x user matrix over vocab for each user's topics"""
+        rows, cols = [], []
+        for column, user in enumerate(users):
+            for topic in user['user_topics']:
+                index = vocab.get(key(topic))
+                if index is not None:
+                    rows.append(index)
+                    cols.append(column)
+        return self._binary_matrix(rows, cols, (len(vocab), len(users)))
+
+    def _activity_boost(self, user_activity):
+        """Boost for users who interact a lot (likes, comments)"""
         activity_weights = {}
-        if user_activity:
-            for activity in user_activity:
-                activity_type = activity.get('type')
-                if activity_type:
-                    activity_weights[activity_type] = activity_weights.get(activity_type, 0) + 1
-        
-        # Score each post
-        scored_posts = []
-        now = datetime.now()
-        
-        for post in posts:
-            try:
-                # Extract post topics
-                post_topics = post.get('topics', [])
-                post_topic_ids = {t['id'] for t in post_topics if isinstance(t, dict) and 'id' in t}
-                post_topic_names = {t.get('name', '').lower() for t in post_topics if isinstance(t, dict)}
-                
-                # Topic relevance score
-                topic_match_count = len(user_topic_ids & post_topic_ids)
-                if topic_match_count == 0:
-                    # Try name-based matching for fuzzy matching
-                    name_matches = len(user_topic_names & post_topic_names)
-                    if name_matches == 0:
-                        # Skip posts with no topic overlap (optional: can include with lower score)
-                        continue
-                    topic_score = name_matches * 0.5
-                else:
-                    topic_score = topic_match_count * 2.0
-                
-                # Engagement score
-                likes = int(post.get('likes_count', 0) or 0)
-                comments = int(post.get('comments_count', 0) or 0)
-                bookmarks = int(post.get('bookmarks_count', 0) or 0)
-                views = int(post.get('views_count', 0) or 0)
-                engagement = likes + (comments * 1.5) + (bookmarks * 1.2) + (views * 0.1)
-                
-                # Recency score (boost for recent posts)
-                created_at = post.get('createdAt')
-                if not created_at:
-                    continue
-                if isinstance(created_at, str):
-                    created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                age_hours = (now - created_at.replace(tzinfo=None)).total_seconds() / 3600
-                recency_factor = np.exp(-age_hours / 168)  # Decay over 1 week
-                
-                # Activity pattern boost (if user interacts with similar content types)
-                activity_boost = 1.0
-                post_type = post.get('type', 'idea')
-                if activity_weights.get('like', 0) > 5:
-                    activity_boost += 0.1
-                if activity_weights.get('comment', 0) > 3:
-                    activity_boost += 0.15
-                
-                # Combined score
-                base_score = topic_score * (1 + np.log1p(engagement) * 0.5)
-                final_score = base_score * recency_factor * activity_boost
-                
-                # Reason for recommendation
-                reasons = []
-                if topic_match_count > 0:
-                    reasons.append(f"{topic_match_count} matching interests")
-                if engagement > 10:
-                    reasons.append("high engagement")
-                if age_hours < 24:
-                    reasons.append("recent")
-                
-                reason = ", ".join(reasons) if reasons else "based on your interests"
-                
-                scored_posts.append({
-                    'post_id': post['id'],
-                    'score': final_score,
-                    'metrics': {
-                        'topic_matches': topic_match_count,
-                        'engagement': engagement,
-                        'age_hours': age_hours,
-                        'likes': likes,
-                        'comments': comments
-                    },
-                    'reason': reason
-                })
-                
-            except Exception as e:
-                print(f"Error scoring post {post.get('id')}: {e}")
-                continue
-        
-        # Sort by score and return top N
-        return sorted(scored_posts, key=lambda x: x['score'], reverse=True)[:limit]
+        for activity in user_activity or []:
+            activity_type = activity.get('type')
+            if activity_type:
+                activity_weights[activity_type] = activity_weights.get(activity_type, 0) + 1
+        activity_boost = 1.0
+        if activity_weights.get('like', 0) > 5:
+            activity_boost += 0.1
+        if activity_weights.get('comment', 0) > 3:
+            activity_boost += 0.15
+        return activity_boost
+
+    def _fallback_feed(self, features, limit):
+        """Recent posts sorted by engagement, for users without topics"""
+        candidates = np.flatnonzero(features['valid'])
+        engagement = features['likes'][candidates] + features['comments'][candidates] * 1.5
+        scores = engagement * features['recency'][candidates]
+
+        top = self._top_k(scores, limit)
+        return [
+            {
+                'post_id': features['posts'][post_index]['id'],
+                'score': score,
+                'reason': 'Recent popular post'
+            }
+            for post_index, score in zip(candidates[top].tolist(), scores[top].tolist())
+        ]
+
+    def _topic_feed(self, features, id_matches, name_matches, activity_boost, limit):
+        """Top posts for one user from their id and name topic match counts"""
+        # Id matches score 2.0 each; name matches (0.5 each) only count without id matches
+        topic_score = np.where(id_matches > 0, id_matches * 2.0, name_matches * 0.5)
+        candidates = np.flatnonzero(features['valid'] & (topic_score > 0))
+
+        engagement = features['engagement'][candidates]
+        base_score = topic_score[candidates] * (1 + np.log1p(engagement) * 0.5)
+        scores = base_score * features['recency'][candidates] * activity_boost
+
+        top = self._top_k(scores, limit)
+        feed = []
+        for post_index, score in zip(candidates[top].tolist(), scores[top].tolist()):
+            topic_match_count = int(id_matches[post_index])
+            post_engagement = float(features['engagement'][post_index])
+            age_hours = float(features['age_hours'][post_index])
+
+            # Reason for recommendation
+            reasons = []
+            if topic_match_count > 0:
+                reasons.append(f"{topic_match_count} matching interests")
+            if post_engagement > 10:
+                reasons.append("high engagement")
+            if age_hours < 24:
+                reasons.append("recent")
+
+            feed.append({
+                'post_id': features['posts'][post_index]['id'],
+                'score': score,
+                'metrics': {
+                    'topic_matches': topic_match_count,
+                    'engagement': post_engagement,
+                    'age_hours': age_hours,
+                    'likes': int(features['likes'][post_index]),
+                    'comments': int(features['comments'][post_index])
+                },
+                'reason': ", ".join(reasons) if reasons else "based on your interests"
+            })
+        return feed
 
     # ---------------------------
     # Text similarity
@@ -353,6 +766,33 @@ class RecommendationEngine:
         words1, words2 = set(str1_lower.split()), set(str2_lower.split())
         return len(words1 & words2) / len(words1 | words2) if words1 and words2 else 0.0
 
+    def _compile_moderation_matcher(self):
+        """Combine every moderation keyword into one regex, built once per engine"""
+        # Changes whenever a keyword list changes; cached results carry it
+        rules = json.dumps(MODERATION_KEYWORDS, sort_keys=True)
+        self.moderation_rules_version = hashlib.sha1(rules.encode()).hexdigest()[:12]
+
+        categories_of = {}
+        for category, (whole_word, keywords) in MODERATION_KEYWORDS.items():
+            for keyword in keywords:
+                categories_of.setdefault(keyword, []).append((category, whole_word))
+
+        # The lookahead reports the longest keyword starting at each position,
+        # so shorter keywords that are prefixes of it are checked there too
+        self._moderation_pattern = re.compile(f'(?=({_trie_regex(categories_of)}))')
+        self._moderation_rules = {
+            keyword: [
+                (prefix, category, whole_word)
+                for prefix in categories_of if keyword.startswith(prefix)
+                for category, whole_word in categories_of[prefix]
+            ]
+            for keyword in categories_of
+        }
+
+    def _is_whole_word(self, text, start, end):
+        """Same as matching text[start:end] with \\b on both sides"""
+        return (start == 0 or not WORD_CHARACTER.match(text, start - 1)) and not WORD_CHARACTER.match(text, end)
+
     def analyze_content_moderation(self, content):
     
         if not content or not isinstance(content, str):
@@ -370,60 +810,38 @@ class RecommendationEngine:
         reasons = []
         severity_score = 0.0
 
-        # Define inappropriate content patterns
-        profanity_keywords = [
-            'damn', 'hell', 'ass', 'crap', 'shit', 'fuck', 'bitch', 'bastard',
-            'piss', 'dick', 'cock', 'pussy', 'whore', 'slut', 'faggot', 'nigger',
-            'cunt', 'motherfucker', 'asshole'
-        ]
-
-        hate_speech_keywords = [
-            'hate', 'kill all', 'death to', 'inferior', 'subhuman', 'vermin',
-            'scum', 'trash', 'terrorist', 'nazi', 'fascist', 'racist',
-            'sexist', 'bigot', 'supremacy'
-        ]
-
-        violent_keywords = [
-            'kill', 'murder', 'torture', 'rape', 'assault', 'attack',
-            'bomb', 'shoot', 'stab', 'hurt', 'harm', 'destroy',
-            'violence', 'weapon', 'gun', 'knife'
-        ]
-
-        spam_patterns = [
-            'click here', 'buy now', 'limited time', 'act now', 'free money',
-            'earn $$$', 'make money fast', 'get rich', 'work from home',
-            'viagra', 'casino', 'lottery', 'winner', 'prize', 'claim now'
-        ]
-
-        # Helper function to check for word boundaries to avoid false positives
-        def contains_word(text, word):
-            """Check if word exists with word boundaries to avoid partial matches"""
-            pattern = r'\b' + re.escape(word) + r'\b'
-            return bool(re.search(pattern, text, re.IGNORECASE))
+        # One pass over the text finds every keyword of every category
+        matched = {category: set() for category in MODERATION_KEYWORDS}
+        for match in self._moderation_pattern.finditer(content_lower):
+            position = match.start()
+            for keyword, category, whole_word in self._moderation_rules[match.group(1)]:
+                if whole_word and not self._is_whole_word(content_lower, position, position + len(keyword)):
+                    continue
+                matched[category].add(keyword)
 
         # Check for profanity
-        profanity_count = sum(1 for word in profanity_keywords if contains_word(content_lower, word))
+        profanity_count = len(matched['profanity'])
         if profanity_count > 0:
             flags.append('profanity')
             severity_score += profanity_count * 0.3
             reasons.append(f'Contains {profanity_count} profane word(s)')
 
-        # Check for hate speech (phrases can use simple substring matching)
-        hate_count = sum(1 for phrase in hate_speech_keywords if phrase in content_lower)
+        # Check for hate speech
+        hate_count = len(matched['hate_speech'])
         if hate_count > 0:
             flags.append('hate_speech')
             severity_score += hate_count * 0.5
             reasons.append(f'Contains {hate_count} hate speech pattern(s)')
 
         # Check for violent content
-        violent_count = sum(1 for word in violent_keywords if contains_word(content_lower, word))
+        violent_count = len(matched['violence'])
         if violent_count > 2:  # Only flag if multiple violent words
             flags.append('violence')
             severity_score += violent_count * 0.4
             reasons.append(f'Contains {violent_count} violent term(s)')
 
-        # Check for spam (phrases can use simple substring matching)
-        spam_count = sum(1 for phrase in spam_patterns if phrase in content_lower)
+        # Check for spam
+        spam_count = len(matched['spam'])
         if spam_count > 1:  # Require multiple spam indicators
             flags.append('spam')
             severity_score += spam_count * 0.3
@@ -431,15 +849,18 @@ class RecommendationEngine:
 
         # Check for excessive capitalization (potential shouting/spam)
         if len(content) > 20:
-            caps_ratio = sum(1 for c in content if c.isupper()) / len(content)
+            if content.isascii():
+                caps_count = sum(map(content.count, string.ascii_uppercase))
+            else:
+                caps_count = sum(map(str.isupper, content))
+            caps_ratio = caps_count / len(content)
             if caps_ratio > 0.5:
                 flags.append('excessive_caps')
                 severity_score += 0.2
                 reasons.append('Excessive capitalization detected')
 
         # Check for repetitive characters (spam indicator)
-        repetitive_pattern = re.findall(r'(.)\1{4,}', content)
-        if repetitive_pattern:
+        if REPEATED_CHARACTER.search(content):
             flags.append('repetitive_content')
             severity_score += 0.2
             reasons.append('Repetitive character patterns detected')
@@ -0,0 +1,128 @@
+"""Re-run content moderation over every post and comment, straight from Postgres.
+
+Usage:
+    python remoderate.py                      # posts then comments, resuming from the checkpoint
+    python remoderate.py --table comment      # only comments
+    python remoderate.py --dry-run            # report what would change without writing
+    python remoderate.py --restart            # ignore the checkpoint and scan from the start
+
+Only content whose status is still "okay" or "under_review" is scanned.
+Flagged content gets the status the backend's background moderation would
+give it (see moderation.moderation_status); content is never un-flagged.
+Only the status is written: the backend's other side effects (the
+AdminAuditLog entry, the author's warningCount, the notification and email,
+and the postFlagged socket event) are not. Progress is saved after every
+chunk, so an interrupted run continues where it stopped.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from database import MODERATED_TABLES, iter_moderation_content, update_moderation_statuses
+from moderation import analyze_contents, moderation_status
+
+DEFAULT_CHECKPOINT = '.remoderate_checkpoint.json'
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_checkpoint(path, checkpoint):
+    # Write then rename so an interrupted run never leaves a truncated file
+    with open(path + '.tmp', 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(path + '.tmp', path)
+
+class Progress:
+    """Running totals and throughput for one table"""
+
+    def __init__(self, table):
+        self.table = table
+        self.scanned = self.flagged = self.updated = 0
+        self.started = time.perf_counter()
+
+    def report(self, last_id=None, final=False):
+        elapsed = time.perf_counter() - self.started
+        rate = self.scanned / elapsed if elapsed > 0 else 0.0
+        label = 'done' if final else f'last id {last_id}'
+        print(f"{self.table}: {self.scanned} scanned, {self.flagged} flagged, {self.updated} updated "
+              f"in {elapsed:.1f}s ({rate:.0f} rows/s, {label})")
+
+def remoderate_table(table, executor, args, checkpoint):
+    """Scan one table chunk by chunk, keeping at most args.in_flight chunks queued"""
+    progress = Progress(table)
+    pending = deque()
+
+    def finish_oldest():
+        ids, results = pending.popleft()
+        if executor is not None:
+            results = results.result()
+        updates = [(row_id, status) for row_id, status in zip(ids, map(moderation_status, results)) if status]
+        progress.scanned += len(ids)
+        progress.flagged += len(updates)
+        if not args.dry_run:
+            progress.updated += update_moderation_statuses(table, updates)
+            checkpoint[table] = ids[-1]
+            save_checkpoint(args.checkpoint, checkpoint)
+        progress.report(last_id=ids[-1])
+
+    for rows in iter_moderation_content(table, after_id=checkpoint.get(table), chunk_size=args.chunk_size):
+        ids = [row[0] for row in rows]
+        contents = [row[1] for row in rows]
+        if executor is None:
+            pending.append((ids, analyze_contents(contents)))
+        else:
+            pending.append((ids, executor.submit(analyze_contents, contents)))
+        # Chunks are finished in scan order, so the checkpoint never skips rows
+        while len(pending) >= args.in_flight:
+            finish_oldest()
+    while pending:
+        finish_oldest()
+
+    progress.report(final=True)
+    return progress
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-run moderation over stored posts and comments")
+    parser.add_argument('--table', choices=['all', *MODERATED_TABLES], default='all')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='rows read and written per batch')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='worker processes for scoring (0 = score in this process)')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help='file recording the last id done per table')
+    parser.add_argument('--restart', action='store_true', help='ignore the checkpoint and scan from the start')
+    parser.add_argument('--dry-run', action='store_true', help='report flagged content without updating it')
+    args = parser.parse_args()
+    # Enough queued chunks to keep every worker busy while one batch is written
+    args.in_flight = max(args.workers, 1) * 2
+
+    checkpoint = {} if args.restart else load_checkpoint(args.checkpoint)
+    if checkpoint:
+        print(f"Resuming from checkpoint {checkpoint}")
+    tables = list(MODERATED_TABLES) if args.table == 'all' else [args.table]
+
+    executor = None
+    if args.workers > 0:
+        # spawn: workers must not inherit the open scan connection
+        executor = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        for table in tables:
+            remoderate_table(table, executor, args, checkpoint)
+            if not args.dry_run and table in checkpoint:
+                # Table completed: the next run starts a fresh pass over it
+                del checkpoint[table]
+                if checkpoint:
+                    save_checkpoint(args.checkpoint, checkpoint)
+                elif os.path.exists(args.checkpoint):
+                    os.remove(args.checkpoint)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+# Tests import the service modules (and the reference loops in benchmarks) by name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import make_posts  # noqa: E402
+from recommendation_engine import RecommendationEngine  # noqa: E402
+
+# Reference time for scoring, so results do not depend on when the tests run
+NOW = datetime(2026, 1, 15, 12, 0, 0)
+
+def make_posts_at_now(n_posts, **kwargs):
+    """benchmarks.common.make_posts, dated relative to NOW instead of the current time"""
+    posts = make_posts(n_posts, **kwargs)
+    shift = NOW - datetime.now()
+    for post in posts:
+        post['createdAt'] += shift
+    return posts
+
+@pytest.fixture(scope='session')
+def engine():
+    return RecommendationEngine()
@@ -0,0 +1,103 @@
+"""TTLCache over the in-process LocalCacheBackend"""
+import threading
+import time
+
+import pytest
+
+from cache import LocalCacheBackend, TTLCache, create_cache
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, 'timed out'
+        time.sleep(0.01)
+
+def test_create_cache_applies_max_entries():
+    cache = create_cache(max_entries=3)
+    assert cache.backend.max_entries == 3
+    for key in 'abcde':
+        cache.get_or_compute(key, lambda key=key: key)
+    assert len(cache.backend) == 3
+
+def test_oldest_entries_are_evicted_first():
+    backend = LocalCacheBackend(max_entries=3)
+    for key in 'abc':
+        backend.set(key, key, time.time(), 60)
+    backend.set('a', 'a2', time.time(), 60)  # rewriting makes 'a' the newest
+    backend.set('d', 'd', time.time(), 60)
+    assert backend.get('b') is None
+    assert [backend.get(key)[0] for key in 'acd'] == ['a2', 'c', 'd']
+
+def test_expired_entries_are_evicted_before_live_ones():
+    backend = LocalCacheBackend(max_entries=3)
+    backend.set('live', 1, time.time(), 60)
+    backend.set('expired-1', 2, time.time(), -1)
+    backend.set('expired-2', 3, time.time(), -1)
+    backend.set('new', 4, time.time(), 60)
+    assert len(backend) == 2
+    assert backend.get('live')[0] == 1 and backend.get('new')[0] == 4
+
+def test_hits_are_served_without_recomputing():
+    cache = TTLCache(ttl=60, stale_ttl=60)
+    calls = []
+    for _ in range(3):
+        assert cache.get_or_compute('k', lambda: calls.append(1) or 'value') == 'value'
+    assert len(calls) == 1
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 1
+
+def test_stale_entries_are_served_while_refreshed_in_background():
+    cache = TTLCache(ttl=60, stale_ttl=60)
+    cache.backend.set('k', 'old', time.time() - 90, 30)
+    refreshed = threading.Event()
+
+    def compute():
+        refreshed.set()
+        return 'new'
+
+    assert cache.get_or_compute('k', compute) == 'old'
+    assert refreshed.wait(2)
+    wait_for(lambda: cache.backend.get('k')[0] == 'new')
+    assert cache.get_or_compute('k', lambda: 'unused') == 'new'
+    stats = cache.stats()
+    assert stats['stale_hits'] == 1 and stats['refreshes'] == 1
+
+def test_concurrent_misses_share_one_computation():
+    cache = TTLCache(ttl=60, stale_ttl=60)
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(2)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: cache.stats()['misses'] == 5)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ['value'] * 5
+    assert len(calls) == 1
+
+def test_errors_are_not_cached():
+    cache = TTLCache(ttl=60, stale_ttl=60)
+
+    def fail():
+        raise RuntimeError('database down')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute('k', fail)
+    assert cache.backend.get('k') is None
+    assert cache.get_or_compute('k', lambda: 'value') == 'value'
+    assert cache.stats()['errors'] == 1
+
+def test_zero_ttl_disables_caching():
+    cache = TTLCache(ttl=0)
+    calls = []
+    for _ in range(2):
+        cache.get_or_compute('k', lambda: calls.append(1))
+    assert len(calls) == 2 and len(cache.backend) == 0
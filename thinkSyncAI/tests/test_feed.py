@@ -0,0 +1,75 @@
+"""generate_personalized_feed(s) against the per-post loop they replaced"""
+from datetime import timedelta
+
+import pytest
+
+from benchmarks.bench_personalized_feed import generate_personalized_feed_loop
+from benchmarks.common import make_users
+from conftest import NOW, make_posts_at_now
+
+@pytest.fixture(scope='module')
+def posts():
+    posts = make_posts_at_now(1500, n_topics=30, max_age_hours=24 * 10, seed=5)
+    posts += [
+        # Matches users only by topic name, under a different id
+        {'id': 'renamed-topic', 'createdAt': NOW - timedelta(hours=3), 'likes_count': 9, 'comments_count': 4,
+         'bookmarks_count': 1, 'views_count': 80, 'topics': [{'id': 'other-id', 'name': 'topic 4'}]},
+        {'id': 'null-counts', 'createdAt': NOW - timedelta(hours=30), 'likes_count': None, 'comments_count': None,
+         'bookmarks_count': None, 'views_count': None, 'topics': [{'id': 'topic-4', 'name': 'Topic 4'}]},
+        {'id': 'no-topics', 'createdAt': NOW - timedelta(hours=1), 'likes_count': 100, 'comments_count': 20,
+         'topics': []},
+    ]
+    return posts
+
+@pytest.fixture(scope='module')
+def users():
+    users = make_users(40, n_topics=30, seed=9)
+    users.append({'user_id': 'active', 'user_topics': [{'id': 'topic-4', 'name': 'Topic 4'}],
+                  'user_activity': [{'type': 'like'}] * 6 + [{'type': 'comment'}] * 4})
+    return users
+
+def assert_same_feed(expected, actual):
+    """Same entries and scores in score order; ids may only swap between equal scores"""
+    assert len(actual) == len(expected)
+    assert [a['score'] for a in actual] == pytest.approx([e['score'] for e in expected], rel=1e-9)
+    actual_by_id = {entry['post_id']: entry for entry in actual}
+    for e in expected:
+        a = actual_by_id.get(e['post_id'])
+        if a is None:
+            # Only allowed for a tie at the cut-off
+            assert e['score'] == pytest.approx(expected[-1]['score'], rel=1e-9)
+            continue
+        assert a['reason'] == e['reason']
+        assert a.get('metrics') == pytest.approx(e.get('metrics'), rel=1e-9)
+
+@pytest.mark.parametrize('limit', [10, 50, 5000])
+def test_generate_personalized_feed_matches_loop(engine, posts, users, limit):
+    for user in users:
+        expected = generate_personalized_feed_loop(
+            user['user_id'], user['user_topics'], posts, user['user_activity'], limit, NOW)
+        actual = engine.generate_personalized_feed(
+            user['user_id'], user['user_topics'], posts, user['user_activity'], limit, NOW)
+        assert_same_feed(expected, actual)
+
+def test_users_without_topics_get_the_fallback(engine, posts, users):
+    user = next(u for u in users if not u['user_topics'])
+    feed = engine.generate_personalized_feed(user['user_id'], [], posts, limit=20, now=NOW)
+    assert feed and all(entry['reason'] == 'Recent popular post' for entry in feed)
+
+def test_name_only_match(engine, posts, users):
+    user = users[-1]
+    feed = engine.generate_personalized_feed(user['user_id'], user['user_topics'], posts, user['user_activity'],
+                                             limit=5000, now=NOW)
+    assert 'renamed-topic' in {entry['post_id'] for entry in feed}
+
+def test_generate_personalized_feeds_matches_loop(engine, posts, users):
+    feeds = engine.generate_personalized_feeds(users, posts, limit=20, now=NOW)
+    assert len(feeds) == len(users)
+    for user, feed in zip(users, feeds):
+        expected = generate_personalized_feed_loop(
+            user['user_id'], user['user_topics'], posts, user['user_activity'], 20, NOW)
+        assert_same_feed(expected, feed)
+
+def test_empty_posts(engine, users):
+    user = users[-1]
+    assert engine.generate_personalized_feed(user['user_id'], user['user_topics'], [], now=NOW) == []
@@ -0,0 +1,71 @@
+"""Stored feeds (feed_refresh.FeedMaterializer) against live /api/feed/personalized responses"""
+from datetime import datetime, timedelta
+
+import pytest
+
+import app
+import feed_refresh
+from config import FEED_SIZE
+
+# The endpoint scores against the current time, so the posts are dated from it
+STARTED = datetime.now()
+TOPICS = [{'id': f'topic-{t}', 'name': f'Topic {t}'} for t in range(6)]
+USER = {'user_id': 'user-1', 'user_topics': TOPICS[:3], 'user_activity': [{'type': 'like'}] * 8}
+
+# Engagement-ordered candidates, as the database returns them
+POSTS = sorted((
+    {
+        'id': f'post-{i}',
+        'createdAt': STARTED - timedelta(hours=(i * 7) % 200),
+        'likes_count': (i * 13) % 40,
+        'comments_count': (i * 5) % 9,
+        'bookmarks_count': i % 3,
+        'views_count': (i * 31) % 300,
+        'engagement_score': (i * 37) % 101,
+        'topics': [TOPICS[i % 6], TOPICS[(i * 5) % 6]],
+    }
+    for i in range(600)
+), key=lambda post: (post['engagement_score'], post['createdAt']), reverse=True)
+
+def posts_with_topics(topic_ids, limit):
+    return [post for post in POSTS if {t['id'] for t in post['topics']} & set(topic_ids)][:limit]
+
+@pytest.fixture
+def requested_limits(monkeypatch):
+    """Replace the database calls of both paths; returns the live candidate limits requested"""
+    limits = []
+
+    def fetch_posts_by_user_topics(user_id, limit=50):
+        limits.append(limit)
+        return posts_with_topics([t['id'] for t in USER['user_topics']], limit)
+
+    monkeypatch.setattr(app, 'fetch_user_topics', lambda user_id: USER['user_topics'])
+    monkeypatch.setattr(app, 'fetch_user_activity', lambda user_id, limit=100: USER['user_activity'])
+    monkeypatch.setattr(app, 'fetch_posts_by_user_topics', fetch_posts_by_user_topics)
+    monkeypatch.setattr(app, 'fetch_materialized_feed', lambda user_id, max_age_seconds=None: None)
+    monkeypatch.setattr(feed_refresh, 'fetch_feed_users', lambda user_ids: [USER])
+    monkeypatch.setattr(feed_refresh, 'fetch_posts_by_topics', posts_with_topics)
+    return limits
+
+def stored_feed(monkeypatch):
+    saved = []
+    monkeypatch.setattr(feed_refresh, 'save_materialized_feeds', lambda feeds, computed_at: saved.extend(feeds) or 1)
+    feed_refresh.FeedMaterializer(app.recommendation_engine).refresh([USER['user_id']], STARTED)
+    return dict(saved)[USER['user_id']]
+
+def live_feed(limit):
+    response = app.app.test_client().post('/api/feed/personalized', json={'userId': USER['user_id'], 'limit': limit})
+    return response.get_json()['feed']
+
+@pytest.mark.parametrize('limit', [5, 20, FEED_SIZE])
+def test_live_feed_ranks_the_stored_candidates_when_materialized(monkeypatch, requested_limits, limit):
+    monkeypatch.setattr(app, 'USE_MATERIALIZED_FEED', True)
+    stored = stored_feed(monkeypatch)
+    live = live_feed(limit)
+    assert requested_limits == [feed_refresh.FeedMaterializer(None).candidate_limit]
+    assert [p['post_id'] for p in live] == [p['post_id'] for p in stored[:limit]]
+
+def test_live_feed_ranks_limit_candidates_when_not_materialized(monkeypatch, requested_limits):
+    monkeypatch.setattr(app, 'USE_MATERIALIZED_FEED', False)
+    live_feed(20)
+    assert requested_limits == [feed_refresh.feed_candidate_limit(20)]
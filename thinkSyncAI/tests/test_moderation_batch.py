@@ -0,0 +1,91 @@
+"""moderation_status, ModerationPool and /ai/moderation/analyze/batch"""
+import threading
+import time
+
+import pytest
+
+import app
+import moderation
+from moderation import ModerationPool, analyze_contents, moderation_status
+
+def result(flagged=True, severity='low', confidence=0.0):
+    return {'flagged': flagged, 'severity': severity, 'confidence': confidence}
+
+# Cases of processModeration in thinkSyncBE/services/backgroundModeration.service.js
+@pytest.mark.parametrize('moderation, status', [
+    (None, None),
+    (result(flagged=False, severity='high', confidence=0.9), None),
+    (result(severity='low', confidence=0.39), None),
+    (result(severity='none', confidence=0.0), None),
+    (result(severity='low', confidence=0.4), 'under_review'),
+    (result(severity='low', confidence=0.69), 'under_review'),
+    (result(severity='medium', confidence=0.1), 'flagged'),
+    (result(severity='HIGH', confidence=0.69), 'flagged'),
+    (result(severity=None, confidence=0.5), 'under_review'),
+    (result(severity='low', confidence=0.7), 'achieved'),
+    (result(severity='high', confidence=0.95), 'achieved'),
+])
+def test_moderation_status_matches_backend(moderation, status):
+    assert moderation_status(moderation) == status
+
+CONTENTS = ['a friendly post', 'click here to buy now, free money', 'kill all of them', 'a friendly post', 'hello']
+
+def test_pool_results_keep_request_order():
+    pool = ModerationPool(workers=1, min_batch=1, chunk_size=2)
+    moderation.moderation_cache.clear()
+    try:
+        assert list(pool.analyze(CONTENTS)) == analyze_contents(CONTENTS)
+    finally:
+        pool.shutdown()
+
+def test_concurrent_batches_share_one_executor(monkeypatch):
+    created = []
+
+    class SlowExecutor:
+        def __init__(self, **kwargs):
+            created.append(self)
+            time.sleep(0.05)
+
+    monkeypatch.setattr(moderation, 'ProcessPoolExecutor', SlowExecutor)
+    pool = ModerationPool(workers=2)
+    executors = []
+    threads = [threading.Thread(target=lambda: executors.append(pool._get_executor())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 1
+    assert all(executor is created[0] for executor in executors)
+
+ITEMS = [
+    {'id': 'p1', 'content': 'kill all of them'},
+    {'id': 'p2'},
+    {'id': 'c1', 'content': 'nice idea', 'contentType': 'comment'},
+    'not an object',
+    {'id': 'p3', 'content': ''},
+    {'id': 'p4', 'content': 'click here, free money'},
+]
+
+@pytest.mark.parametrize('stream_threshold', [1000, 2])
+def test_batch_endpoint_keeps_order_and_reports_missing_content(monkeypatch, stream_threshold):
+    monkeypatch.setattr(app, 'MODERATION_STREAM_THRESHOLD', stream_threshold)
+    response = app.app.test_client().post('/ai/moderation/analyze/batch', json={'items': ITEMS})
+    body = response.get_json()
+    assert response.status_code == 200 and body['success']
+    results = body['results']
+    assert [r['id'] for r in results] == ['p1', 'p2', 'c1', None, 'p3', 'p4']
+    assert [r['contentType'] for r in results] == ['post', 'post', 'comment', 'post', 'post', 'post']
+    for index in (1, 3, 4):
+        assert results[index] == {'id': results[index]['id'], 'contentType': 'post', 'error': 'content is required'}
+    expected = analyze_contents(['kill all of them', 'nice idea', 'click here, free money'])
+    assert [results[i]['moderation'] for i in (0, 2, 5)] == expected
+
+@pytest.mark.parametrize('body', [{}, {'items': []}, {'items': 'text'}])
+def test_batch_endpoint_rejects_invalid_items(body):
+    response = app.app.test_client().post('/ai/moderation/analyze/batch', json=body)
+    assert response.status_code == 400
+
+def test_batch_endpoint_rejects_oversized_batches(monkeypatch):
+    monkeypatch.setattr(app, 'MODERATION_BATCH_MAX_SIZE', 2)
+    response = app.app.test_client().post('/ai/moderation/analyze/batch', json={'items': ITEMS})
+    assert response.status_code == 400
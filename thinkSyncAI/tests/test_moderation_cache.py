@@ -0,0 +1,73 @@
+"""ModerationCache and the cached moderation.analyze_content"""
+import pytest
+
+import moderation
+import recommendation_engine
+from moderation import ModerationCache
+
+RESULT = {'flagged': True, 'confidence': 0.5, 'categories': ['spam'], 'reasons': ['spam'],
+          'severity': 'low', 'action': 'review'}
+
+@pytest.fixture
+def cache(monkeypatch):
+    """A small cache installed as the process-wide moderation cache"""
+    cache = ModerationCache(max_size=2)
+    monkeypatch.setattr(moderation, 'moderation_cache', cache)
+    return cache
+
+def test_hits_return_copies(cache):
+    key = cache.key('free money')
+    assert cache.get(key) is None
+    cache.put(key, RESULT)
+    hit = cache.get(key)
+    assert hit == RESULT
+    hit['categories'].append('changed')
+    assert cache.get(key) == RESULT
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 1
+
+def test_least_recently_used_entry_is_evicted(cache):
+    a, b, c = (cache.key(text) for text in 'abc')
+    cache.put(a, RESULT)
+    cache.put(b, RESULT)
+    cache.get(a)  # b is now the least recently used
+    cache.put(c, RESULT)
+    assert cache.get(b) is None
+    assert cache.get(a) == RESULT and cache.get(c) == RESULT
+    assert cache.stats()['evictions'] == 1 and cache.stats()['size'] == 2
+
+def test_size_zero_disables_the_cache(monkeypatch):
+    cache = ModerationCache(max_size=0)
+    monkeypatch.setattr(moderation, 'moderation_cache', cache)
+    calls = []
+    engine = moderation._get_engine()
+    original = engine.analyze_content_moderation
+    monkeypatch.setattr(engine, 'analyze_content_moderation', lambda content: calls.append(content) or original(content))
+    for _ in range(3):
+        moderation.analyze_content('click here')
+    assert len(calls) == 3
+    assert cache.stats()['size'] == 0
+
+def test_analyze_content_is_served_from_the_cache(cache, monkeypatch):
+    engine = moderation._get_engine()
+    calls = []
+    original = engine.analyze_content_moderation
+    monkeypatch.setattr(engine, 'analyze_content_moderation', lambda content: calls.append(content) or original(content))
+    first = moderation.analyze_content('click here')
+    assert moderation.analyze_content('click here') == first
+    assert calls == ['click here']
+
+def test_recompiled_rules_do_not_serve_older_entries(cache, monkeypatch):
+    engine = moderation._get_engine()
+    assert moderation.analyze_content('perfectly pleasant')['categories'] == []
+    version = engine.moderation_rules_version
+
+    keywords = dict(recommendation_engine.MODERATION_KEYWORDS, spam=(False, ['perfectly', 'pleasant']))
+    monkeypatch.setattr(recommendation_engine, 'MODERATION_KEYWORDS', keywords)
+    engine._compile_moderation_matcher()
+    try:
+        assert engine.moderation_rules_version != version
+        assert moderation.analyze_content('perfectly pleasant')['categories'] == ['spam']
+    finally:
+        monkeypatch.undo()
+        engine._compile_moderation_matcher()
+    assert engine.moderation_rules_version == version
@@ -0,0 +1,54 @@
+"""recommend_topics with a TopicSimilarityIndex against the pairwise name loop it replaced"""
+import random
+
+import pytest
+
+from benchmarks.bench_recommend_topics import make_requests, make_topics, recommend_topics_loop
+from recommendation_engine import TopicSimilarityIndex
+
+@pytest.fixture(scope='module')
+def topics():
+    topics = make_topics(300, random.Random(8))
+    # Names the similarity rules treat specially: substrings, case, blanks and duplicates
+    topics += [
+        {'id': 'substring', 'name': 'Machine'},
+        {'id': 'superstring', 'name': 'machine learning for smart home devices'},
+        {'id': 'blank', 'name': ''},
+        {'id': 'no-name', 'name': None},
+        {'id': 'duplicate-a', 'name': 'Data Science'},
+        {'id': 'duplicate-b', 'name': 'data science'},
+    ]
+    return topics
+
+def check(engine, index, topics, requests, limit):
+    for followed, activity in requests:
+        expected = recommend_topics_loop(engine, 'u', followed, activity, topics, limit)
+        assert engine.recommend_topics('u', followed, activity, topics, limit, topic_index=index) == expected
+
+@pytest.mark.parametrize('limit', [1, 10, 1000])
+def test_recommend_topics_matches_loop(engine, topics, limit):
+    requests = make_requests(topics, random.Random(limit), count=60)
+    requests += [([], []), ([t for t in topics if t['id'] in ('blank', 'no-name', 'substring')], [])]
+    check(engine, TopicSimilarityIndex(topics), topics, requests, limit)
+
+def test_recommend_topics_builds_its_own_index(engine, topics):
+    followed, activity = make_requests(topics, random.Random(1), count=1)[0]
+    assert engine.recommend_topics('u', followed, activity, topics, 10) == \
+        recommend_topics_loop(engine, 'u', followed, activity, topics, 10)
+
+def test_updated_index_matches_rebuilt_index(engine, topics):
+    rng = random.Random(12)
+    index = TopicSimilarityIndex(topics)
+    # Remove, add and rename topics, then compare the updated index with the loop and a fresh build
+    changed = topics[10:] + make_topics(10, rng, start=len(topics))
+    changed[0] = {'id': changed[0]['id'], 'name': 'renamed ' + (changed[0]['name'] or '')}
+    index.update(changed)
+    requests = make_requests(changed, rng, count=60)
+    check(engine, index, changed, requests, 10)
+    check(engine, TopicSimilarityIndex(changed), changed, requests, 10)
+
+@pytest.mark.parametrize('a, b', [('Machine', 'machine learning'), ('web design', 'Web Dev'),
+                                  ('ai', 'smart home'), ('', 'web'), ('data science', 'science data')])
+def test_similar_ids_follow_text_similarity(engine, a, b):
+    index = TopicSimilarityIndex([{'id': 'a', 'name': a}, {'id': 'b', 'name': b}])
+    assert ('b' in index.similar_ids('a', a)) == (engine._text_similarity(a, b) > 0.3)
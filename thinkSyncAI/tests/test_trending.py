@@ -0,0 +1,55 @@
+"""calculate_trending_posts and rank_recent_posts against the per-post loops they replaced"""
+from datetime import timedelta
+
+import pytest
+
+from benchmarks.bench_trending_posts import calculate_trending_posts_loop, rank_recent_posts_loop
+from conftest import NOW, make_posts_at_now
+
+@pytest.fixture(scope='module')
+def posts():
+    posts = make_posts_at_now(2000, max_age_hours=96, seed=3)
+    # Rows as they can come back from the database or the API
+    posts += [
+        {'id': 'iso-string', 'createdAt': (NOW - timedelta(hours=2)).isoformat() + 'Z',
+         'likes_count': 40, 'comments_count': 12, 'bookmarks_count': 3, 'views_count': 400},
+        {'id': 'null-counts', 'createdAt': NOW - timedelta(hours=1),
+         'likes_count': None, 'comments_count': 3, 'bookmarks_count': None, 'views_count': None},
+        {'id': 'no-engagement', 'createdAt': NOW - timedelta(hours=1),
+         'likes_count': 0, 'comments_count': 0, 'bookmarks_count': 0, 'views_count': 0},
+        {'id': 'no-date', 'createdAt': None, 'likes_count': 50, 'comments_count': 5},
+        {'id': 'just-posted', 'createdAt': NOW, 'likes_count': 2, 'comments_count': 1},
+    ]
+    return posts
+
+def assert_same_ranking(expected, actual):
+    assert [p['post_id'] for p in actual] == [p['post_id'] for p in expected]
+    for e, a in zip(expected, actual):
+        assert a['score'] == pytest.approx(e['score'], rel=1e-9)
+        assert a['metrics'] == pytest.approx(e['metrics'], rel=1e-9)
+
+@pytest.mark.parametrize('window', [1, 24, 72])
+def test_calculate_trending_posts_matches_loop(engine, posts, window):
+    expected = calculate_trending_posts_loop(posts, window, now=NOW)
+    assert expected
+    assert_same_ranking(expected, engine.calculate_trending_posts(posts, window, now=NOW))
+
+@pytest.mark.parametrize('limit', [1, 20, 100])
+def test_calculate_trending_posts_top_k_matches_loop(engine, posts, limit):
+    expected = calculate_trending_posts_loop(posts, 72, now=NOW)[:limit]
+    assert_same_ranking(expected, engine.calculate_trending_posts(posts, 72, limit=limit, now=NOW))
+
+def test_calculate_trending_posts_min_engagement(engine, posts):
+    expected = calculate_trending_posts_loop(posts, 72, min_engagement=50, now=NOW)
+    assert_same_ranking(expected, engine.calculate_trending_posts(posts, 72, min_engagement=50, now=NOW))
+
+def test_calculate_trending_posts_empty(engine):
+    assert engine.calculate_trending_posts([], now=NOW) == []
+    assert engine.calculate_trending_posts(None, limit=5, now=NOW) == []
+
+@pytest.mark.parametrize('limit', [5, 100])
+def test_rank_recent_posts_matches_loop(engine, posts, limit):
+    exclude = {p['post_id'] for p in engine.calculate_trending_posts(posts, 72, limit=20, now=NOW)}
+    expected = rank_recent_posts_loop(posts, exclude_ids=exclude, now=NOW)[:limit]
+    assert expected
+    assert engine.rank_recent_posts(posts, exclude_ids=exclude, limit=limit, now=NOW) == expected
@@ -0,0 +1,62 @@
+"""recommend_users and recommend_users_batch against the per-user set loop they replaced"""
+import random
+
+import pytest
+
+from benchmarks.bench_recommend_users import recommend_users_loop
+from benchmarks.common import make_users
+from recommendation_engine import UserTopicIndex
+
+@pytest.fixture(scope='module')
+def all_users():
+    # Few topics, so many users tie on score and their order is checked too
+    return [
+        {'id': u['user_id'], 'username': u['user_id'], 'displayName': None, 'topics': u['user_topics']}
+        for u in make_users(300, n_topics=20, max_topics=5, seed=21)
+    ]
+
+@pytest.fixture(scope='module')
+def user_index(all_users):
+    return UserTopicIndex(all_users)
+
+@pytest.fixture(scope='module')
+def following(all_users):
+    rng = random.Random(4)
+    return {u['id']: [v['id'] for v in rng.sample(all_users, rng.randint(0, 15))] for u in all_users}
+
+def assert_same_recommendations(expected, actual):
+    assert [a['user_id'] for a in actual] == [e['user_id'] for e in expected]
+    for e, a in zip(expected, actual):
+        assert a['score'] == pytest.approx(e['score'], rel=1e-12)
+        assert a['common_topics_count'] == e['common_topics_count']
+
+@pytest.mark.parametrize('limit', [1, 10, 500])
+def test_recommend_users_matches_loop(engine, all_users, user_index, following, limit):
+    for user in all_users:
+        expected = recommend_users_loop(user['id'], user['topics'], all_users, following[user['id']], limit)
+        actual = engine.recommend_users(user['id'], user['topics'], all_users, following[user['id']], limit,
+                                        user_index=user_index)
+        assert_same_recommendations(expected, actual)
+
+def test_recommend_users_builds_its_own_index(engine, all_users, following):
+    user = next(u for u in all_users if u['topics'])
+    expected = recommend_users_loop(user['id'], user['topics'], all_users, following[user['id']], 10)
+    assert_same_recommendations(expected, engine.recommend_users(
+        user['id'], user['topics'], all_users, following[user['id']], 10))
+
+def test_recommend_users_for_unindexed_user(engine, all_users, user_index):
+    topics = [{'id': 'topic-1', 'name': 'Topic 1'}, {'id': 'topic-2', 'name': 'Topic 2'},
+              {'id': 'not-indexed', 'name': 'New topic'}]
+    expected = recommend_users_loop('new-user', topics, all_users, [], 10)
+    assert expected
+    assert_same_recommendations(expected, engine.recommend_users('new-user', topics, all_users, [], 10,
+                                                                 user_index=user_index))
+
+def test_recommend_users_batch_matches_loop(engine, all_users, user_index, following):
+    user_ids = [u['id'] for u in all_users] + ['unknown-user']
+    batch = engine.recommend_users_batch(user_ids, user_index, following, limit=10)
+    assert set(batch) == set(user_ids)
+    for user in all_users:
+        expected = recommend_users_loop(user['id'], user['topics'], all_users, following[user['id']], 10)
+        assert_same_recommendations(expected, batch[user['id']])
+    assert_same_recommendations(recommend_users_loop('unknown-user', [], all_users, [], 10), batch['unknown-user'])
@@ -0,0 +1,37 @@
+-- AlterTable
+ALTER TABLE "public"."Bookmark" ADD COLUMN     "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+-- CreateTable
+CREATE TABLE "public"."PostEngagement" (
+    "postId" TEXT NOT NULL,
+    "likes" INTEGER NOT NULL DEFAULT 0,
+    "comments" INTEGER NOT NULL DEFAULT 0,
+    "bookmarks" INTEGER NOT NULL DEFAULT 0,
+    "views" INTEGER NOT NULL DEFAULT 0,
+    "refreshedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "PostEngagement_pkey" PRIMARY KEY ("postId")
+);
+
+-- CreateTable
+CREATE TABLE "public"."AggregateWatermark" (
+    "name" TEXT NOT NULL,
+    "watermark" TIMESTAMP(3) NOT NULL,
+
+    CONSTRAINT "AggregateWatermark_pkey" PRIMARY KEY ("name")
+);
+
+-- CreateIndex
+CREATE INDEX "Bookmark_createdAt_idx" ON "public"."Bookmark"("createdAt");
+
+-- CreateIndex
+CREATE INDEX "Like_createdAt_idx" ON "public"."Like"("createdAt");
+
+-- CreateIndex
+CREATE INDEX "Comment_createdAt_idx" ON "public"."Comment"("createdAt");
+
+-- CreateIndex
+CREATE INDEX "UserActivity_createdAt_idx" ON "public"."UserActivity"("createdAt");
+
+-- AddForeignKey
+ALTER TABLE "public"."PostEngagement" ADD CONSTRAINT "PostEngagement_postId_fkey" FOREIGN KEY ("postId") REFERENCES "public"."Post"("id") ON DELETE CASCADE ON UPDATE CASCADE;
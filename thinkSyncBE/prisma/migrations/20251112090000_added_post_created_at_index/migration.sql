@@ -0,0 +1,2 @@
+-- CreateIndex
+CREATE INDEX "Post_createdAt_idx" ON "public"."Post"("createdAt");
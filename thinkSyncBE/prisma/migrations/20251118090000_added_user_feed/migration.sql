@@ -0,0 +1,14 @@
+-- CreateTable
+CREATE TABLE "public"."UserFeed" (
+    "userId" TEXT NOT NULL,
+    "items" JSONB NOT NULL,
+    "computedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "UserFeed_pkey" PRIMARY KEY ("userId")
+);
+
+-- CreateIndex
+CREATE INDEX "UserFeed_computedAt_idx" ON "public"."UserFeed"("computedAt");
+
+-- AddForeignKey
+ALTER TABLE "public"."UserFeed" ADD CONSTRAINT "UserFeed_userId_fkey" FOREIGN KEY ("userId") REFERENCES "public"."User"("id") ON DELETE CASCADE ON UPDATE CASCADE;
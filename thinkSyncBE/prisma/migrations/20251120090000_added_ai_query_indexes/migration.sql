@@ -0,0 +1,26 @@
+-- CreateIndex
+CREATE INDEX "UserTopic_topicId_userId_idx" ON "public"."UserTopic"("topicId", "userId");
+
+-- CreateIndex
+CREATE INDEX "PostTopic_topicId_postId_idx" ON "public"."PostTopic"("topicId", "postId");
+
+-- CreateIndex
+CREATE INDEX "Like_postId_idx" ON "public"."Like"("postId");
+
+-- CreateIndex
+CREATE INDEX "Comment_postId_idx" ON "public"."Comment"("postId");
+
+-- CreateIndex
+CREATE INDEX "Bookmark_postId_idx" ON "public"."Bookmark"("postId");
+
+-- CreateIndex
+CREATE INDEX "Mention_postId_idx" ON "public"."Mention"("postId");
+
+-- CreateIndex
+CREATE INDEX "Media_postId_idx" ON "public"."Media"("postId");
+
+-- CreateIndex
+CREATE INDEX "Link_postId_idx" ON "public"."Link"("postId");
+
+-- CreateIndex (partial; not expressible in schema.prisma)
+CREATE INDEX "UserActivity_postId_view_post_idx" ON "public"."UserActivity"("postId") WHERE "type" = 'view_post';